@@ -1,3 +1,14 @@
 from autoweb_module.selenium.cond import TagCond, LocatorCond, TextCond, AllSelectorCond
 from autoweb_module.selenium.element import Element
+from autoweb_module.selenium.element_list import ElementList
+from autoweb_module.selenium.snapshot import Snapshot
 from autoweb_module.selenium.selenium import Selenium
+from autoweb_module.selenium.pool import SeleniumPool, PoolStats
+from autoweb_module.selenium.wait import WaitStrategy, CondMatch
+from autoweb_module.selenium.aio import AsyncSelenium, AsyncElement
+from autoweb_module.selenium.download import Download, DownloadTracker
+from autoweb_module.selenium.blocking import BlockProfile, BlockReport, ResourceBlocker
+from autoweb_module.selenium.profiler import CommandStats, CommandRecord
+from autoweb_module.selenium.writer import BackgroundWriter
+from autoweb_module.selenium.extract import write_csv, write_jsonl
+from autoweb_module.selenium.tabs import TabManager, TabStats, TabResult
@@ -4,3 +4,29 @@ class DifferenceTagError(Exception):
 
 class NotWebElementError(Exception):
     """WebElementのタグが違うときのエラー"""
+
+
+class CdpError(Exception):
+    """CDP(Chrome DevTools Protocol)のコマンドや接続のエラー"""
+
+
+class DownloadCanceledError(Exception):
+    """ダウンロードがキャンセルされたときのエラー"""
+
+
+class BackgroundWriteError(Exception):
+    """BackgroundWriterでの書き込みに失敗したときのエラー。errorsに(保存先, 例外)のリスト"""
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        path_list = [str(path) for path, _ in errors]
+        super().__init__(f"{errors.__len__()}件の書き込みに失敗しました。: {', '.join(path_list)}")
+
+
+class FormFillError(Exception):
+    """fill_formで入力できなかった項目があるときのエラー。failuresに(キー, 理由)のリスト"""
+
+    def __init__(self, failures: list):
+        self.failures = failures
+        reason_list = [f"{key!r}: {reason}" for key, reason in failures]
+        super().__init__(f"{failures.__len__()}件入力できませんでした。\n" + "\n".join(reason_list))
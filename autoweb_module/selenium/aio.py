@@ -0,0 +1,408 @@
+# 標準ライブラリ
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal, Self
+from urllib.parse import urlsplit
+import asyncio
+import base64
+import json
+import time
+
+# 外部ライブラリ
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.errorhandler import ErrorHandler
+from selenium.webdriver.common.utils import keys_to_typing
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver import Keys
+
+# 自作ライブラリ
+from autoweb_module.selenium import script
+from autoweb_module.selenium.const import LOCATOR_DICT
+from autoweb_module.selenium.cond import Cond, CssMaker
+from autoweb_module.selenium.selenium import Selenium
+from autoweb_module.exceptions import DifferenceTagError, NotWebElementError
+
+# W3C WebDriverで要素を表すキー
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+
+class AsyncWebDriverTransport:
+    """
+    chromedriverとasyncioで通信する(W3C WebDriverのHTTP)
+    コネクションはkeep-aliveで使い回すので、1つのイベントループで複数ブラウザの往復を重ねられる
+    クリックなどは2回送ると2回効くので、やり直すのはリクエストを書き込めなかったときだけ
+    """
+
+    def __init__(self, server_url: str, session_id: str, max_connections: int = 4):
+        url = urlsplit(server_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.base_path = url.path.rstrip("/")
+        self.session_id = session_id
+        self._idle_connection_list: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    @classmethod
+    def from_driver(cls, driver: WebDriver, max_connections: int = 4) -> Self:
+        """起動済みのseleniumのdriverと同じセッションにつなぐ"""
+        executor = driver.command_executor
+        client_config = getattr(executor, "_client_config", None)
+        if client_config is None:
+            server_url = executor._url
+        else:
+            server_url = client_config.remote_server_addr
+        return cls(server_url, driver.session_id, max_connections=max_connections)
+
+    async def execute(self, method: Literal["GET", "POST", "DELETE"], path: str, payload: dict | None = None) -> Any:
+        """/session/{id}{path}へのリクエスト。エラーはseleniumと同じ例外にする"""
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        request_path = f"{self.base_path}/session/{self.session_id}{path}"
+        async with self._semaphore:
+            connection = await self._get_connection()
+            try:
+                try:
+                    await self._send(connection, method, request_path, body)
+                except ConnectionError:
+                    # サーバーには届いていないので、張り直して1回だけやり直す
+                    connection[1].close()
+                    connection = await asyncio.open_connection(self.host, self.port)
+                    await self._send(connection, method, request_path, body)
+                status, data, keep_alive = await self._receive(connection)
+            except BaseException:
+                # キャンセルや読み込み途中の失敗では応答が読みかけで残るので、使い回さずに閉じる
+                connection[1].close()
+                raise
+            if keep_alive:
+                self._idle_connection_list.append(connection)
+            else:
+                connection[1].close()
+
+        text = data.decode("utf-8")
+        if status >= 400:
+            ErrorHandler().check_response({"status": status, "value": text})
+            raise WebDriverException(text)
+        return json.loads(text)["value"]
+
+    async def _get_connection(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        while self._idle_connection_list.__len__() != 0:
+            reader, writer = self._idle_connection_list.pop()
+            # サーバーが閉じたkeep-aliveのコネクションは、書き込む前に捨てる
+            if reader.at_eof() or writer.is_closing():
+                writer.close()
+                continue
+            return reader, writer
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _send(
+        self, connection: tuple[asyncio.StreamReader, asyncio.StreamWriter], method: str, path: str, body: bytes
+    ):
+        _, writer = connection
+        header = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Accept: application/json\r\n"
+            "Content-Type: application/json;charset=UTF-8\r\n"
+            f"Content-Length: {body.__len__()}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        writer.write(header.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _receive(self, connection: tuple[asyncio.StreamReader, asyncio.StreamWriter]) -> tuple[int, bytes, bool]:
+        reader, _ = connection
+        status_line = await reader.readline()
+        if status_line == b"":
+            raise ConnectionError("WebDriverサーバーとの接続が切れています。")
+        status = int(status_line.split()[1])
+        header_dict = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            header_dict[name.strip().lower()] = value.strip()
+
+        if header_dict.get("transfer-encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                data += await reader.readexactly(size)
+                await reader.readline()
+        else:
+            data = await reader.readexactly(int(header_dict.get("content-length", "0")))
+        keep_alive = header_dict.get("connection", "").lower() != "close"
+        return status, data, keep_alive
+
+    async def close(self):
+        for _, writer in self._idle_connection_list:
+            writer.close()
+        self._idle_connection_list = []
+
+
+@dataclass
+class AsyncElement:
+    """
+    Elementのasyncio版。find/attr/click/send_keys/save_ssなどをawaitで呼ぶ
+    element_idがNoneならdriver(ページ全体)
+    """
+
+    transport: AsyncWebDriverTransport
+    element_id: str | None
+    debug_mode: bool
+    save_folder: Path | None
+    wait_time: int | float
+    poll_interval: float = 0.5
+
+    def __eq__(self, other: Self) -> bool:
+        if not isinstance(other, AsyncElement):
+            return False
+        return self.transport is other.transport and self.element_id == other.element_id
+
+    def __hash__(self) -> int:
+        return hash((id(self.transport), self.element_id))
+
+    def __repr__(self) -> str:
+        return f"type: {self.__class__.__name__} id: {self.element_id}"
+
+    def _get_new_element(self, element_id: str | None) -> Self:
+        return self.__class__(
+            transport=self.transport,
+            element_id=element_id,
+            debug_mode=self.debug_mode,
+            save_folder=self.save_folder,
+            wait_time=self.wait_time,
+            poll_interval=self.poll_interval,
+        )
+
+    @property
+    def is_web_driver(self) -> bool:
+        return self.element_id is None
+
+    @property
+    def is_web_element(self) -> bool:
+        return not self.element_id is None
+
+    def _element_path(self) -> str:
+        if self.is_web_driver:
+            raise NotWebElementError("WebElementのみの操作です。")
+        return f"/element/{self.element_id}"
+
+    # ---------------find_elem系---------------
+    async def find_elem(
+        self,
+        locator: Literal["id", "name", "tag", "xpath", "css", "link", "plink", "class"],
+        attr: str,
+        wait_time: int | float | None = None,
+    ) -> Self:
+        """見つかるまで待ってから返す。wait_timeが0なら待たずにNoSuchElementException"""
+        using, value = self._to_w3c_locator(locator, attr)
+        path = "/element" if self.is_web_driver else f"{self._element_path()}/element"
+        wait_time = self.wait_time if wait_time is None else wait_time
+        deadline = time.monotonic() + wait_time
+        while True:
+            try:
+                value_dict = await self.transport.execute("POST", path, {"using": using, "value": value})
+                return self._get_new_element(value_dict[ELEMENT_KEY])
+            except NoSuchElementException:
+                if wait_time == 0:
+                    raise
+                if time.monotonic() >= deadline:
+                    raise TimeoutException(f"{wait_time}秒待っても要素が見つかりませんでした。: {locator}={attr}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def find_elems(
+        self,
+        locator: Literal["id", "name", "tag", "xpath", "css", "link", "plink", "class"],
+        attr: str,
+        wait_time: int | float | None = None,
+    ) -> list[Self]:
+        """1つ以上見つかるまで待ってから全部返す。見つからなければ空リスト"""
+        using, value = self._to_w3c_locator(locator, attr)
+        path = "/elements" if self.is_web_driver else f"{self._element_path()}/elements"
+        wait_time = self.wait_time if wait_time is None else wait_time
+        deadline = time.monotonic() + wait_time
+        while True:
+            value_dict_list = await self.transport.execute("POST", path, {"using": using, "value": value})
+            if value_dict_list.__len__() != 0 or time.monotonic() >= deadline:
+                return [self._get_new_element(value_dict[ELEMENT_KEY]) for value_dict in value_dict_list]
+            await asyncio.sleep(self.poll_interval)
+
+    async def find_cond_elem(self, cond: Cond, wait_time: int | float | None = None) -> Self:
+        locator, selector = cond.selector
+        return await self.find_elem(locator, selector, wait_time=wait_time)
+
+    async def find_cond_elems(self, cond: Cond, wait_time: int | float | None = None) -> list[Self]:
+        locator, selector = cond.selector
+        return await self.find_elems(locator, selector, wait_time=wait_time)
+
+    def _to_w3c_locator(self, locator: str, attr: str) -> tuple[str, str]:
+        """W3Cにないid/name/classはseleniumと同じくCSSセレクタに直す"""
+        match locator:
+            case "id":
+                return "css selector", f"[id={CssMaker().quote_value(attr)}]"
+            case "name":
+                return "css selector", f"[name={CssMaker().quote_value(attr)}]"
+            case "class":
+                return "css selector", f".{attr}"
+            case "tag":
+                return "css selector", attr
+        return LOCATOR_DICT[locator], attr
+
+    # ---------------status系---------------
+    @property
+    async def text(self) -> str:
+        return await self.transport.execute("GET", f"{self._element_path()}/text")
+
+    @property
+    async def tag_name(self) -> str:
+        return await self.transport.execute("GET", f"{self._element_path()}/name")
+
+    @property
+    async def current_url(self) -> str:
+        return await self.transport.execute("GET", "/url")
+
+    async def attr(self, name: str) -> str | None:
+        """Element.attrと同じ値(seleniumのgetAttributeのatomを使う)"""
+        if self.is_web_driver:
+            return None
+        return await self.execute(
+            f"/* getAttribute */return ({script.get_attribute_atom()}).apply(null, arguments);", self, name
+        )
+
+    # ---------------操作系---------------
+    async def click(self, mode: Literal["javascript", "normal"] = "javascript"):
+        match mode:
+            case "javascript":
+                await self.execute("arguments[0].click();", self)
+            case "normal":
+                await self.transport.execute("POST", f"{self._element_path()}/click", {})
+
+    async def send_keys(self, text: str, clear: bool = False):
+        if clear:
+            await self.clear()
+        await self._send_keys(text)
+
+    async def clear(self):
+        """
+        Element.clearと同じくCtrl+A→BackSpaceで消し、空になったか確かめる
+        空にならなければwait_time秒までやり直し、それでもだめならTimeoutException
+        """
+        deadline = time.monotonic() + self.wait_time
+        while True:
+            await self._send_keys(Keys.CONTROL + "a")
+            await self._send_keys(Keys.BACK_SPACE)
+            value = await self.attr("value")
+            if value is None:
+                raise DifferenceTagError("clearできるのはvalueのある要素(inputなど)だけです。")
+            if value == "":
+                return
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"{self.wait_time}秒待っても入力欄が空になりませんでした。: {value!r}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _send_keys(self, text: str):
+        typing = keys_to_typing(text)
+        payload = {"text": "".join(typing), "value": typing}
+        await self.transport.execute("POST", f"{self._element_path()}/value", payload)
+
+    async def execute(self, script_text: str, *args) -> Any:
+        """execute_script。引数・戻り値のAsyncElementはWebElementとしてやりとりする"""
+        value = await self.transport.execute(
+            "POST", "/execute/sync", {"script": script_text, "args": [self._serialize(arg) for arg in args]}
+        )
+        return self._deserialize(value)
+
+    def _serialize(self, value: Any) -> Any:
+        if isinstance(value, AsyncElement):
+            return {ELEMENT_KEY: value.element_id}
+        if isinstance(value, list | tuple):
+            return [self._serialize(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self._serialize(item) for key, item in value.items()}
+        return value
+
+    def _deserialize(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if ELEMENT_KEY in value:
+                return self._get_new_element(value[ELEMENT_KEY])
+            return {key: self._deserialize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._deserialize(item) for item in value]
+        return value
+
+    # ---------------その他---------------
+    async def save_ss(self, file_path: Path | str | None = None, save_type: Literal["png", "pdf"] = "png"):
+        """スクショを保存。Element.save_ssと同じ保存先の決め方"""
+        if save_type not in ("png", "pdf"):
+            raise ValueError("save_typeは'png'または'pdf'のみ指定できます。")
+        default_folder = Path.home() / "Downloads" if self.save_folder is None else Path(self.save_folder)
+        if file_path is None:
+            if save_type == "pdf":
+                file_path = default_folder / "page.pdf"
+            else:
+                file_path = default_folder / f"{datetime.now().strftime('%Y%m%d')}.png"
+        path = Path(file_path).with_suffix(f".{save_type}")
+
+        if save_type == "pdf":
+            data_base64 = await self.transport.execute("POST", "/print", {})
+        elif self.is_web_driver:
+            data_base64 = await self.transport.execute("GET", "/screenshot")
+        else:
+            data_base64 = await self.transport.execute("GET", f"{self._element_path()}/screenshot")
+
+        # デコードと書き込みはイベントループを止めないようにスレッドで
+        def write():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(base64.b64decode(data_base64))
+
+        await asyncio.to_thread(write)
+
+
+class AsyncSelenium:
+    """
+    Seleniumのasyncio版
+    起動(chromedriverのプロセス起動とセッション作成)だけはスレッドで行い、以降の操作はAsyncWebDriverTransportで非同期に行う
+    """
+
+    def __init__(self):
+        self.selenium = Selenium()
+        self.driver: AsyncElement | None = None
+
+    async def launch_browser(
+        self,
+        start_url: str,
+        default_save_folder: Path | str | None = None,
+        debug_mode: bool = False,
+        wait_time: int | float | None = None,
+        max_connections: int = 4,
+        **launch_kwargs,
+    ):
+        """launch_kwargsはSelenium.launch_browserにそのまま渡す"""
+        await asyncio.to_thread(
+            self.selenium.launch_browser,
+            start_url,
+            default_save_folder=default_save_folder,
+            debug_mode=debug_mode,
+            **launch_kwargs,
+        )
+        # 待機時間はデフォルト10秒
+        if wait_time is None:
+            wait_time = 10
+        transport = AsyncWebDriverTransport.from_driver(self.selenium._driver, max_connections=max_connections)
+        self.driver = AsyncElement(
+            transport=transport,
+            element_id=None,
+            debug_mode=debug_mode,
+            save_folder=None if default_save_folder is None else Path(default_save_folder),
+            wait_time=wait_time,
+        )
+
+    async def quit(self):
+        if not self.driver is None:
+            await self.driver.transport.close()
+        await asyncio.to_thread(self.selenium.quit)
@@ -0,0 +1,229 @@
+# 標準ライブラリ
+from __future__ import annotations
+from dataclasses import dataclass, field
+import threading
+
+# 外部ライブラリ
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# 自作ライブラリ
+from autoweb_module.selenium.cdp import CdpConnection
+from autoweb_module.selenium.const import BLOCK_PRESET_DICT
+
+
+@dataclass(frozen=True)
+class BlockProfile:
+    """
+    読み込ませないリソース
+    resource_types: CDPのNetwork.ResourceType("Image", "Media", "Font", "Stylesheet"など)
+    url_patterns: Network.setBlockedURLsのパターン。*がワイルドカード
+    """
+
+    resource_types: tuple[str, ...] = ()
+    url_patterns: tuple[str, ...] = ()
+
+    @classmethod
+    def preset(cls, name: str, url_patterns: list[str] | tuple[str, ...] = ()) -> BlockProfile:
+        """プリセット("text-only", "no-media")から作る。url_patternsを足せる"""
+        if name not in BLOCK_PRESET_DICT:
+            raise ValueError(f"プリセットは{' or '.join(BLOCK_PRESET_DICT)}です。{name}は非対応です。")
+        preset = BLOCK_PRESET_DICT[name]
+        return cls(
+            resource_types=tuple(preset["resource_types"]),
+            url_patterns=(*preset["url_patterns"], *url_patterns),
+        )
+
+
+@dataclass
+class BlockReport:
+    """1ページ(1回のページ遷移)分の集計"""
+
+    url: str
+    target_id: str
+    requests: int = 0  # ページが出したリクエスト数(ブロックしたものを含む)
+    loaded_bytes: int = 0  # 実際に転送されたバイト数
+    blocked_requests: int = 0
+    blocked_by_type: dict[str, int] = field(default_factory=dict)
+    # ResourceBlocker.compareで測ったときだけ入る、ブロックなしで読み込んだときの値
+    baseline_requests: int | None = None
+    baseline_bytes: int | None = None
+
+    @property
+    def requests_saved(self) -> int:
+        """ブロックで減ったリクエスト数。compareで測っていればその差、なければブロックした数"""
+        if self.baseline_requests is None:
+            return self.blocked_requests
+        return self.baseline_requests - self.requests + self.blocked_requests
+
+    @property
+    def bytes_saved(self) -> int | None:
+        """ブロックで減った転送量。ブロックしたリソースの大きさは読み込まないとわからないので、compareで測ったときだけ"""
+        if self.baseline_bytes is None:
+            return None
+        return self.baseline_bytes - self.loaded_bytes
+
+
+class ResourceBlocker:
+    """
+    CDPで画像・フォント・広告などを読み込ませない
+    ブラウザ全体にauto attachするので、後から開いたタブやiframe(別プロセス)にも効く
+    URLパターンはNetwork.setBlockedURLs、リソースの種類はFetchでリクエスト前に止めて失敗させる
+    ページごとのリクエスト数・転送量・ブロック数をreportsに貯める
+    """
+
+    def __init__(self, connection: CdpConnection, profile: BlockProfile):
+        self.connection = connection
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._page_dict: dict[str, str] = {}  # sessionId: そのセッションが属するページのtargetId
+        self._current_report_dict: dict[str, BlockReport] = {}
+        self._report_list: list[BlockReport] = []
+
+        self.connection.on("Target.attachedToTarget", self._on_attached)
+        self.connection.on("Target.detachedFromTarget", self._on_detached)
+        self.connection.on("Fetch.requestPaused", self._on_request_paused)
+        self.connection.on("Network.requestWillBeSent", self._on_request)
+        self.connection.on("Network.loadingFinished", self._on_finished)
+        self.connection.on("Network.loadingFailed", self._on_failed)
+        # 既存のタブにもattachされる。設定が済むまで止めておく
+        self.connection.send(
+            "Target.setAutoAttach", {"autoAttach": True, "waitForDebuggerOnStart": True, "flatten": True}
+        )
+
+    @property
+    def reports(self) -> list[BlockReport]:
+        """これまでのページごとの集計(古い順)"""
+        with self._lock:
+            return list(self._report_list)
+
+    def last_report(self, target_id: str | None = None) -> BlockReport | None:
+        """最新の集計。target_id(Chromeではwindow handleと同じ)でタブを絞れる"""
+        with self._lock:
+            for report in reversed(self._report_list):
+                if target_id is None or report.target_id == target_id:
+                    return report
+        return None
+
+    def compare(self, driver: WebDriver, url: str) -> BlockReport:
+        """
+        現在のタブでurlをブロックなし・ありの順に1回ずつ読み込み、減った転送量とリクエスト数を測る
+        キャッシュは切って読み込むので、普段より遅い
+        """
+        target_id = driver.current_window_handle
+        session_id = self._get_session_id(target_id)
+        self.connection.send("Network.setCacheDisabled", {"cacheDisabled": True}, session_id)
+        try:
+            self._set_enabled(session_id, False)
+            driver.get(url)
+            baseline = self.last_report(target_id)
+            self._set_enabled(session_id, True)
+            driver.get(url)
+            report = self.last_report(target_id)
+        finally:
+            self._set_enabled(session_id, True)
+            self.connection.send("Network.setCacheDisabled", {"cacheDisabled": False}, session_id)
+        report.baseline_requests = baseline.requests
+        report.baseline_bytes = baseline.loaded_bytes
+        return report
+
+    def close(self):
+        """イベントの受け取りをやめる。ブロックの設定はそのまま"""
+        self.connection.off("Target.attachedToTarget", self._on_attached)
+        self.connection.off("Target.detachedFromTarget", self._on_detached)
+        self.connection.off("Fetch.requestPaused", self._on_request_paused)
+        self.connection.off("Network.requestWillBeSent", self._on_request)
+        self.connection.off("Network.loadingFinished", self._on_finished)
+        self.connection.off("Network.loadingFailed", self._on_failed)
+
+    def _get_session_id(self, target_id: str) -> str:
+        with self._lock:
+            for session_id, page_target_id in self._page_dict.items():
+                if page_target_id == target_id:
+                    return session_id
+        raise ValueError(f"attachしていないタブです。: {target_id}")
+
+    def _set_enabled(self, session_id: str, enabled: bool):
+        url_patterns = list(self.profile.url_patterns) if enabled else []
+        self.connection.send("Network.setBlockedURLs", {"urls": url_patterns}, session_id)
+        if enabled and self.profile.resource_types.__len__() > 0:
+            self.connection.send("Fetch.enable", self._fetch_params(), session_id)
+        else:
+            self.connection.send("Fetch.disable", {}, session_id)
+
+    def _fetch_params(self) -> dict:
+        return {
+            "patterns": [
+                {"resourceType": resource_type, "requestStage": "Request"}
+                for resource_type in self.profile.resource_types
+            ]
+        }
+
+    # ---------------イベント(受信スレッドで呼ばれるので、結果を待つsendは使わない)---------------
+    def _on_attached(self, params: dict, session_id: str | None):
+        target_info = params["targetInfo"]
+        new_session_id = params["sessionId"]
+        if target_info["type"] not in ("page", "iframe"):
+            # ワーカーなどは止めたままにしない
+            self.connection.send_async("Runtime.runIfWaitingForDebugger", {}, new_session_id)
+            return
+        with self._lock:
+            if target_info["type"] == "page":
+                self._page_dict[new_session_id] = target_info["targetId"]
+            else:
+                # 別プロセスのiframeは親ページの集計に入れる
+                self._page_dict[new_session_id] = self._page_dict.get(session_id, target_info["targetId"])
+        # 送った順に処理されるので、ブロックの設定が済んでからページが動き出す
+        self.connection.send_async("Network.enable", {}, new_session_id)
+        if self.profile.url_patterns.__len__() > 0:
+            self.connection.send_async(
+                "Network.setBlockedURLs", {"urls": list(self.profile.url_patterns)}, new_session_id
+            )
+        if self.profile.resource_types.__len__() > 0:
+            self.connection.send_async("Fetch.enable", self._fetch_params(), new_session_id)
+        self.connection.send_async(
+            "Target.setAutoAttach", {"autoAttach": True, "waitForDebuggerOnStart": True, "flatten": True}, new_session_id
+        )
+        self.connection.send_async("Runtime.runIfWaitingForDebugger", {}, new_session_id)
+
+    def _on_detached(self, params: dict, session_id: str | None):
+        with self._lock:
+            self._page_dict.pop(params["sessionId"], None)
+
+    def _on_request_paused(self, params: dict, session_id: str | None):
+        # Fetchのパターンはブロックする種類だけなので、止まったものは全部失敗させる
+        self.connection.send_async(
+            "Fetch.failRequest", {"requestId": params["requestId"], "errorReason": "BlockedByClient"}, session_id
+        )
+
+    def _on_request(self, params: dict, session_id: str | None):
+        with self._lock:
+            target_id = self._page_dict.get(session_id)
+            if target_id is None:
+                return
+            # メインフレームのページ遷移で集計を切り替える(メインフレームのidはtargetIdと同じ)
+            is_main_document = params.get("type") == "Document" and params.get("frameId") == target_id
+            if is_main_document and not "redirectResponse" in params:
+                report = BlockReport(url=params["request"]["url"], target_id=target_id)
+                self._current_report_dict[target_id] = report
+                self._report_list.append(report)
+            report = self._current_report_dict.get(target_id)
+            if not report is None:
+                report.requests += 1
+
+    def _on_finished(self, params: dict, session_id: str | None):
+        with self._lock:
+            report = self._current_report_dict.get(self._page_dict.get(session_id))
+            if not report is None:
+                report.loaded_bytes += int(params.get("encodedDataLength", 0))
+
+    def _on_failed(self, params: dict, session_id: str | None):
+        # CSPなど、こちらのブロック以外の理由は数えない
+        is_blocked = params.get("blockedReason") == "inspector" or "BLOCKED_BY_CLIENT" in params.get("errorText", "")
+        if not is_blocked:
+            return
+        with self._lock:
+            report = self._current_report_dict.get(self._page_dict.get(session_id))
+            if not report is None:
+                resource_type = params.get("type", "Other")
+                report.blocked_requests += 1
+                report.blocked_by_type[resource_type] = report.blocked_by_type.get(resource_type, 0) + 1
@@ -0,0 +1,155 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import Future
+from urllib.request import urlopen
+import itertools
+import json
+import threading
+import traceback
+
+# 外部ライブラリ
+from selenium.webdriver.remote.webdriver import WebDriver
+import websocket
+
+# 自作ライブラリ
+from autoweb_module.exceptions import CdpError
+
+
+class CdpConnection:
+    """
+    ChromeのDevToolsプロトコル(CDP)にwebsocketで直接つなぐ
+    seleniumのexecute_cdp_cmdはコマンドしか送れないので、イベント(ダウンロードの進捗など)を受け取りたいときはこっち
+    受信は専用スレッドで行い、イベントのコールバックもそのスレッドで呼ぶ(重い処理はしないこと)
+    websocket自体はwebsocket-clientに任せ、ここではCDPのid・session・イベントの振り分けだけ持つ
+    """
+
+    def __init__(self, ws_url: str, timeout: float = 30):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._id_counter = itertools.count(1)
+        self._future_dict: dict[int, Future] = {}
+        self._listener_dict: dict[str, list[Callable[[dict, str | None], None]]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._ws = self._connect()
+        self._reader = threading.Thread(target=self._read_loop, name="autoweb-cdp-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def from_driver(cls, driver: WebDriver, timeout: float = 30) -> CdpConnection:
+        """seleniumで起動したChromeのブラウザ全体(browserターゲット)につなぐ"""
+        capabilities = driver.capabilities
+        ws_url = capabilities.get("se:cdp")
+        if not ws_url:
+            debugger_address = capabilities["goog:chromeOptions"]["debuggerAddress"]
+            with urlopen(f"http://{debugger_address}/json/version", timeout=timeout) as response:
+                ws_url = json.loads(response.read())["webSocketDebuggerUrl"]
+        return cls(ws_url, timeout=timeout)
+
+    # ---------------コマンド・イベント---------------
+    def send(self, method: str, params: dict | None = None, session_id: str | None = None) -> dict:
+        """コマンドを送って結果を待つ。session_idはTarget.attachToTarget(flatten)で得たもの"""
+        return self.send_async(method, params, session_id).result(timeout=self.timeout)
+
+    def send_async(self, method: str, params: dict | None = None, session_id: str | None = None) -> Future:
+        """コマンドを送って、結果のFutureをすぐ返す"""
+        if self._closed:
+            raise CdpError("CDPの接続は閉じています。")
+        message_id = next(self._id_counter)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if not session_id is None:
+            message["sessionId"] = session_id
+        future = Future()
+        with self._lock:
+            # 受信スレッドが先に切断を見つけていたら、待つ相手がいないので登録しない
+            if self._closed:
+                raise CdpError("CDPの接続は閉じています。")
+            self._future_dict[message_id] = future
+        try:
+            self._ws.send(json.dumps(message))
+        except (OSError, websocket.WebSocketException) as e:
+            with self._lock:
+                self._future_dict.pop(message_id, None)
+            raise CdpError(f"CDPのコマンドを送れませんでした。: {e}")
+        return future
+
+    def on(self, event: str, callback: Callable[[dict, str | None], None]):
+        """イベントを受け取る。callback(params, session_id)"""
+        with self._lock:
+            self._listener_dict.setdefault(event, []).append(callback)
+
+    def off(self, event: str, callback: Callable[[dict, str | None], None]):
+        with self._lock:
+            if callback in self._listener_dict.get(event, []):
+                self._listener_dict[event].remove(callback)
+
+    def close(self):
+        with self._lock:
+            if self._closed and not self._ws.connected:
+                return
+            self._closed = True
+        try:
+            self._ws.send_close()
+            # 受信スレッドのrecvを止める
+            self._ws.abort()
+        except (OSError, websocket.WebSocketException):
+            pass
+        self._ws.shutdown()
+        self._fail_all(CdpError("CDPの接続を閉じました。"))
+
+    # ---------------websocket---------------
+    def _connect(self) -> websocket.WebSocket:
+        try:
+            # Originを付けるとChromeは--remote-allow-originsなしでは断る
+            ws = websocket.create_connection(
+                self.ws_url, timeout=self.timeout, suppress_origin=True, enable_multithread=True
+            )
+        except (OSError, websocket.WebSocketException) as e:
+            raise CdpError(f"CDPのwebsocketの接続に失敗しました。: {e}")
+        # 受信はブロッキングでよい
+        ws.settimeout(None)
+        return ws
+
+    def _read_loop(self):
+        try:
+            while True:
+                data = self._ws.recv()
+                # closeフレームなら空
+                if data == "" or data == b"":
+                    break
+                self._dispatch(json.loads(data))
+        except (OSError, websocket.WebSocketException) as e:
+            self._fail_all(CdpError(f"CDPの接続が切れました。: {e}"))
+            return
+        self._fail_all(CdpError("CDPの接続が閉じられました。"))
+
+    def _dispatch(self, message: dict):
+        if "id" in message:
+            with self._lock:
+                future = self._future_dict.pop(message["id"], None)
+            if future is None:
+                return
+            if "error" in message:
+                error = message["error"]
+                future.set_exception(CdpError(f"{error.get('message')}: {error.get('data', '')}"))
+            else:
+                future.set_result(message.get("result", {}))
+            return
+        with self._lock:
+            listener_list = list(self._listener_dict.get(message.get("method"), []))
+        for listener in listener_list:
+            try:
+                listener(message.get("params", {}), message.get("sessionId"))
+            except Exception:
+                # コールバックの例外で受信スレッドを止めない
+                traceback.print_exc()
+
+    def _fail_all(self, error: Exception):
+        with self._lock:
+            self._closed = True
+            future_list = list(self._future_dict.values())
+            self._future_dict.clear()
+        for future in future_list:
+            if not future.done():
+                future.set_exception(error)
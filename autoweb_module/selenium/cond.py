@@ -1,83 +1,68 @@
 # 標準ライブラリ
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import Self, Literal
-from abc import abstractmethod, ABC
-import copy
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Literal
+from abc import ABC
+import re
 
 
-@dataclass
+@dataclass(frozen=True)
 class Cond(ABC):
-    pass
+    """
+    検索条件
+    イミュータブルなので&や|で結合しても元の条件は変わらず、中身は結合後の条件と共有される
+    同じ構造の条件は等価かつハッシュ可能で、xpathのコンパイル結果はキャッシュされる
+    """
 
     def __and__(self, other: Cond) -> AllSelectorCond:
         if not isinstance(other, Cond):
-            TypeError("演算子 '&' はCond同士のみ可能です。")
-        self = self.copy()
-        other = other.copy()
-        # AllSelector * Cond(AllSelector含む)
-        if isinstance(self, AllSelectorCond):
-            self.mul(other)
-            return self
-        # Cond(AllSelectorでない) * AllSelector
-        if isinstance(other, AllSelectorCond):
-            other.mul(self)
-            return other
-        # Cond(AllSelectorでない) * Cond(AllSelectorでない) 最初はこれ
-        and_selector = AndSelector()
-        and_selector.append(self)
-        and_selector.append(other)
-        all_selector = AllSelectorCond()
-        all_selector.append(and_selector)
-        return all_selector
+            raise TypeError("演算子 '&' はCond同士のみ可能です。")
+        return self.to_all_selector().mul(other)
 
     def __or__(self, other: Cond) -> AllSelectorCond:
         if not isinstance(other, Cond):
-            TypeError("演算子 '|' はCond同士のみ可能です。")
-        self = self.copy()
-        other = other.copy()
-        # AllSelector + Cond(AllSelector含む)
-        if isinstance(self, AllSelectorCond):
-            self.add(other)
-            return self
-        # Cond(AllSelectorでない) + AllSelector
-        if isinstance(other, AllSelectorCond):
-            other.add(self)
-            return other
-        # Cond(AllSelectorでない) + Cond(AllSelectorでない) 最初はこれ
-        all_selector = AllSelectorCond()
-        and_selector1 = AndSelector()
-        and_selector1.append(self)
-        all_selector.append(and_selector1)
-        and_selector2 = AndSelector()
-        and_selector2.append(other)
-        all_selector.append(and_selector2)
-        return all_selector
-
-    @property
+            raise TypeError("演算子 '|' はCond同士のみ可能です。")
+        return self.to_all_selector().add(other)
+
+    @cached_property
     def xpath(self) -> str:
-        if isinstance(self, AllSelectorCond):
-            all_selector = self
-        else:
-            all_selector = AllSelectorCond()
-            and_selector = AndSelector()
-            and_selector.append(self)
-            all_selector.append(and_selector)
+        return compile_xpath(self.to_all_selector(), ".//")
+
+    @cached_property
+    def self_xpath(self) -> str:
+        """要素自身が条件に合うかを判定するxpath。子孫ではなく自身(self::)を見る"""
+        return compile_xpath(self.to_all_selector(), "self::")
+
+    @cached_property
+    def css(self) -> str:
+        """CSSセレクタ。TextCondを含むなどCSSで書けない条件ならValueError"""
+        css = compile_css(self.to_all_selector())
+        if css is None:
+            raise ValueError(f"CSSセレクタにできない条件です。xpathを使ってください。: {self}")
+        return css
+
+    @cached_property
+    def selector(self) -> tuple[Literal["css", "xpath"], str]:
+        """
+        find_elemに渡す(ロケータ, 値)
+        CSSで書けるならCSS(ブラウザでの評価がxpathより速い)、書けないならxpath
+        """
+        css = compile_css(self.to_all_selector())
+        if css is None:
+            return "xpath", self.xpath
+        return "css", css
 
-        xpath_maker = XpathMaker()
-        xpath = xpath_maker.get_xpath(all_selector.and_selector_list)
-        return xpath
+    def to_all_selector(self) -> AllSelectorCond:
+        """AllSelectorCondの形にそろえる"""
+        return AllSelectorCond((AndSelector().add_cond(self),))
 
     def copy(self) -> Cond:
-        """
-        自身のインスタンスをコピーする
-        これを介せずにcond1 + cond2とかをすると、cond1やcond2が別の値になってしまう
-        """
-        cond = copy.deepcopy(self)
-        return cond
+        """イミュータブルになったのでコピーは不要。互換のため自身を返す"""
+        return self
 
 
-@dataclass
+@dataclass(frozen=True)
 class TagCond(Cond):
     name: str
 
@@ -86,7 +71,7 @@ class TagCond(Cond):
             raise TypeError("タグ名はstrで頼むぅ")
 
 
-@dataclass
+@dataclass(frozen=True)
 class LocatorCond(Cond):
     name: str
     value: str
@@ -101,7 +86,7 @@ class LocatorCond(Cond):
             raise TypeError("ロケータの一致タイプはstrで頼むぅ")
 
 
-@dataclass
+@dataclass(frozen=True)
 class TextCond(Cond):
     value: str
     match: Literal["equals", "contains"] = "equals"
@@ -113,87 +98,198 @@ class TextCond(Cond):
             raise TypeError("テキストの一致タイプはstrで頼むぅ")
 
 
-@dataclass
+@dataclass(frozen=True)
 class AndSelector:
-    """AND同士の部分"""
+    """AND同士の部分。追加系のメソッドは新しいAndSelectorを返す"""
 
     tag: TagCond | None = None
-    locators: list[LocatorCond] = field(default_factory=list)
-    texts: list[TextCond] = field(default_factory=list)
+    locators: tuple[LocatorCond, ...] = ()
+    texts: tuple[TextCond, ...] = ()
 
-    def append(self, cond: TagCond | LocatorCond | TextCond):
+    def __post_init__(self):
+        # listで渡されてもハッシュできるようにtupleにしておく
+        object.__setattr__(self, "locators", tuple(self.locators))
+        object.__setattr__(self, "texts", tuple(self.texts))
+
+    def add_cond(self, cond: TagCond | LocatorCond | TextCond | None) -> AndSelector:
         if isinstance(cond, TagCond):
-            if cond is None:
-                return
             if not self.tag is None and cond.name != self.tag.name:
                 raise ValueError(f"タグ条件: {cond.name}と{self.tag.name}は共存できません。")
-            self.tag = cond
+            return AndSelector(cond, self.locators, self.texts)
         if isinstance(cond, LocatorCond):
-            self.locators.append(cond)
+            return AndSelector(self.tag, self.locators + (cond,), self.texts)
         if isinstance(cond, TextCond):
-            self.texts.append(cond)
+            return AndSelector(self.tag, self.locators, self.texts + (cond,))
+        return self
 
+    def merge(self, other: AndSelector) -> AndSelector:
+        """AND同士の結合"""
+        and_selector = self.add_cond(other.tag)
+        return AndSelector(and_selector.tag, and_selector.locators + other.locators, and_selector.texts + other.texts)
 
-@dataclass
+
+@dataclass(frozen=True)
 class AllSelectorCond(Cond):
-    """Cond結合時の姿"""
-
-    and_selector_list: list[AndSelector] = field(default_factory=list)
-
-    def append(self, and_selector: AndSelector):
-        self.and_selector_list.append(and_selector)
-
-    def get_map_and_append(self, cond: TagCond | LocatorCond | TextCond) -> list[AndSelector]:
-        base_and_selector_list = []
-        for and_selector in self.and_selector_list:
-            and_selector.append(cond)
-            base_and_selector_list.append(and_selector)
-        return base_and_selector_list
-
-    def mul(self, cond: Cond):
-        """積結合。全てorが最前に来る形で格納。"""
-        if isinstance(cond, AllSelectorCond):
-            # (A1 or A2 or .. or An) and (B1 or B2 or .. or Bn) ⇔ or(i:1→n)or(j:1→n)(Ai and Bj)
-            base_and_selector_list = []
-            # for Bi in (B1, B2, .., Bn):
-            for other_and_selector in cond.and_selector_list:
-                # タグ
-                and_selector_list = self.get_map_and_append(other_and_selector.tag)
-                base_and_selector_list += and_selector_list
-                # ロケータ
-                for locator in other_and_selector.locators:
-                    and_selector_list = self.get_map_and_append(locator)
-                    base_and_selector_list += and_selector_list
-                # テキスト
-                for text in other_and_selector.texts:
-                    and_selector_list = self.get_map_and_append(text)
-                    base_and_selector_list += and_selector_list
-            self.and_selector_list = base_and_selector_list
-            return
-        # (A1 or A2 or .. or An) and B ⇔ (A1 and B) or (A2 and B) or .. or (An and B)
-        self.and_selector_list = self.get_map_and_append(cond)
-
-    def add(self, cond: Cond):
-        """和結合。全てorが最前に来る形で格納。"""
-        if isinstance(cond, AllSelectorCond):
-            # (A1 or A2 or .. or An) or (B1 or B2 or .. or Bn) ⇔ A1 or A2 or .. or An or B1 or B2 or .. or Bn
-            self.and_selector_list += cond.and_selector_list
-            return
-        # (A1 or A2 or .. or An) or B ⇔ A1 or A2 or .. or An or B
-        and_selector = AndSelector()
-        and_selector.append(cond)
-        self.append(and_selector)
+    """Cond結合時の姿。全てorが最前に来る形(ANDのOR)で持つ"""
+
+    and_selector_list: tuple[AndSelector, ...] = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, "and_selector_list", tuple(self.and_selector_list))
+
+    def to_all_selector(self) -> AllSelectorCond:
+        return self
+
+    def mul(self, cond: Cond) -> AllSelectorCond:
+        """積結合"""
+        other = cond.to_all_selector()
+        # (A1 or A2 or .. or An) and (B1 or B2 or .. or Bm) ⇔ or(i:1→n)or(j:1→m)(Ai and Bj)
+        and_selector_list = tuple(
+            and_selector.merge(other_and_selector)
+            for and_selector in self.and_selector_list
+            for other_and_selector in other.and_selector_list
+        )
+        return AllSelectorCond(and_selector_list)
+
+    def add(self, cond: Cond) -> AllSelectorCond:
+        """和結合"""
+        # (A1 or A2 or .. or An) or (B1 or B2 or .. or Bm) ⇔ A1 or A2 or .. or An or B1 or B2 or .. or Bm
+        return AllSelectorCond(self.and_selector_list + cond.to_all_selector().and_selector_list)
+
+
+@lru_cache(maxsize=4096)
+def compile_xpath(all_selector: AllSelectorCond, axis: Literal[".//", "self::"], optimize: bool = True) -> str:
+    """
+    xpathを組み立てる
+    条件の構造をキーにキャッシュするので、ループ内で同じ条件を作り直しても組み立ては1回だけ
+    """
+    xpath_maker = XpathMaker(axis=axis, optimize=optimize)
+    return xpath_maker.get_xpath(all_selector.and_selector_list)
+
+
+@lru_cache(maxsize=4096)
+def compile_css(all_selector: AllSelectorCond) -> str | None:
+    """CSSセレクタを組み立てる。CSSで書けない条件ならNone"""
+    css_maker = CssMaker()
+    return css_maker.get_css(all_selector.and_selector_list)
+
+
+class CondOptimizer:
+    """
+    xpathを出す前にANDのORを整理する
+    &で積結合すると分岐が掛け算で増えるので、結果が変わらない範囲で分岐を減らす
+    """
+
+    def simplify(self, and_selector_list: tuple[AndSelector, ...]) -> list[AndSelector]:
+        """重複した分岐と、より緩い分岐に含まれる分岐を除く"""
+        and_selector_list = [self.dedup(and_selector) for and_selector in and_selector_list]
+        simple_and_selector_list = []
+        for i, and_selector in enumerate(and_selector_list):
+            for j, other_and_selector in enumerate(and_selector_list):
+                if i == j or not self.is_subsumed(and_selector, other_and_selector):
+                    continue
+                # 互いに含む(=同じ条件)なら先に出てきた方を残す
+                if not self.is_subsumed(other_and_selector, and_selector) or j < i:
+                    break
+            else:
+                simple_and_selector_list.append(and_selector)
+        return simple_and_selector_list
+
+    def dedup(self, and_selector: AndSelector) -> AndSelector:
+        """1つの分岐内の重複した条件を除く"""
+        locators = tuple(dict.fromkeys(and_selector.locators))
+        texts = tuple(dict.fromkeys(and_selector.texts))
+        return AndSelector(and_selector.tag, locators, texts)
+
+    def is_subsumed(self, and_selector: AndSelector, other_and_selector: AndSelector) -> bool:
+        """and_selectorに合う要素が必ずother_and_selectorにも合うか"""
+        if not other_and_selector.tag is None:
+            if and_selector.tag is None or and_selector.tag.name != other_and_selector.tag.name:
+                return False
+        if not set(other_and_selector.locators) <= set(and_selector.locators):
+            return False
+        return set(other_and_selector.texts) <= set(and_selector.texts)
+
+    def group_by_tag(self, and_selector_list: list[AndSelector]) -> dict[str | None, list[AndSelector]]:
+        """同じタグの分岐をまとめる。1つの.//tag[...]にできる"""
+        and_selector_group_dict: dict[str | None, list[AndSelector]] = {}
+        for and_selector in and_selector_list:
+            tag_name = None if and_selector.tag is None else and_selector.tag.name
+            and_selector_group_dict.setdefault(tag_name, []).append(and_selector)
+        return and_selector_group_dict
 
 
 class XpathMaker:
-    def get_xpath(self, and_selector_list: list[AndSelector]) -> str:
+    def __init__(self, axis: Literal[".//", "self::"] = ".//", optimize: bool = True):
+        # ".//"なら子孫から探す。"self::"なら自身が条件に合うかを見る
+        self.axis = axis
+        # Falseなら分岐をそのまま|でつなぐ(CondOptimizerを通さない)
+        self.optimize = optimize
+
+    def get_xpath(self, and_selector_list: tuple[AndSelector, ...]) -> str:
+        if not self.optimize:
+            return " | ".join(self.get_and_xpath(and_selector) for and_selector in and_selector_list)
+
+        optimizer = CondOptimizer()
+        and_selector_group_dict = optimizer.group_by_tag(optimizer.simplify(and_selector_list))
         and_xpath_list = []
-        for and_selector in and_selector_list:
-            and_xpath = self.get_and_xpath(and_selector)
+        for and_selector_group in and_selector_group_dict.values():
+            and_xpath = self.get_group_xpath(and_selector_group)
             and_xpath_list.append(and_xpath)
         xpath = " | ".join(and_xpath_list)
         return xpath
 
+    def get_group_xpath(self, and_selector_group: list[AndSelector]) -> str:
+        """同じタグの分岐を.//tag[(p1) or (p2)]の形にする"""
+        tag_xpath = self.get_tag_xpath(and_selector_group[0].tag)
+        cond_list_list = [[*and_selector.locators, *and_selector.texts] for and_selector in and_selector_group]
+        predicate = self.get_factored_xpath(cond_list_list)
+        if predicate is None:
+            return tag_xpath
+        return f"{tag_xpath}[{predicate}]"
+
+    def get_factored_xpath(self, cond_list_list: list[list[LocatorCond | TextCond]]) -> str | None:
+        """
+        (c1 and c2) or (c1 and c3)のようなORを、共通の条件でくくって c1 and ((c2) or (c3)) にする
+        常に真ならNone
+        """
+        # 条件なしの分岐がある ⇒ 常に真
+        if any(cond_list.__len__() == 0 for cond_list in cond_list_list):
+            return None
+        if cond_list_list.__len__() == 1:
+            return " and ".join(self.get_cond_xpath(cond) for cond in cond_list_list[0])
+
+        # 全分岐に共通の条件でくくる
+        common_cond_list = [cond for cond in cond_list_list[0] if all(cond in other for other in cond_list_list[1:])]
+        if common_cond_list.__len__() != 0:
+            rest_cond_list_list = [
+                [cond for cond in cond_list if cond not in common_cond_list] for cond_list in cond_list_list
+            ]
+            parts = [self.get_cond_xpath(cond) for cond in common_cond_list]
+            rest_xpath = self.get_factored_xpath(rest_cond_list_list)
+            if not rest_xpath is None:
+                parts.append(f"({rest_xpath})")
+            return " and ".join(parts)
+
+        # 一番多くの分岐に出てくる条件でくくる
+        count_dict: dict[LocatorCond | TextCond, int] = {}
+        for cond_list in cond_list_list:
+            for cond in cond_list:
+                count_dict[cond] = count_dict.get(cond, 0) + 1
+        cond, count = max(count_dict.items(), key=lambda item: item[1])
+        if count == 1:
+            return " or ".join(f"({self.get_factored_xpath([cond_list])})" for cond_list in cond_list_list)
+        with_cond_list_list = [cond_list for cond_list in cond_list_list if cond in cond_list]
+        without_cond_list_list = [cond_list for cond_list in cond_list_list if cond not in cond_list]
+        with_xpath = self.get_factored_xpath(with_cond_list_list)
+        without_xpath = self.get_factored_xpath(without_cond_list_list)
+        return f"({with_xpath}) or ({without_xpath})"
+
+    def get_cond_xpath(self, cond: LocatorCond | TextCond) -> str:
+        if isinstance(cond, LocatorCond):
+            return self.get_locator_xpath(cond)
+        return self.get_text_xpath(cond)
+
     def get_and_xpath(self, and_selector: AndSelector) -> str:
         tag_xpath = self.get_tag_xpath(and_selector.tag)
         parts = []
@@ -210,9 +306,9 @@ class XpathMaker:
 
     def get_tag_xpath(self, tag: TagCond | None) -> str:
         if tag is None:
-            tag_xpath = ".//*"
+            tag_xpath = f"{self.axis}*"
         else:
-            tag_xpath = f".//{tag.name}"
+            tag_xpath = f"{self.axis}{tag.name}"
         return tag_xpath
 
     def get_locator_xpath(self, locator: LocatorCond) -> str:
@@ -227,7 +323,8 @@ class XpathMaker:
             return f"starts-with({attr_name}, {quote_value})"
         if locator.match == "endswith":
             # XPath 1.0 に ends-with は無いので substring で頑張る
-            n = len(quote_value)
+            # クォート込みの長さではなく値そのものの長さで切り出す
+            n = len(locator.value)
             # substring(@attr, string-length(@attr) - (n-1)) = 'xxx'
             return f"substring({attr_name}, string-length({attr_name}) - {n - 1}) = {quote_value}"
 
@@ -263,3 +360,70 @@ class XpathMaker:
                 # シングルクォート文字そのもの
                 concat_parts.append('"\'"')
         return f"concat({', '.join(concat_parts)})"
+
+
+class CssMaker:
+    """
+    CSSセレクタを組み立てる
+    タグとロケータ(equals/contains/startswith/endswith)だけの条件は[a=v] [a*=v] [a^=v] [a$=v]にそのまま対応する
+    """
+
+    # エスケープなしで書けるタグ名・属性名
+    IDENTIFIER_PATTERN = re.compile(r"-?[A-Za-z_][A-Za-z0-9_-]*")
+    MATCH_OPERATOR_DICT = {"equals": "=", "contains": "*=", "startswith": "^=", "endswith": "$="}
+
+    def get_css(self, and_selector_list: tuple[AndSelector, ...]) -> str | None:
+        if and_selector_list.__len__() == 0:
+            return None
+        and_css_list = []
+        for and_selector in CondOptimizer().simplify(and_selector_list):
+            and_css = self.get_and_css(and_selector)
+            if and_css is None:
+                return None
+            and_css_list.append(and_css)
+        return ", ".join(and_css_list)
+
+    def get_and_css(self, and_selector: AndSelector) -> str | None:
+        # テキスト条件はCSSにない
+        if and_selector.texts.__len__() != 0:
+            return None
+        tag_css = self.get_tag_css(and_selector.tag)
+        if tag_css is None:
+            return None
+        parts = [tag_css]
+        for locator in and_selector.locators:
+            locator_css = self.get_locator_css(locator)
+            if locator_css is None:
+                return None
+            parts.append(locator_css)
+        return "".join(parts)
+
+    def get_tag_css(self, tag: TagCond | None) -> str | None:
+        if tag is None:
+            return "*"
+        if not self.IDENTIFIER_PATTERN.fullmatch(tag.name):
+            return None
+        return tag.name
+
+    def get_locator_css(self, locator: LocatorCond) -> str | None:
+        if not self.IDENTIFIER_PATTERN.fullmatch(locator.name):
+            return None
+        if locator.match not in self.MATCH_OPERATOR_DICT:
+            return None
+        # xpathのcontains(@a, '')などは属性がなくても真だが、CSSの[a*=""]は何にも当たらないので任せない
+        if locator.value == "" and locator.match != "equals":
+            return None
+        operator = self.MATCH_OPERATOR_DICT[locator.match]
+        return f"[{locator.name}{operator}{self.quote_value(locator.value)}]"
+
+    def quote_value(self, value: str) -> str:
+        """CSSの文字列リテラル。\\と"はエスケープ、制御文字はコードポイントで書く"""
+        chars = []
+        for char in value:
+            if char in ('"', "\\"):
+                chars.append(f"\\{char}")
+            elif ord(char) < 0x20 or ord(char) == 0x7F:
+                chars.append(f"\\{ord(char):x} ")
+            else:
+                chars.append(char)
+        return f'"{"".join(chars)}"'
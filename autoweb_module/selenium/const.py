@@ -13,3 +13,74 @@ LOCATOR_DICT = {
     "plink": By.PARTIAL_LINK_TEXT,
     "class": By.CLASS_NAME,
 }
+# get_attributeで"true"かNoneを返す属性(seleniumのgetAttribute.jsと同じ)
+BOOLEAN_ATTRIBUTE_NAME_LIST = [
+    "allowfullscreen",
+    "allowpaymentrequest",
+    "allowusermedia",
+    "async",
+    "autofocus",
+    "autoplay",
+    "checked",
+    "compact",
+    "complete",
+    "controls",
+    "declare",
+    "default",
+    "defaultchecked",
+    "defaultselected",
+    "defer",
+    "disabled",
+    "ended",
+    "formnovalidate",
+    "hidden",
+    "indeterminate",
+    "iscontenteditable",
+    "ismap",
+    "itemscope",
+    "loop",
+    "multiple",
+    "muted",
+    "nohref",
+    "nomodule",
+    "noresize",
+    "noshade",
+    "novalidate",
+    "nowrap",
+    "open",
+    "paused",
+    "playsinline",
+    "pubdate",
+    "readonly",
+    "required",
+    "reversed",
+    "scoped",
+    "seamless",
+    "seeking",
+    "selected",
+    "truespeed",
+    "typemustmatch",
+    "willvalidate",
+]
+# get_attributeでページのURLを基準にした絶対URLが返る属性
+URL_ATTRIBUTE_NAME_LIST = ["href", "src"]
+# ResourceBlockerのプリセット。resource_typesはCDPのNetwork.ResourceType、url_patternsはNetwork.setBlockedURLsのワイルドカード
+TRACKER_URL_PATTERN_LIST = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googlesyndication.com*",
+    "*doubleclick.net*",
+    "*connect.facebook.net*",
+    "*analytics.twitter.com*",
+    "*clarity.ms*",
+    "*hotjar.com*",
+]
+BLOCK_PRESET_DICT = {
+    "no-media": {"resource_types": ["Image", "Media", "Font"], "url_patterns": []},
+    "text-only": {
+        "resource_types": ["Image", "Media", "Font", "Stylesheet", "TextTrack", "Manifest", "Ping"],
+        "url_patterns": TRACKER_URL_PATTERN_LIST,
+    },
+}
+# save_ssの形式ごとの拡張子
+SS_SUFFIX_DICT = {"png": ".png", "jpeg": ".jpg", "webp": ".webp", "pdf": ".pdf"}
@@ -0,0 +1,143 @@
+# 標準ライブラリ
+from collections import deque
+from collections.abc import Callable, Iterator
+from typing import TypeVar
+import uuid
+
+# 外部ライブラリ
+from selenium.common.exceptions import JavascriptException, TimeoutException, WebDriverException
+
+# 自作ライブラリ
+from autoweb_module.selenium import script, wait
+from autoweb_module.selenium.cond import Cond
+from autoweb_module.selenium.element import Element
+from autoweb_module.selenium.tabs import TabManager
+
+T = TypeVar("T")
+
+
+def crawl_pages(
+    tabs: TabManager,
+    extract: Callable[[Element], T],
+    next_page: Cond,
+    ready: Cond | None = None,
+    max_pages: int | None = None,
+    lookahead: int = 1,
+    wait_time: int | float | None = None,
+    changed: Cond | None = None,
+) -> Iterator[T]:
+    """
+    今のページから「次へ」をたどり、ページごとにextract(driver)の結果を返すジェネレータ
+    next_pageに合う要素がリンクなら、今のページをextractしている間に次のページを別タブで読み込んでおく
+    lookaheadは先読みしておくタブの数の上限。0なら先読みせず同じタブで移動する
+    2以上にすると、先読み済みのタブが読み込み終わっていればそこからさらに次を開く(page_load_strategy="none"推奨)
+    リンクでない(ボタンなど)ときは同じタブでクリックして待つ
+    ページの準備はgotoと同じく、readyに合う要素が現れるかDOMContentLoadedの早いほう
+    読み終わったタブは閉じていくので、終わると最後のページのタブだけが残る。途中でやめても先読みのタブは閉じる
+    「次へ」が遷移せず、XHRやpushStateで同じページのまま中身だけ入れ替えるサイトでは、入れ替わる要素(一覧の行など)をchangedに渡す
+    クリック前にchangedに合った最初の要素が別の要素に替わったら次のページとみなす(readyは見ない)
+    changedなしで同じページのまま時間切れになったら、その旨のTimeoutExceptionを出す
+    """
+    if lookahead < 0:
+        raise ValueError(f"lookaheadは0以上です。: {lookahead}")
+    driver = tabs.driver
+    web_driver = driver.driver
+    wait_time = driver._get_temp_wait_time(wait_time)
+    selector_list = [] if ready is None else [list(ready.selector)]
+    next_selector_list = [list(next_page.selector)]
+    changed_selector_list = [] if changed is None else [list(changed.selector)]
+    current = tabs.sync()
+    prefetch_queue: deque[str] = deque()  # 先読み中のタブ。ページ順
+    dead_end_set: set[str] = set()  # これ以上先読みできないタブ(最後のページかリンクでない)
+    page_count = 0  # 今のページまでの数
+
+    def within_max_pages() -> bool:
+        return max_pages is None or page_count + prefetch_queue.__len__() < max_pages
+
+    def fill_prefetch(peek: bool):
+        """先読みをlookaheadまで増やす。peekなら先読み済みのタブも(読み込み終わっていれば)見る"""
+        while prefetch_queue.__len__() < lookahead and within_max_pages():
+            tail = prefetch_queue[-1] if prefetch_queue.__len__() > 0 else current
+            if tail in dead_end_set or (tail != current and not peek):
+                break
+            if tail != current and not tabs.is_loaded(tail, ready):
+                break
+            tabs.switch(tail)
+            link = web_driver.execute_script(script.NEXT_PAGE_JS, next_selector_list)
+            if link is None or link[1] is None:
+                dead_end_set.add(tail)
+                break
+            prefetch_queue.append(tabs.open(link[1]))
+        tabs.switch(current)
+
+    def same_page(token: str) -> bool:
+        """クリックの前の印が残っている(遷移していない)か"""
+        try:
+            return web_driver.execute_script(script.PAGE_MARKED_JS, token)
+        except JavascriptException:
+            return False
+
+    def move_in_tab() -> bool:
+        """先読みがないとき、同じタブで次のページへ。次がなければFalse"""
+        link = web_driver.execute_script(script.NEXT_PAGE_JS, next_selector_list)
+        if link is None:
+            return False
+        web_elem, url = link
+        if not url is None:
+            driver.goto(url, ready, wait_time)
+            return True
+        token = uuid.uuid4().hex
+        web_driver.execute_script(script.NEXT_PAGE_MARK_JS, token, changed_selector_list)
+        web_driver.execute_script("arguments[0].click();", web_elem)
+
+        def ready_state() -> list | None:
+            try:
+                state = web_driver.execute_script(script.NEXT_PAGE_STATE_JS, token, selector_list, changed_selector_list)
+            except JavascriptException:
+                # 遷移の途中
+                return None
+            if state is None or (not state[0] and state[1] is None):
+                return None
+            return state
+
+        try:
+            wait.poll_until(
+                ready_state, wait_time, driver.wait_strategy, f"{wait_time}秒待っても次のページに移りませんでした。"
+            )
+        except TimeoutException:
+            if changed is None and same_page(token):
+                raise TimeoutException(
+                    f"{wait_time}秒待っても次のページに移りませんでした。"
+                    "「次へ」を押しても同じページのままです。中身だけ入れ替えるページならchangedを指定してください。"
+                )
+            raise
+        dead_end_set.discard(current)
+        return True
+
+    try:
+        while True:
+            page_count += 1
+            fill_prefetch(peek=False)
+            result = extract(driver)
+            # extractの中でタブを切り替えていても、TabManagerの覚えている今のタブを合わせておく
+            tabs.sync()
+            fill_prefetch(peek=True)
+            yield result
+            tabs.sync()
+            tabs.switch(current)
+            if not max_pages is None and page_count >= max_pages:
+                return
+            if prefetch_queue.__len__() == 0:
+                if not move_in_tab():
+                    return
+                continue
+            previous = current
+            current = prefetch_queue.popleft()
+            tabs.close(previous, switch_to=current)
+            tabs.wait_ready(current, ready, wait_time)
+    finally:
+        for handle in prefetch_queue:
+            try:
+                tabs.close(handle, switch_to=current)
+            except WebDriverException:
+                pass
@@ -0,0 +1,165 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+import threading
+import time
+
+# 外部ライブラリ
+from selenium.common.exceptions import TimeoutException
+
+# 自作ライブラリ
+from autoweb_module.exceptions import DownloadCanceledError
+from autoweb_module.selenium.cdp import CdpConnection
+
+
+@dataclass(eq=False)
+class Download:
+    """
+    1件のダウンロード。CDPのBrowser.downloadProgressイベントで随時更新される
+    futureは完了で保存先のPath、キャンセルでDownloadCanceledErrorになる
+    """
+
+    guid: str
+    url: str
+    suggested_filename: str
+    total_bytes: int = 0  # 不明なら0
+    received_bytes: int = 0
+    state: Literal["inProgress", "completed", "canceled"] = "inProgress"
+    future: Future[Path] = field(default_factory=Future, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    @property
+    def progress(self) -> float | None:
+        """0〜1。サイズ不明ならNone"""
+        if self.total_bytes == 0:
+            return None
+        return self.received_bytes / self.total_bytes
+
+    def result(self, wait_time: int | float | None = None) -> Path:
+        """完了を待って保存先を返す。raise: TimeoutException, DownloadCanceledError"""
+        try:
+            return self.future.result(timeout=wait_time)
+        except FutureTimeoutError:
+            raise TimeoutException(f"{wait_time}秒待ってもダウンロードが終わりませんでした。: {self.suggested_filename}")
+
+
+class DownloadTracker:
+    """
+    ブラウザのダウンロードイベントでダウンロードを追う
+    フォルダを見張るFindDiffPathと違い、同じフォルダへの同時ダウンロードでも取り違えず、進捗もわかる
+    ダウンロードは一旦guidの名前で保存され、完了時にsuggested_filename(重複すれば「 (1)」などを付ける)へ名前を変える
+    """
+
+    def __init__(self, connection: CdpConnection, download_folder: Path | str):
+        self.connection = connection
+        self.download_folder = Path(download_folder)
+        self.download_folder.mkdir(parents=True, exist_ok=True)
+        self._download_dict: dict[str, Download] = {}
+        # クリックなどで「これから始まるはず」のダウンロード待ち。始まった順に割り当てる
+        self._expect_deque: deque[Future[Download]] = deque()
+        self._lock = threading.Lock()
+
+        self.connection.on("Browser.downloadWillBegin", self._on_will_begin)
+        self.connection.on("Browser.downloadProgress", self._on_progress)
+        self.connection.send(
+            "Browser.setDownloadBehavior",
+            {"behavior": "allowAndName", "downloadPath": self.download_folder.__str__(), "eventsEnabled": True},
+        )
+
+    @property
+    def downloads(self) -> list[Download]:
+        """これまでに始まったダウンロード全部"""
+        with self._lock:
+            return list(self._download_dict.values())
+
+    def expect(self) -> Future[Download]:
+        """
+        次に始まるダウンロードを受け取るFutureを返す。ダウンロードを起こす操作の直前に呼ぶ
+        使わなくなったら(時間切れなど)cancelすれば待ちから外れ、以降のダウンロードは割り当てられない
+        """
+        future: Future[Download] = Future()
+        with self._lock:
+            self._expect_deque.append(future)
+        future.add_done_callback(self._discard_expect)
+        return future
+
+    def _discard_expect(self, future: Future[Download]):
+        """キャンセルされた待ちを外す。残しておくと、次のダウンロードの割り当てで1件ずれる"""
+        with self._lock:
+            try:
+                self._expect_deque.remove(future)
+            except ValueError:
+                # 割り当て済み
+                pass
+
+    def wait_all(self, wait_time: int | float | None = None) -> list[Path]:
+        """今始まっているダウンロードがすべて終わるまで待つ。キャンセルされたものは含めない"""
+        deadline = None if wait_time is None else time.monotonic() + wait_time
+        path_list = []
+        for download in self.downloads:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                path_list.append(download.result(remaining))
+            except DownloadCanceledError:
+                pass
+        return path_list
+
+    def close(self):
+        """イベントの受け取りをやめる。接続は閉じない"""
+        self.connection.off("Browser.downloadWillBegin", self._on_will_begin)
+        self.connection.off("Browser.downloadProgress", self._on_progress)
+        with self._lock:
+            expect_list = list(self._expect_deque)
+            self._expect_deque.clear()
+        for future in expect_list:
+            future.cancel()
+
+    # ---------------イベント---------------
+    def _on_will_begin(self, params: dict, session_id: str | None):
+        download = Download(guid=params["guid"], url=params["url"], suggested_filename=params["suggestedFilename"])
+        with self._lock:
+            self._download_dict[download.guid] = download
+            # キャンセル済みの待ちは飛ばす
+            while self._expect_deque.__len__() > 0:
+                future = self._expect_deque.popleft()
+                if future.set_running_or_notify_cancel():
+                    break
+            else:
+                future = None
+        if not future is None:
+            future.set_result(download)
+
+    def _on_progress(self, params: dict, session_id: str | None):
+        with self._lock:
+            download = self._download_dict.get(params["guid"])
+        if download is None or download.done:
+            return
+        download.total_bytes = int(params.get("totalBytes", download.total_bytes))
+        download.received_bytes = int(params.get("receivedBytes", download.received_bytes))
+        download.state = params["state"]
+        match download.state:
+            case "completed":
+                try:
+                    download.future.set_result(self._rename(download))
+                except OSError as e:
+                    download.future.set_exception(e)
+            case "canceled":
+                download.future.set_exception(DownloadCanceledError(f"ダウンロードがキャンセルされました。: {download.url}"))
+
+    def _rename(self, download: Download) -> Path:
+        """guidの名前で保存されたファイルを、かぶらない名前にする"""
+        src = self.download_folder / download.guid
+        name = Path(download.suggested_filename).name or "download"
+        dest = self.download_folder / name
+        count = 1
+        while dest.exists():
+            dest = self.download_folder / f"{Path(name).stem} ({count}){Path(name).suffix}"
+            count += 1
+        return src.rename(dest)
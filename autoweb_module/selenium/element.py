@@ -1,9 +1,14 @@
 # 標準ライブラリ
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Self, Literal
+from typing import Self, Literal, Callable, Any, Iterator
+from contextlib import contextmanager
 from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import base64
+import functools
+import time
+import uuid
 
 # 外部ライブラリ
 # element系
@@ -12,11 +17,16 @@ from selenium.webdriver.remote.webelement import WebElement
 
 
 # 例外系
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    StaleElementReferenceException,
+    JavascriptException,
+    WebDriverException,
+)
 
 # 待機系
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select
 
 # その他
 from selenium.webdriver import Keys, ActionChains
@@ -31,17 +41,53 @@ from autoweb_module.selenium.const import (
     INPUTABLE_TAG_NAME_LIST,
     FRAME_TAG_NAME_LIST,
     SELECT_TAG_NAME_LIST,
+    SS_SUFFIX_DICT,
 )
-from autoweb_module.exceptions import DifferenceTagError, NotWebElementError
+from autoweb_module.selenium import script, wait
+from autoweb_module.selenium.wait import WaitStrategy, CondMatch
+from autoweb_module.exceptions import DifferenceTagError, NotWebElementError, FormFillError
 from autoweb_module.selenium.cond import Cond, TagCond, LocatorCond, TextCond, AllSelectorCond
+from autoweb_module.selenium.element_list import ElementList
+from autoweb_module.selenium.snapshot import Snapshot
+from autoweb_module.selenium.download import Download, DownloadTracker
+from autoweb_module.selenium import profiler
+from autoweb_module.selenium.profiler import CommandStats
+from autoweb_module.selenium.writer import BackgroundWriter, write_text_in_chunks
+
+
+def clear_cache_on_stale(method: Callable) -> Callable:
+    """古い参照になったらElementのキャッシュを捨てるデコレータ"""
+
+    @functools.wraps(method)
+    def wrapper(self: "Element", *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except StaleElementReferenceException:
+            self.clear_cache()
+            raise
+
+    return wrapper
 
 
-@dataclass
+@dataclass(eq=False)
 class Element(time_module.MutableWaitTimeAttrClass):
+    """
+    WebDriver/WebElementのラッパー
+    サブクラスを@dataclassにするときは@dataclass(eq=False)にする。eq=Trueだとフィールドを比べる__eq__が作られ、
+    __hash__がNoneになって、fill_formのキーなどに使えなくなる
+    """
+
     elem: WebDriver | WebElement
     debug_mode: bool
     save_folder: Path | None
     _wait_time: int | float | time_module.MutableWaitTime
+    wait_strategy: WaitStrategy = field(default_factory=WaitStrategy)
+    download_tracker: DownloadTracker | None = None  # あればダウンロードをブラウザのイベントで追う
+    writer: BackgroundWriter | None = None  # あればsave_ss/save_htmlの書き込みを別スレッドでやる
+    # タグ名など、そのWebElementが生きている間は変わらない値のキャッシュ。find_elemsで大量に作るので使うときに作る
+    _cache: dict[str, Any] | None = field(default=None, init=False, repr=False)
+    _cache_hit: int = field(default=0, init=False, repr=False)
+    _cache_miss: int = field(default=0, init=False, repr=False)
 
     def __post_init__(self):
         # WebDriverを取得
@@ -66,12 +112,21 @@ class Element(time_module.MutableWaitTimeAttrClass):
         # WebDriver, WebElementの組み合わせ
         return False
 
+    def __hash__(self) -> int:
+        # eqに合わせて、WebDriverはどれも同じ、WebElementはそのhash
+        if self.is_web_driver:
+            return hash(WebDriver)
+        return hash(self.elem)
+
     def _get_new_element(
         self,
         elem: WebDriver | WebElement | None = None,
         save_folder: Path | None = None,
         debug_mode: bool | None = None,
         _wait_time: time_module.MutableWaitTime | None = None,
+        wait_strategy: WaitStrategy | None = None,
+        download_tracker: DownloadTracker | None = None,
+        writer: BackgroundWriter | None = None,
     ) -> Self:
         """ここで新規Elementを生成。wait_timeなどのイミュータブルはある"""
         if elem is None:
@@ -82,8 +137,59 @@ class Element(time_module.MutableWaitTimeAttrClass):
             _wait_time = self._wait_time
         if save_folder is None:
             save_folder = self.save_folder
+        if wait_strategy is None:
+            wait_strategy = self.wait_strategy
+        if download_tracker is None:
+            download_tracker = self.download_tracker
+        if writer is None:
+            writer = self.writer
+
+        cls = self.__class__
+        if (
+            elem.__class__ is WebElement
+            and cls.__init__ is Element.__init__
+            and cls.__post_init__ is Element.__post_init__
+            and elem.parent is self.driver
+        ):
+            return self._new_child(elem, debug_mode, _wait_time, save_folder, wait_strategy, download_tracker, writer)
+
+        element = cls(
+            elem=elem,
+            _wait_time=_wait_time,
+            debug_mode=debug_mode,
+            save_folder=save_folder,
+            wait_strategy=wait_strategy,
+            download_tracker=download_tracker,
+            writer=writer,
+        )
+        return element
 
-        element = self.__class__(elem=elem, _wait_time=_wait_time, debug_mode=debug_mode)
+    def _new_child(
+        self,
+        elem: WebElement,
+        debug_mode: bool,
+        _wait_time: int | float | time_module.MutableWaitTime,
+        save_folder: Path | None,
+        wait_strategy: WaitStrategy,
+        download_tracker: DownloadTracker | None,
+        writer: BackgroundWriter | None,
+    ) -> Self:
+        """
+        _get_new_elementの近道。__init__と__post_init__を通さずに、同じdriverのWebElementのElementを作る
+        elemの型とdriverは呼ぶ側で確認済みなので、__post_init__の確認を省ける。find_elemsで1万件作るときなどに効く
+        __init__や__post_init__を変えたサブクラスでは使わない(それを動かすため通常どおり作る)
+        """
+        element = object.__new__(self.__class__)
+        # __init__と同じ順に代入する(インスタンス辞書のキー共有が効いてメモリが減る)
+        element.elem = elem
+        element.debug_mode = debug_mode
+        element.save_folder = save_folder
+        element._wait_time = _wait_time
+        element.wait_strategy = wait_strategy
+        element.download_tracker = download_tracker
+        element.writer = writer
+        element.driver = self.driver
+        element.wait_time = _wait_time
         return element
 
     # ---------------find_elem系---------------
@@ -96,7 +202,7 @@ class Element(time_module.MutableWaitTimeAttrClass):
         """seleniumのfind_elemnetメソッドのラッパー"""
         by = LOCATOR_DICT[locator]
 
-        elem = self._find_and_wait_elem(by, attr, wait_time)
+        elem = self._find_and_wait_elem(locator, attr, wait_time)
         # wait_timeが0の場合
         if elem is None:
             elem = self.elem.find_element(by, attr)  # raise: NoSuchElementException, StaleElementReferenceException
@@ -107,24 +213,44 @@ class Element(time_module.MutableWaitTimeAttrClass):
         locator: Literal["id", "name", "tag", "xpath", "css", "link", "plink", "class"],
         attr: str,
         wait_time: int | float | None = None,
-    ) -> list[Self]:
-        """seleniumのfind_elemnetsメソッドのラッパー"""
+        min_count: int = 1,
+        stable_time: int | float | None = None,
+    ) -> ElementList:
+        """
+        seleniumのfind_elemnetsメソッドのラッパー。Elementはアクセス時に作られる
+        待機した場合は、待機を満たした検索結果をそのまま返す(探し直さない)
+        min_count: この数以上見つかるまで待つ
+        stable_time: 見つかってから件数がこの秒数変わらなくなるまで待つ(無限スクロールの読み込み待ちなど)
+        時間切れなら、その時点で見つかっている要素を返す
+        """
         by = LOCATOR_DICT[locator]
-        try:
-            self._find_and_wait_elem(by, attr, wait_time)
-            # wait_timeが0の場合または待機して要素が1つ以上見つかった場合
+        wait_time = self._get_temp_wait_time(wait_time)
+        if wait_time == 0:
             elem_list = self.elem.find_elements(by, attr)
-        except TimeoutException:
-            # 待機して要素が見つからなかった場合
-            elem_list = []
+        else:
+            try:
+                elem_list = self._wait_elems(locator, attr, wait_time, min_count, stable_time)
+            except TimeoutException:
+                # 1件もなければ探し直すまでもない
+                elem_list = [] if min_count <= 1 and stable_time is None else self.elem.find_elements(by, attr)
 
-        return [self._get_new_element(elem=elem) for elem in elem_list]
+        return ElementList(origin=self, web_elems=elem_list)
 
     def find_cond_elem(self, cond: Cond, wait_time: int | float | None = None) -> Self:
-        return self.find_elem("xpath", cond.xpath, wait_time=wait_time)
+        """condで検索。CSSセレクタで書ける条件ならCSS、書けなければxpathで探す"""
+        locator, selector = cond.selector
+        return self.find_elem(locator, selector, wait_time=wait_time)
 
-    def find_cond_elems(self, cond: Cond, wait_time: int | float | None = None) -> list[Self]:
-        return self.find_elems("xpath", cond.xpath, wait_time=wait_time)
+    def find_cond_elems(
+        self,
+        cond: Cond,
+        wait_time: int | float | None = None,
+        min_count: int = 1,
+        stable_time: int | float | None = None,
+    ) -> ElementList:
+        """condで検索。CSSセレクタで書ける条件ならCSS、書けなければxpathで探す。引数はfind_elemsと同じ"""
+        locator, selector = cond.selector
+        return self.find_elems(locator, selector, wait_time=wait_time, min_count=min_count, stable_time=stable_time)
 
     def find_locator_elem(
         self,
@@ -142,7 +268,7 @@ class Element(time_module.MutableWaitTimeAttrClass):
         value: str,
         match: Literal["equals", "contains", "startswith", "endswith"] = "equals",
         wait_time: int | float | None = None,
-    ) -> list[Self]:
+    ) -> ElementList:
         locator = LocatorCond(name, value, match)
         return self.find_cond_elems(locator, wait_time=wait_time)
 
@@ -160,20 +286,140 @@ class Element(time_module.MutableWaitTimeAttrClass):
         value: str,
         match: Literal["equals", "contains", "startswith", "endswith"] = "equals",
         wait_time: int | float | None = None,
-    ) -> list[Self]:
+    ) -> ElementList:
         text = TextCond(value, match)
         return self.find_cond_elems(text, wait_time=wait_time)
 
-    def _find_and_wait_elem(self, by: str, attr: str, wait_time: int | float | None) -> WebElement | None:
+    def wait_any(self, conds: list[Cond], wait_time: int | float | None = None) -> CondMatch:
+        """
+        condsのどれか1つに合う要素が現れるまで待ち、どの条件に合ったかと要素を返す
+        全条件を1回の問い合わせ(observeなら1つのMutationObserver)でまとめて見るので、待ち時間が条件の数だけ積み上がらない
+        同時に複数合った場合はcondsで先にある条件
+        """
+        found_list = self._wait_conds(conds, "any", wait_time)
+        for index, (cond, web_elem) in enumerate(zip(conds, found_list)):
+            if not web_elem is None:
+                return CondMatch(index=index, cond=cond, elem=self._get_new_element(elem=web_elem))
+
+    def wait_all(self, conds: list[Cond], wait_time: int | float | None = None) -> list[Self]:
+        """condsの全部に合う要素がそろうまで待ち、condsの順に要素を返す"""
+        found_list = self._wait_conds(conds, "all", wait_time)
+        return [self._get_new_element(elem=web_elem) for web_elem in found_list]
+
+    def _wait_conds(
+        self, conds: list[Cond], mode: Literal["any", "all"], wait_time: int | float | None
+    ) -> list[WebElement | None]:
+        """raise: TimeoutException"""
+        if conds.__len__() == 0:
+            raise ValueError("condsが空です。")
+        wait_time = self._get_temp_wait_time(wait_time)
+        root = None if self.is_web_driver else self.elem
+        selector_list = [list(cond.selector) for cond in conds]
+        message = f"{wait_time}秒待っても条件({mode})に合う要素が見つかりませんでした。"
+        deadline = time.monotonic() + wait_time
+        if self.wait_strategy.mode == "observe":
+            try:
+                while True:
+                    chunk_seconds = min(max(deadline - time.monotonic(), 0), wait.OBSERVE_CHUNK_SECONDS)
+                    found_list = self.driver.execute_async_script(
+                        script.WAIT_CONDS_JS, root, selector_list, mode, int(chunk_seconds * 1000)
+                    )
+                    if not found_list is None:
+                        return found_list
+                    if time.monotonic() >= deadline:
+                        # 最後にpollで1回だけ探してからTimeoutException
+                        break
+            except (JavascriptException, TimeoutException):
+                # スクリプトのタイムアウトもseleniumではTimeoutException。pollで続ける
+                pass
+
+        def find() -> list[WebElement | None] | None:
+            found_list = self.driver.execute_script(script.FIND_CONDS_JS, root, selector_list)
+            match_list = [not web_elem is None for web_elem in found_list]
+            is_matched = any(match_list) if mode == "any" else all(match_list)
+            return found_list if is_matched else None
+
+        return wait.poll_until(find, max(deadline - time.monotonic(), 0), self.wait_strategy, message)
+
+    def _find_and_wait_elem(self, locator: str, attr: str, wait_time: int | float | None) -> WebElement | None:
         wait_time = self._get_temp_wait_time(wait_time)
         if wait_time == 0:
-            elem = None
-        else:
-            wait = WebDriverWait(self.elem, wait_time)
-            elem = wait.until(
-                EC.presence_of_element_located((by, attr))
-            )  # raise: TimeoutException, StaleElementReferenceException
-        return elem
+            return None
+        elem_list = self._wait_elems(locator, attr, wait_time, min_count=1)  # raise: TimeoutException
+        return elem_list[0]
+
+    def _wait_elems(
+        self,
+        locator: str,
+        attr: str,
+        wait_time: int | float,
+        min_count: int,
+        stable_time: int | float | None = None,
+    ) -> list[WebElement]:
+        """
+        min_count個以上見つかるまで待って、見つかった要素を全部返す
+        stable_timeがあれば、さらに件数がstable_time秒変わらなくなるまで待つ
+        wait_strategyがobserveならページ内のMutationObserverで、現れた瞬間に返す。使えなければpoll
+        """
+        message = f"{wait_time}秒待っても要素が見つかりませんでした。: {locator}={attr}"
+        deadline = time.monotonic() + wait_time
+        if self.wait_strategy.mode == "observe":
+            js_selector = wait.to_js_selector(locator, attr)
+            if not js_selector is None:
+                try:
+                    elem_list = self._observe_elems(*js_selector, min_count, stable_time, deadline)
+                    if not elem_list is None:
+                        return elem_list
+                except (JavascriptException, TimeoutException):
+                    # ページ側で使えなかったら(スクリプトのタイムアウトもseleniumではTimeoutException)pollで続ける
+                    pass
+
+        by = LOCATOR_DICT[locator]
+
+        def find() -> list[WebElement] | None:
+            elem_list = self.elem.find_elements(by, attr)  # raise: StaleElementReferenceException
+            if elem_list.__len__() < min_count:
+                return None
+            return elem_list
+
+        elem_list = wait.poll_until(find, max(deadline - time.monotonic(), 0), self.wait_strategy, message)
+        if stable_time is None:
+            return elem_list
+
+        # 件数が変わらなくなるまで
+        stable_start = time.monotonic()
+        for interval in self.wait_strategy.intervals():
+            now = time.monotonic()
+            stable_remaining = stable_time - (now - stable_start)
+            if stable_remaining <= 0 or now >= deadline:
+                return elem_list
+            time.sleep(min(interval, stable_remaining, deadline - now))
+            new_elem_list = self.elem.find_elements(by, attr)
+            if new_elem_list.__len__() != elem_list.__len__():
+                stable_start = time.monotonic()
+            elem_list = new_elem_list
+
+    def _observe_elems(
+        self,
+        js_locator: str,
+        selector: str,
+        min_count: int,
+        stable_time: int | float | None,
+        deadline: float,
+    ) -> list[WebElement] | None:
+        """deadlineまでに見つからなければNone"""
+        root = None if self.is_web_driver else self.elem
+        stable_ms = None if stable_time is None else int(stable_time * 1000)
+        while True:
+            # スクリプトのタイムアウトを超えないように区切って待つ
+            chunk_seconds = min(max(deadline - time.monotonic(), 0), wait.OBSERVE_CHUNK_SECONDS)
+            elem_list = self.driver.execute_async_script(
+                script.WAIT_ELEMS_JS, root, js_locator, selector, min_count, stable_ms, int(chunk_seconds * 1000)
+            )
+            if not elem_list is None:
+                return elem_list
+            if time.monotonic() >= deadline:
+                return None
 
     def to_driver_elem(self) -> Self:
         return self._get_new_element(elem=self.driver)
@@ -184,7 +430,7 @@ class Element(time_module.MutableWaitTimeAttrClass):
         return self.find_elem("xpath", "..", wait_time=0)
 
     @property
-    def children(self) -> list[Self]:
+    def children(self) -> ElementList:
         """1つ子すべて"""
         return self.find_elems("xpath", "./*", wait_time=0)
 
@@ -228,6 +474,8 @@ class Element(time_module.MutableWaitTimeAttrClass):
         # detailがTrueかつdebug_modeがTrueのときにやる
         status = ""
         status += f"type: {self.elem.__class__.__name__}"
+        if self.debug_mode:
+            status += f"\nキャッシュ: hit={self._cache_hit} miss={self._cache_miss}"
         # driverならここまで
         if self.is_web_driver or not detail:
             return status
@@ -242,31 +490,56 @@ class Element(time_module.MutableWaitTimeAttrClass):
         return status
 
     @property
+    @clear_cache_on_stale
     def text(self) -> str:
         if self.is_web_driver:
             raise NotWebElementError("テキスト取得はWebElementのみです。")
         return self.elem.text
 
     @property
+    @clear_cache_on_stale
     def tag_name(self) -> str:
+        """タグ名は変わらないのでキャッシュする"""
         if self.is_web_driver:
             raise NotWebElementError("タグ名取得はWebElementのみです。")
-        return self.elem.tag_name
+        return self._get_cache("tag_name", lambda: self.elem.tag_name)
 
     @property
     def current_url(self) -> str:
         return self.driver.current_url
 
-    def attr(self, name) -> str | None:
+    @clear_cache_on_stale
+    def attr(self, name: str, cache: bool = False) -> str | None:
+        """
+        属性値を取得
+        cache=Trueにすると以降はキャッシュを返す。idやhrefなど変わらないとわかっている属性向け
+        """
         if self.is_web_driver:
             return None
+        if cache:
+            return self._get_cache(f"attr:{name}", lambda: self.elem.get_attribute(name))
         return self.elem.get_attribute(name)
 
+    def _get_cache(self, key: str, getter: Callable[[], Any]) -> Any:
+        if self._cache is None:
+            self._cache = {}
+        if key in self._cache:
+            self._cache_hit += 1
+            return self._cache[key]
+        self._cache_miss += 1
+        value = getter()
+        self._cache[key] = value
+        return value
+
+    def clear_cache(self):
+        """キャッシュを捨てる。hit/missの回数はそのまま"""
+        self._cache = None
+
     @property
     def value(self) -> str:
         if not self.is_input:
             raise DifferenceTagError(
-                f"valueが取得できるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.elem.tag_name}は非対応です。"
+                f"valueが取得できるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.tag_name}は非対応です。"
             )
         return self.attr("value")
 
@@ -281,24 +554,153 @@ class Element(time_module.MutableWaitTimeAttrClass):
             return True
         except StaleElementReferenceException:
             # DOMから削除されていて「古い参照」になっている
+            self.clear_cache()
             return False
 
     def wait_not_exists(self, wait_time: int | float | None = None):
         if self.is_web_driver:
             raise NotWebElementError("WebDriverは不滅です。")
         wait_time = self._get_temp_wait_time(wait_time)
+        message = f"{wait_time}秒待っても要素が消えませんでした。"
+        deadline = time.monotonic() + wait_time
+        if self.wait_strategy.mode == "observe":
+            try:
+                while True:
+                    chunk_seconds = min(max(deadline - time.monotonic(), 0), wait.OBSERVE_CHUNK_SECONDS)
+                    if self.driver.execute_async_script(script.WAIT_DETACHED_JS, self.elem, int(chunk_seconds * 1000)):
+                        self.clear_cache()
+                        return
+                    if time.monotonic() >= deadline:
+                        # 最後にpollで1回だけ確かめてからTimeoutException
+                        break
+            except StaleElementReferenceException:
+                # 渡す時点でもう古い参照
+                self.clear_cache()
+                return
+            except (JavascriptException, TimeoutException):
+                # スクリプトのタイムアウトもseleniumではTimeoutException。pollで続ける
+                pass
+
         # なんでseleniumは存在判定機能がないのに存在しなくなるまで待つ機能はあるねん
-        WebDriverWait(self.driver, wait_time).until(EC.staleness_of(self.elem))
+        wait.poll_until(
+            lambda: None if self.exists else True, max(deadline - time.monotonic(), 0), self.wait_strategy, message
+        )
+
+    # ---------------一括取得系---------------
+    def fetch_rows(
+        self,
+        elems: list[Self] | ElementList,
+        attrs: list[str] | tuple[str, ...] = (),
+        props: list[str] | tuple[str, ...] = (),
+        text: bool = False,
+        tag_name: bool = False,
+    ) -> list[dict[str, str | int | float | bool | None]]:
+        """
+        elemsの属性・プロパティ・テキスト・タグ名をexecute_script1回でまとめて取得する
+        1要素ずつattrを呼ぶとその分だけWebDriverとの往復が発生するので、大量の要素を読むときはこっち
+        属性はElement.attrと同じ値。テキストはinnerTextなのでElement.textと空白の扱いが違うことがある
+        戻り値は要素ごとに{属性名 or プロパティ名 or "text" or "tag_name": 値}の辞書
+        """
+        key_list = [*attrs, *props]
+        if text:
+            key_list.append("text")
+        if tag_name:
+            key_list.append("tag_name")
+        if len(set(key_list)) != len(key_list):
+            raise ValueError(f"取得する名前が重複しています。: {key_list}")
+
+        if isinstance(elems, ElementList):
+            web_elems = elems.web_elems
+        else:
+            if any(elem.is_web_driver for elem in elems):
+                raise NotWebElementError("一括取得はWebElementのみです。")
+            web_elems = [elem.elem for elem in elems]
+        if len(web_elems) == 0:
+            return []
+
+        value_list_list = self.driver.execute_script(
+            script.fetch_rows_js(), web_elems, list(attrs), list(props), text, tag_name
+        )
+        return [dict(zip(key_list, value_list)) for value_list in value_list_list]
+
+    def extract_rows(
+        self,
+        row: Cond,
+        columns: dict[str, Cond | str | tuple[Cond, str] | None],
+        chunk_size: int = 500,
+        wait_time: int | float | None = None,
+    ) -> Iterator[dict[str, str | None]]:
+        """
+        表やカードの一覧のような繰り返し構造を、1行ずつ{列名: 値}の辞書で返すジェネレータ
+        rowは行の要素の条件(このelemの下から探す)。columnsの値は
+            Cond: 行の下で最初に合う要素のテキスト(innerText)
+            str: 行そのものの属性
+            (Cond, str): 行の下で最初に合う要素の属性
+            None: 行そのもののテキスト
+        行の要素はページ内に取っておき、chunk_size行ずつexecute_script1回で読むので、
+        find_elemsで行ごとにElementを作るより往復もメモリも少ない。見つからない列はNone
+        行が1つも現れないままwait_time過ぎたら何も返さない(0なら待たない)
+        途中でページを移動すると次のchunkでJavascriptException
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_sizeは1以上です。: {chunk_size}")
+        column_list = []
+        for name, column in columns.items():
+            if column is None:
+                column_list.append([None, None, None])
+            elif isinstance(column, str):
+                column_list.append([None, None, column])
+            elif isinstance(column, Cond):
+                column_list.append([*column.selector, None])
+            elif isinstance(column, tuple) and isinstance(column[0], Cond) and isinstance(column[1], str):
+                column_list.append([*column[0].selector, column[1]])
+            else:
+                raise TypeError(f"columnsの値はCond, str, (Cond, str), Noneのどれかです。: {name}")
+        key_list = list(columns)
+
+        if self._get_temp_wait_time(wait_time) > 0:
+            try:
+                self.wait_any([row], wait_time)
+            except TimeoutException:
+                return
+
+        root = None if self.is_web_driver else self.elem
+        token = uuid.uuid4().hex
+        count = self.driver.execute_script(script.EXTRACT_START_JS, root, *row.selector, token)
+        try:
+            for start in range(0, count, chunk_size):
+                value_list_list = self.driver.execute_script(
+                    script.extract_chunk_js(), token, column_list, start, start + chunk_size
+                )
+                for value_list in value_list_list:
+                    yield dict(zip(key_list, value_list))
+        finally:
+            # 途中でやめたときもページ内の参照を消す。ページが変わっていれば消すものはない
+            try:
+                self.driver.execute_script(script.EXTRACT_RELEASE_JS, token)
+            except WebDriverException:
+                pass
 
     # ---------------操作系---------------
 
+    @clear_cache_on_stale
     def click(
         self,
         mode: Literal["javascript", "normal"] = "javascript",
         is_download: bool = False,
         download_wait_time: int | float | None = None,
     ) -> Path | None:
-        """クリックする。"""
+        """
+        クリックする。
+        is_download=Trueならダウンロードの完了を待って保存先を返す
+        download_trackerがあればブラウザのイベントで、なければsave_folderに増えたファイルで判定する
+        """
+        if is_download and not self.download_tracker is None:
+            download_wait_time = self._get_temp_wait_time(download_wait_time)
+            deadline = time.monotonic() + download_wait_time
+            download = self.start_download(mode, download_wait_time)
+            return download.result(max(deadline - time.monotonic(), 0))
+
         if is_download:
             if self.save_folder is None:
                 save_folder = Path.home() / "Downloads"
@@ -306,7 +708,38 @@ class Element(time_module.MutableWaitTimeAttrClass):
                 save_folder = self.save_folder
             find_diff_path = download_module.FindDiffPath(save_folder)
 
-        # クリックする
+        self._click(mode)
+
+        if is_download:
+            download_wait_time = self._get_temp_wait_time(download_wait_time)
+            return find_diff_path.fetch(download_wait_time)
+
+    @clear_cache_on_stale
+    def start_download(
+        self, mode: Literal["javascript", "normal"] = "javascript", wait_time: int | float | None = None
+    ) -> Download:
+        """
+        クリックしてダウンロードが始まるのを待ち、完了を待たずにDownloadを返す
+        いくつも始めてから、それぞれのresult()やdownload_tracker.wait_all()で待てる
+        クリックとダウンロードは始まった順に対応づけるので、同時に別スレッドから呼ぶと入れ替わることがある
+        """
+        if self.download_tracker is None:
+            raise ValueError("start_downloadはdownload_tracking=Trueで起動したときのみです。")
+        wait_time = self._get_temp_wait_time(wait_time)
+        future = self.download_tracker.expect()
+        try:
+            self._click(mode)
+            return future.result(timeout=wait_time)
+        except FutureTimeoutError:
+            # 時間切れと同時に割り当てられていたら、ほかの待ちに回らないのでそれを返す
+            if not future.cancel():
+                return future.result()
+            raise TimeoutException(f"{wait_time}秒待ってもダウンロードが始まりませんでした。")
+        finally:
+            # 始まらなかったら、後から始まったダウンロードを割り当てないように
+            future.cancel()
+
+    def _click(self, mode: Literal["javascript", "normal"]):
         match mode:
             case "javascript":
                 # 基本これでいい。画面外でもクリックしてくれる。
@@ -316,14 +749,11 @@ class Element(time_module.MutableWaitTimeAttrClass):
                 # selectタグ以外の要素で必要な時が来るかもしれない
                 self.elem.click()
 
-        if is_download:
-            download_wait_time = self._get_temp_wait_time(download_wait_time)
-            return find_diff_path.fetch(download_wait_time)
-
+    @clear_cache_on_stale
     def clear(self):
         if not self.is_input:
             raise DifferenceTagError(
-                f"clearできるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.elem.tag_name}は非対応です。"
+                f"clearできるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.tag_name}は非対応です。"
             )
         # elem.clear()が効かない時があるのでこっち
         for _ in self.wait_try():
@@ -334,15 +764,17 @@ class Element(time_module.MutableWaitTimeAttrClass):
         else:
             raise TimeoutException
 
+    @clear_cache_on_stale
     def send_keys(self, text: str, clear: bool = False):
         if not self.is_input:
             raise DifferenceTagError(
-                f"send_keysできるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.elem.tag_name}は非対応です。"
+                f"send_keysできるWebElementのタグは{' or '.join(INPUTABLE_TAG_NAME_LIST)}です。{self.tag_name}は非対応です。"
             )
         if clear:
             self.clear()
         self.elem.send_keys(text)
 
+    @clear_cache_on_stale
     def select(self, value_or_text_or_index: str | int, value_type: Literal["value", "text", "index"] = "value"):
         if not self.is_select:
             raise DifferenceTagError("selectはselectタグ時のみです。")
@@ -354,10 +786,104 @@ class Element(time_module.MutableWaitTimeAttrClass):
         if value_type == "index":
             select.select_by_index(int(value_or_text_or_index))
 
+    def goto(self, url: str, ready: Cond | None = None, wait_time: int | float | None = None) -> Self | None:
+        """
+        urlに移動し、readyに合う要素が現れるかDOMContentLoadedの早いほうで返す
+        readyが先に見つかればその要素、DOMContentLoadedが先ならNone
+        途中で返せるのはpage_load_strategy="none"で起動したときだけ。"normal"/"eager"ではdriver.getが読み込みを待つので、その後に1回探すだけ
+        "none"ではページが入れ替わったかで遷移を判定するので、同じページ内(#だけ違うURL)への移動には使えない
+        """
+        wait_time = self._get_temp_wait_time(wait_time)
+        selector_list = [] if ready is None else [list(ready.selector)]
+        if self.driver.capabilities.get("pageLoadStrategy", "normal") != "none":
+            self.driver.get(url)
+            _, web_elem = self.driver.execute_script(script.GOTO_STATE_JS, None, selector_list)
+            return None if web_elem is None else self._get_new_element(elem=web_elem)
+
+        token = uuid.uuid4().hex
+        self.driver.execute_script(script.GOTO_MARK_JS, token)
+        self.driver.get(url)
+        message = f"{wait_time}秒待ってもページが読み込まれませんでした。: {url}"
+        deadline = time.monotonic() + wait_time
+
+        def new_page_state() -> list | None:
+            """新しいページに変わっていれば[DOMContentLoaded済みか, 要素]"""
+            try:
+                return self.driver.execute_script(script.GOTO_STATE_JS, token, selector_list)
+            except JavascriptException:
+                # 遷移の途中
+                return None
+
+        def ready_state() -> list | None:
+            state = new_page_state()
+            if state is None or (not state[0] and state[1] is None):
+                return None
+            return state
+
+        if self.wait_strategy.mode == "observe":
+            state = wait.poll_until(new_page_state, max(deadline - time.monotonic(), 0), self.wait_strategy, message)
+            try:
+                while not (state[0] or not state[1] is None):
+                    chunk_seconds = min(max(deadline - time.monotonic(), 0), wait.OBSERVE_CHUNK_SECONDS)
+                    state = self.driver.execute_async_script(
+                        script.WAIT_READY_JS, selector_list, int(chunk_seconds * 1000)
+                    )
+                    if state is None:
+                        if time.monotonic() >= deadline:
+                            raise TimeoutException(message)
+                        state = [False, None]
+            except (JavascriptException, TimeoutException):
+                # スクリプトのタイムアウトもseleniumではTimeoutException。時間切れならpollが最後に1回見て投げる
+                state = wait.poll_until(ready_state, max(deadline - time.monotonic(), 0), self.wait_strategy, message)
+        else:
+            state = wait.poll_until(ready_state, max(deadline - time.monotonic(), 0), self.wait_strategy, message)
+        _, web_elem = state
+        return None if web_elem is None else self._get_new_element(elem=web_elem)
+
+    def fill_form(
+        self,
+        fields: dict[Cond | Self, str | int | bool | tuple[str | int, Literal["value", "text", "index"]]],
+        verify: bool = True,
+    ):
+        """
+        フォームの複数の項目に、execute_script1回でまとめて値を入れる
+        fieldsは{Condか入力欄のElement: 値}。Condはこのelemの下から探す
+        input/textareaはvalueを入れてinput/changeイベントを起こす。checkbox/radioは値の真偽でチェックする
+        selectは(値, "value" or "text" or "index")でselectメソッドと同じ選び方ができる。値だけならvalueで選ぶ
+        入れ終わったあと同じ呼び出しの中で値を確かめ、入らなかった項目があればFormFillError
+        clear+send_keysと違いキー入力は起きないので、keydownなどを見ているフォームにはsend_keysを使う
+        """
+        field_list = []
+        for key, value in fields.items():
+            value_type = "value"
+            if isinstance(value, tuple):
+                value, value_type = value
+            if value_type not in ("value", "text", "index"):
+                raise ValueError(f"value_typeは'value', 'text', 'index'のみ指定できます。: {key!r}")
+            if isinstance(key, Element):
+                if key.is_web_driver:
+                    raise NotWebElementError("fill_formのキーはWebElementのみです。")
+                field_list.append({"elem": key.elem, "selector": None, "value": value, "valueType": value_type})
+            elif isinstance(key, Cond):
+                field_list.append(
+                    {"elem": None, "selector": list(key.selector), "value": value, "valueType": value_type}
+                )
+            else:
+                raise TypeError(f"fill_formのキーはCondかElementです。not {type(key)}")
+        if field_list.__len__() == 0:
+            return
+
+        root = None if self.is_web_driver else self.elem
+        result_list = self.driver.execute_script(script.FILL_FORM_JS, root, field_list, verify)
+        failure_list = [(key, result["error"]) for key, result in zip(fields, result_list) if not result["error"] is None]
+        if failure_list.__len__() > 0:
+            raise FormFillError(failure_list)
+
     def back(self):
         """ブラウザバック"""
         self.driver.back()
 
+    @clear_cache_on_stale
     def scroll(self):
         # その要素が見える位置までスクロール
         self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", self.elem)
@@ -369,10 +895,11 @@ class Element(time_module.MutableWaitTimeAttrClass):
         # アラートを承認
         alert.accept()
 
+    @clear_cache_on_stale
     def switch_frame(self):
         if not self.is_iframe:
             raise DifferenceTagError(
-                f"frame切り替えはできるWebElementのタグは{' or '.join(FRAME_TAG_NAME_LIST)}です。{self.elem.tag_name}は非対応です。"
+                f"frame切り替えはできるWebElementのタグは{' or '.join(FRAME_TAG_NAME_LIST)}です。{self.tag_name}は非対応です。"
             )
         self.driver.switch_to.frame(self.elem)
 
@@ -380,9 +907,10 @@ class Element(time_module.MutableWaitTimeAttrClass):
         self.driver.switch_to.default_content()
 
     def close(self):
-        """タブを閉じる。ただし現在は閉じたあとのdriverのwindowの移動をサポートしていない"""
+        """タブを閉じる。閉じたあとほかのタブに移らないので、タブを扱うならSelenium.tabs.closeを使う"""
         self.driver.close()
 
+    @clear_cache_on_stale
     def perform(self):
         """マウスをその要素の上に移動（ホバー）"""
         if self.is_web_driver:
@@ -394,11 +922,100 @@ class Element(time_module.MutableWaitTimeAttrClass):
         self.driver.execute_script(script, *args)
 
     # ---------------その他---------------
-    def save_ss(self, file_path: Path | str | None = None, save_type: Literal["png", "pdf"] = "png"):
-        """スクショを保存"""
-        if save_type not in ("png", "pdf"):
-            raise ValueError("save_typeは'png'または'pdf'のみ指定できます。")
+    @contextmanager
+    def profile(self, trace_path: Path | str | None = None) -> Iterator[CommandStats]:
+        """
+        with中にWebDriverへ送ったコマンドを、呼び出し元のメソッド・待ち時間・送受信サイズつきで記録する
+        with driver.profile() as stats: ... のあとでstats.summary()やstats.histogram()を見る
+        trace_pathがあれば抜けるときにトレースを書き出す(.foldedならflamegraph用、それ以外はchrome://tracing用のJSON)
+        """
+        with profiler.profile(self.driver, trace_path) as stats:
+            yield stats
+
+    def save_ss(
+        self,
+        file_path: Path | str | None = None,
+        save_type: Literal["png", "jpeg", "webp", "pdf"] = "png",
+        full_page: bool = False,
+        quality: int | None = None,
+        chunk_size: int = 1024 * 1024,
+    ) -> Path:
+        """
+        スクショを保存して、保存先を返す
+        full_page=Trueならスクロールしないと見えない部分も含めたページ全体(Chrome系のみ)
+        jpeg/webpはqualityで画質(0〜100)を指定できる。pngより小さくなる(Chrome系のみ)
+        pdfはブラウザからchunk_sizeずつ受け取りながら書くので、何百ページあってもメモリを食わない
+        writerがあれば画像のデコードと書き込みは別スレッドでやり、書き終わる前に返る(pdfはブラウザから読むのでその場で書く)
+        """
+        if save_type not in SS_SUFFIX_DICT:
+            raise ValueError(f"save_typeは{' or '.join(SS_SUFFIX_DICT)}のみ指定できます。")
+        path = self._get_ss_path(file_path, save_type)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if save_type == "pdf":
+            self._save_pdf(path, chunk_size)
+            return path
+        ss_base64 = self._get_ss_base64(save_type, full_page=full_page, quality=quality)
+        if self.writer is None:
+            path.write_bytes(base64.b64decode(ss_base64))
+        else:
+            self.writer.submit(path, lambda: base64.b64decode(ss_base64), ss_base64.__len__())
+        return path
 
+    def get_ss(
+        self,
+        image_type: Literal["png", "jpeg", "webp"] = "png",
+        full_page: bool = False,
+        quality: int | None = None,
+    ) -> bytes:
+        """スクショのバイト列。WebDriverならページ(full_page=Falseなら見えている範囲)、WebElementならその要素"""
+        return base64.b64decode(self._get_ss_base64(image_type, full_page=full_page, quality=quality))
+
+    def _get_ss_base64(self, image_type: str, full_page: bool, quality: int | None) -> str:
+        # ブラウザからはbase64で届くので、デコードは呼び出し側(別スレッドのこともある)に任せる
+        if not quality is None and not 0 <= quality <= 100:
+            raise ValueError("qualityは0〜100で頼むぅ")
+        # seleniumの標準機能で撮れるもの
+        if image_type == "png" and not full_page:
+            if self.is_web_driver:
+                return self.driver.get_screenshot_as_base64()
+            return self.elem.screenshot_as_base64
+        if not self._is_chromium:
+            raise NotImplementedError("full_pageやpng以外のスクショはChrome系のブラウザのみです。")
+
+        params = {"format": image_type, "captureBeyondViewport": True}
+        if not quality is None and image_type != "png":
+            params["quality"] = quality
+        if self.is_web_element:
+            x, y, width, height = self.driver.execute_script(script.ELEMENT_CLIP_JS, self.elem)
+            params["clip"] = {"x": x, "y": y, "width": width, "height": height, "scale": 1}
+        elif full_page:
+            content_size = self.driver.execute_cdp_cmd("Page.getLayoutMetrics", {})["cssContentSize"]
+            width, height = content_size["width"], content_size["height"]
+            params["clip"] = {"x": 0, "y": 0, "width": width, "height": height, "scale": 1}
+        else:
+            params["captureBeyondViewport"] = False
+        return self.driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"]
+
+    def _save_pdf(self, path: Path, chunk_size: int):
+        if not self._is_chromium:
+            path.write_bytes(base64.b64decode(self.driver.print_page()))
+            return
+        # ReturnAsStreamならブラウザ側に置いたままにして、少しずつ読める
+        stream = self.driver.execute_cdp_cmd("Page.printToPDF", {"transferMode": "ReturnAsStream"})["stream"]
+        try:
+            with path.open("wb") as f:
+                while True:
+                    chunk = self.driver.execute_cdp_cmd("IO.read", {"handle": stream, "size": chunk_size})
+                    if chunk.get("base64Encoded"):
+                        f.write(base64.b64decode(chunk["data"]))
+                    else:
+                        f.write(chunk["data"].encode("utf-8"))
+                    if chunk.get("eof"):
+                        break
+        finally:
+            self.driver.execute_cdp_cmd("IO.close", {"handle": stream})
+
+    def _get_ss_path(self, file_path: Path | str | None, save_type: str) -> Path:
         if self.save_folder is not None:
             default_folder = Path(self.save_folder)
         else:
@@ -409,40 +1026,81 @@ class Element(time_module.MutableWaitTimeAttrClass):
                 file_path = default_folder / "page.pdf"
             else:
                 today = datetime.now().strftime("%Y%m%d")
-                file_path = default_folder / f"{today}.png"
+                file_path = default_folder / f"{today}{SS_SUFFIX_DICT[save_type]}"
 
         path = Path(file_path)
-        if save_type == "png" and path.suffix.lower() != ".png":
-            path = path.with_suffix(".png")
-        if save_type == "pdf" and path.suffix.lower() != ".pdf":
-            path = path.with_suffix(".pdf")
+        suffix_list = [SS_SUFFIX_DICT[save_type]] + ([".jpeg"] if save_type == "jpeg" else [])
+        if path.suffix.lower() not in suffix_list:
+            path = path.with_suffix(SS_SUFFIX_DICT[save_type])
+        return path
 
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        if save_type == "png":
-            if self.is_web_driver:
-                self.driver.save_screenshot(path.__str__())
-            else:
-                self.elem.screenshot(path.__str__())
-        else:
-            pdf_base64 = self.driver.print_page()
-            path.write_bytes(base64.b64decode(pdf_base64))
+    @property
+    def _is_chromium(self) -> bool:
+        """CDPのコマンドが使えるか"""
+        return hasattr(self.driver, "execute_cdp_cmd")
 
-    def save_html(self, file_path: Path | str):
-        """そのelemのHTMLを保存"""
+    def save_html(
+        self,
+        file_path: Path | str,
+        pretty: bool = True,
+        parser: Literal["html.parser", "lxml", "html5lib"] = "html.parser",
+        chunk_size: int = 1024 * 1024,
+    ):
+        """
+        そのelemのHTMLを保存
+        pretty=Falseなら整形せず取得したHTMLをそのまま書く。大きいページは整形に時間もメモリも食うのでこっち
+        writerがあれば整形と書き込みは別スレッドでやり、書き終わる前に返る
+        """
         file_path = Path(file_path)
         if file_path.suffix != ".html":
             raise ValueError("HTMLを保存できるファイルの拡張子は「.html」だけです。")
+        if not self.writer is None:
+            html = self._get_html()
+            if pretty:
+                self.writer.submit(file_path, lambda: BeautifulSoup(html, parser).prettify(), html.__len__())
+            else:
+                self.writer.write_text(file_path, html)
+            return
 
-        pretty = self.soup.prettify()
-        file_path.write_text(pretty, encoding="utf-8")
+        if pretty:
+            html = self.get_soup(parser).prettify()
+        else:
+            html = self._get_html()
+        write_text_in_chunks(file_path, html, chunk_size)
+
+    def snapshot(self) -> Snapshot:
+        """
+        そのelemのHTMLを1回だけ取ってきて、ローカルで検索できるSnapshotにする
+        find_cond_elemsやattr, textを何十回も呼ぶ読み取り専用の処理ならこっちが速い
+        """
+        return Snapshot.from_html(
+            self._get_html(), base_url=self.current_url, is_document=self.is_web_driver, debug_mode=self.debug_mode
+        )
 
     @property
     def soup(self) -> BeautifulSoup:
         """そのelemのHTMLのBeautifulSoupオブジェクト"""
-        html = self._get_html()
-
-        soup = BeautifulSoup(html, "html.parser")
+        return self.get_soup()
+
+    def get_soup(self, parser: Literal["html.parser", "lxml", "html5lib"] = "html.parser") -> BeautifulSoup:
+        """
+        そのelemのHTMLのBeautifulSoupオブジェクト
+        parserは速さならlxml、ブラウザと同じ解釈がほしいならhtml5lib(別途インストールが必要)
+        ページが変わっていなければHTMLを取り直さずにキャッシュを返す。返したsoupを書き換えるとキャッシュも変わる
+        """
+        # ページ遷移かDOMの変化があれば状態が変わる。HTML全体を取るよりずっと軽い
+        page_state = self.driver.execute_script(script.PAGE_STATE_JS)
+        cached = None if self._cache is None else self._cache.get("soup")
+        if not cached is None and cached[0] == (page_state, parser):
+            self._cache_hit += 1
+            return cached[1]
+        self._cache_miss += 1
+
+        soup = BeautifulSoup(self._get_html(), parser)
+        # 最新の1つだけ持つ
+        if self._cache is None:
+            self._cache = {}
+        self._cache["soup"] = ((page_state, parser), soup)
         return soup
 
     def _get_html(self) -> str:
@@ -0,0 +1,114 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, overload
+
+# 外部ライブラリ
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import StaleElementReferenceException
+
+# 自作ライブラリ
+from autoweb_module.selenium import script
+from autoweb_module.selenium.cond import Cond
+
+if TYPE_CHECKING:
+    from autoweb_module.selenium.element import Element
+
+
+@dataclass(eq=False, repr=False)
+class ElementList(Sequence):
+    """
+    find_elemsの結果
+    中身はWebElementのまま持っておき、Elementはアクセスされたときに作る
+    一括系のメソッドはどれもexecute_script1回で全要素を処理する
+    """
+
+    origin: Element  # 検索元のElement。ここからdriverや設定を引き継ぐ
+    web_elems: list[WebElement]
+
+    @overload
+    def __getitem__(self, index: int) -> Element: ...
+    @overload
+    def __getitem__(self, index: slice) -> ElementList: ...
+    def __getitem__(self, index: int | slice) -> Element | ElementList:
+        if isinstance(index, slice):
+            return self._get_new_element_list(self.web_elems[index])
+        return self.origin._get_new_element(elem=self.web_elems[index])
+
+    def __len__(self) -> int:
+        return self.web_elems.__len__()
+
+    def __iter__(self):
+        for web_elem in self.web_elems:
+            yield self.origin._get_new_element(elem=web_elem)
+
+    def __eq__(self, other: object) -> bool:
+        # 以前のlist[Element]と同じく、listやtupleとも中身の順で比べる(elems == []など)
+        if isinstance(other, ElementList):
+            return self.web_elems == other.web_elems
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        # 要素ごとのreprはブラウザに問い合わせることになるので件数だけ
+        return f"ElementList(len={self.__len__()})"
+
+    def _get_new_element_list(self, web_elems: list[WebElement]) -> ElementList:
+        return self.__class__(origin=self.origin, web_elems=web_elems)
+
+    # ---------------一括取得系---------------
+    def rows(
+        self,
+        attrs: list[str] | tuple[str, ...] = (),
+        props: list[str] | tuple[str, ...] = (),
+        text: bool = False,
+        tag_name: bool = False,
+    ) -> list[dict[str, str | int | float | bool | None]]:
+        """全要素の属性・プロパティ・テキスト・タグ名をまとめて取得。詳細はElement.fetch_rows"""
+        return self.origin.fetch_rows(self, attrs=attrs, props=props, text=text, tag_name=tag_name)
+
+    def attrs(self, name: str) -> list[str | None]:
+        """全要素の属性値"""
+        return [row[name] for row in self.rows(attrs=[name])]
+
+    def texts(self) -> list[str]:
+        """全要素のテキスト"""
+        return [row["text"] for row in self.rows(text=True)]
+
+    def filter(self, cond: Cond) -> ElementList:
+        """condに合う要素だけに絞る"""
+        if self.__len__() == 0:
+            return self._get_new_element_list([])
+        locator, _ = cond.selector
+        if locator == "css":
+            web_elems = self.origin.driver.execute_script(script.FILTER_CSS_JS, self.web_elems, cond.css)
+        else:
+            web_elems = self.origin.driver.execute_script(script.FILTER_XPATH_JS, self.web_elems, cond.self_xpath)
+        return self._get_new_element_list(web_elems)
+
+    def exists_mask(self) -> list[bool]:
+        """
+        各要素がまだDOM上に存在するか
+        古い参照が混ざっているとスクリプトごと失敗するので、そのときは二分してそれぞれ確認する
+        """
+        return self._exists_mask(self.web_elems)
+
+    def _exists_mask(self, web_elems: list[WebElement]) -> list[bool]:
+        if web_elems.__len__() == 0:
+            return []
+        try:
+            return self.origin.driver.execute_script(script.IS_CONNECTED_JS, web_elems)
+        except StaleElementReferenceException:
+            if web_elems.__len__() == 1:
+                return [False]
+        half = web_elems.__len__() // 2
+        return self._exists_mask(web_elems[:half]) + self._exists_mask(web_elems[half:])
+
+    # ---------------操作系---------------
+    def click_all(self):
+        """全要素をjavascriptでクリック。Element.click(mode="javascript")の一括版"""
+        if self.__len__() == 0:
+            return
+        self.origin.driver.execute_script(script.CLICK_ALL_JS, self.web_elems)
@@ -0,0 +1,42 @@
+# 標準ライブラリ
+from collections.abc import Iterable
+from pathlib import Path
+import csv
+import json
+
+
+def write_csv(
+    rows: Iterable[dict], file_path: Path | str, fieldnames: list[str] | None = None, encoding: str = "utf-8-sig"
+) -> int:
+    """
+    rowsを1行ずつCSVに書き、書いた行数を返す。extract_rowsの結果をそのまま渡せばメモリを食わない
+    fieldnamesを省略すると最初の行のキー。encodingはExcelで開けるようにBOM付き
+    fieldnamesを渡せば、rowsが空でもヘッダーだけ書く
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with file_path.open("w", encoding=encoding, newline="") as f:
+        writer = None
+        if not fieldnames is None:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(rows: Iterable[dict], file_path: Path | str) -> int:
+    """rowsを1行1JSONで書き、書いた行数を返す"""
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with file_path.open("w", encoding="utf-8", newline="\n") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
@@ -53,8 +53,16 @@ class ChromeOptionsComposer(OptionsComposer):
     options: ChromeOptions = field(default_factory=ChromeOptions)
     service: ChromeService = field(default_factory=ChromeService)
 
-    def set_setting(self, download_folder: Path | None, profile_path: Path | None, headless: bool):
+    def set_setting(
+        self,
+        download_folder: Path | None,
+        profile_path: Path | None,
+        headless: bool,
+        page_load_strategy: Literal["normal", "eager", "none"] = "normal",
+    ):
         self.options.add_argument("--propagate-iph-for-testing")
+        # normal: 画像なども全部読み込むまで待つ、eager: DOMContentLoadedまで、none: 待たない
+        self.options.page_load_strategy = page_load_strategy
         self.options.add_experimental_option(
             "excludeSwitches", ["enable-automation"]
         )  # Chromeは自動テスト ソフトウェア~~を非表示
@@ -86,7 +94,13 @@ class FirefoxOptionsComposer(OptionsComposer):
     options: FirefoxOptions = field(default_factory=FirefoxOptions)
     service: FirefoxService = field(default_factory=FirefoxService)
 
-    def set_setting(self, download_folder: Path | None, profile_path: Path | None, headless: bool):
+    def set_setting(
+        self,
+        download_folder: Path | None,
+        profile_path: Path | None,
+        headless: bool,
+        page_load_strategy: Literal["normal", "eager", "none"] = "normal",
+    ):
         pass  # 気が向いたらFirefox対応する
 
     def get_driver(self):
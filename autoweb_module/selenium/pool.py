@@ -0,0 +1,272 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+import queue
+import threading
+import time
+
+# 外部ライブラリ
+from selenium.common.exceptions import WebDriverException
+
+# 自作ライブラリ
+from autoweb_module.exceptions import CdpError
+from autoweb_module.selenium.cdp import CdpConnection
+from autoweb_module.selenium.element import Element
+from autoweb_module.selenium.selenium import Selenium
+from autoweb_module.selenium.tabs import TabManager
+
+
+@dataclass
+class PoolStats:
+    """SeleniumPoolの統計"""
+
+    size: int
+    lease_count: int = 0
+    total_wait_seconds: float = 0.0  # 貸し出しを待った時間の合計
+    max_wait_seconds: float = 0.0
+    busy_seconds: float = 0.0  # 貸し出されていた時間の合計(返却済みの分)
+    replaced_count: int = 0  # 死んでいて起動し直したブラウザの数
+    replace_failed_count: int = 0  # 起動し直せなかった回数(その枠は死んだまま残り、次に借りるときにまた起動し直す)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        if self.lease_count == 0:
+            return 0.0
+        return self.total_wait_seconds / self.lease_count
+
+    @property
+    def utilization(self) -> float:
+        """起動してからの時間のうち、ブラウザが貸し出されていた割合(0～1)"""
+        elapsed = time.perf_counter() - self.started_at
+        if elapsed <= 0 or self.size == 0:
+            return 0.0
+        return self.busy_seconds / (self.size * elapsed)
+
+
+class SeleniumPool:
+    """
+    ブラウザを複数まとめて起動しておき、leaseで貸し出す
+    起動はスレッドプールで並列に行う。返却時にcookie・storage・タブ・ページを初期化して次に回す(詳しくは_reset)
+
+    with SeleniumPool(4, wait_time=5) as pool:
+        with pool.lease() as selenium:
+            selenium.driver.find_elem("id", "userid").send_keys("...")
+    """
+
+    def __init__(self, size: int, element_class: type = Element, **launch_kwargs):
+        """launch_kwargsはSelenium.launch_browserにそのまま渡す(start_url以外)。profile_pathの共有は不可"""
+        if size < 1:
+            raise ValueError("sizeは1以上です。")
+        self.size = size
+        self.element_class = element_class
+        self.launch_kwargs = launch_kwargs
+        self.stats = PoolStats(size=size)
+        self._idle: queue.Queue[Selenium] = queue.Queue()
+        self._lock = threading.Lock()
+        self._selenium_list: list[Selenium] = []
+        self._recorder_dict: dict[Selenium, _OriginRecorder] = {}
+
+    def __enter__(self) -> SeleniumPool:
+        self.launch()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+
+    def launch(self):
+        """sizeの数だけブラウザを並列に起動"""
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            future_list = [executor.submit(self._launch_one) for _ in range(self.size)]
+        selenium_list = []
+        error = None
+        for future in future_list:
+            try:
+                selenium_list.append(future.result())
+            except Exception as e:
+                error = e
+        if not error is None:
+            # 一部だけ起動したままにしない
+            for selenium in selenium_list:
+                selenium.quit()
+            raise error
+        for selenium in selenium_list:
+            self._selenium_list.append(selenium)
+            self._idle.put(selenium)
+        self.stats.started_at = time.perf_counter()
+
+    def _launch_one(self) -> Selenium:
+        selenium = Selenium(element_class=self.element_class)
+        selenium.launch_browser("about:blank", **self.launch_kwargs)
+        if hasattr(selenium._driver, "execute_cdp_cmd"):
+            try:
+                if selenium._cdp_connection is None:
+                    selenium._cdp_connection = CdpConnection.from_driver(selenium._driver)
+                recorder = _OriginRecorder(selenium._cdp_connection)
+            except (OSError, KeyError, CdpError):
+                # CDPにつなげない環境(リモートなど)では、返却時に開いているタブのオリジンだけ消す
+                recorder = None
+            if not recorder is None:
+                with self._lock:
+                    self._recorder_dict[selenium] = recorder
+        return selenium
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[Selenium]:
+        """空いているブラウザを借りる。timeout秒待っても空かなければTimeoutError"""
+        wait_start = time.perf_counter()
+        try:
+            selenium = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"{timeout}秒待ってもブラウザが空きませんでした。")
+        wait_seconds = time.perf_counter() - wait_start
+        with self._lock:
+            self.stats.lease_count += 1
+            self.stats.total_wait_seconds += wait_seconds
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait_seconds)
+
+        if not self._is_alive(selenium):
+            try:
+                selenium = self._replace(selenium)
+            except Exception:
+                # 枠は死んだまま戻す。次に借りたときにまた起動し直す
+                self._idle.put(selenium)
+                raise
+
+        lease_start = time.perf_counter()
+        try:
+            yield selenium
+        finally:
+            with self._lock:
+                self.stats.busy_seconds += time.perf_counter() - lease_start
+            try:
+                self._reset(selenium)
+            except WebDriverException:
+                try:
+                    selenium = self._replace(selenium)
+                except Exception:
+                    # 借りた側の例外を隠さない。死んだまま戻して、次に借りるときに起動し直す
+                    pass
+            finally:
+                self._idle.put(selenium)
+
+    def check_health(self):
+        """空いているブラウザを全部確認して、死んでいるものを起動し直す"""
+        selenium_list = []
+        while True:
+            try:
+                selenium_list.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        with ThreadPoolExecutor(max_workers=max(selenium_list.__len__(), 1)) as executor:
+            healthy_list = list(executor.map(self._get_healthy, selenium_list))
+        for selenium in healthy_list:
+            self._idle.put(selenium)
+
+    def _get_healthy(self, selenium: Selenium) -> Selenium:
+        if self._is_alive(selenium):
+            return selenium
+        try:
+            return self._replace(selenium)
+        except Exception:
+            # 起動し直せなくても枠は減らさない
+            return selenium
+
+    def _is_alive(self, selenium: Selenium) -> bool:
+        try:
+            _ = selenium._driver.window_handles
+            return True
+        except WebDriverException:
+            return False
+
+    def _replace(self, selenium: Selenium) -> Selenium:
+        """
+        死んだブラウザを起動し直す。起動できなければそのまま例外を投げる
+        そのときselenium(死んだもの)は_selenium_listに残るので、呼んだ側は枠として_idleに戻すこと
+        """
+        try:
+            selenium.quit()
+        except Exception:
+            pass
+        try:
+            new_selenium = self._launch_one()
+        except Exception:
+            with self._lock:
+                self.stats.replace_failed_count += 1
+            raise
+        with self._lock:
+            self._selenium_list.remove(selenium)
+            self._selenium_list.append(new_selenium)
+            self._recorder_dict.pop(selenium, None)
+            self.stats.replaced_count += 1
+        return new_selenium
+
+    def _reset(self, selenium: Selenium):
+        """
+        次の貸し出しのために、タブを1つに戻してcookieとサイトのデータを消し、about:blankへ
+        Chromium: cookieは全部(Network.clearBrowserCookies)。貸し出し中に開いたオリジンのlocalStorage/sessionStorage/
+            IndexedDB/キャッシュなどをStorage.clearDataForOriginで消す(オリジンはCDPのTarget.targetInfoChangedで覚えておく)
+        それ以外: 各タブのページのlocalStorage/sessionStorageと、そのドメインのcookieだけ消える
+            IndexedDBや、閉じたタブで開いていたほかのドメインのcookie・storageは残るので、ログイン状態を次に持ち越しうる
+        """
+        driver = selenium._driver
+        is_chromium = hasattr(driver, "execute_cdp_cmd")
+        origin_set = set()
+        handle_list = driver.window_handles
+        for handle in reversed(handle_list):
+            driver.switch_to.window(handle)
+            origin = driver.execute_script("return location.origin;")
+            if isinstance(origin, str) and origin.startswith("http"):
+                origin_set.add(origin)
+            if not is_chromium:
+                driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+                driver.delete_all_cookies()
+            if handle != handle_list[0]:
+                driver.close()
+        driver.switch_to.window(handle_list[0])
+        # ページがまたstorageに書かないように、先に移動してから消す
+        driver.get("about:blank")
+        if is_chromium:
+            recorder = self._recorder_dict.get(selenium)
+            if not recorder is None:
+                origin_set |= recorder.pop_all()
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in origin_set:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        selenium.tabs = TabManager(selenium.driver, selenium._get_cdp_connection)
+
+    def quit(self):
+        """全ブラウザを終了"""
+        with self._lock:
+            selenium_list = self._selenium_list
+            self._selenium_list = []
+        for selenium in selenium_list:
+            selenium.quit()
+
+
+class _OriginRecorder:
+    """CDPでタブの移動を見て、開いたhttp(s)のオリジンを覚えておく(返却時にそのオリジンのデータを消すため)"""
+
+    def __init__(self, connection: CdpConnection):
+        self.connection = connection
+        self._lock = threading.Lock()
+        self._origin_set: set[str] = set()
+        connection.on("Target.targetCreated", self._on_target)
+        connection.on("Target.targetInfoChanged", self._on_target)
+        connection.send("Target.setDiscoverTargets", {"discover": True})
+
+    def pop_all(self) -> set[str]:
+        with self._lock:
+            origin_set = self._origin_set
+            self._origin_set = set()
+        return origin_set
+
+    def _on_target(self, params: dict, session_id: str | None):
+        url_parts = urlsplit(params["targetInfo"].get("url", ""))
+        if url_parts.scheme in ("http", "https"):
+            with self._lock:
+                self._origin_set.add(f"{url_parts.scheme}://{url_parts.netloc}")
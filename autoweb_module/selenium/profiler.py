@@ -0,0 +1,230 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+import json
+import sys
+import threading
+import time
+
+# 外部ライブラリ
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# レイテンシのヒストグラムの区切り(ミリ秒)
+HISTOGRAM_BUCKET_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class CommandRecord:
+    """WebDriverへのコマンド1回分"""
+
+    command: str  # seleniumのコマンド名(findElements, executeScriptなど)
+    callers: tuple[str, ...]  # 呼び出し元のElementのメソッド(外側から順)。Element外から直接なら空
+    start: float  # profile開始からの秒
+    latency: float  # 秒
+    request_bytes: int
+    response_bytes: int
+    thread_id: int
+
+    @property
+    def caller(self) -> str:
+        """ユーザーが呼んだ(一番外側の)Elementのメソッド"""
+        return self.callers[0] if self.callers else "(direct)"
+
+
+@dataclass
+class CommandStats:
+    """profile中に記録したコマンドの集計"""
+
+    records: list[CommandRecord] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, record: CommandRecord):
+        with self._lock:
+            self.records.append(record)
+
+    @property
+    def round_trips(self) -> int:
+        return self.records.__len__()
+
+    @property
+    def total_latency(self) -> float:
+        """コマンドの待ち時間の合計(秒)"""
+        return sum(record.latency for record in self.records)
+
+    @property
+    def command_counts(self) -> Counter[str]:
+        return Counter(record.command for record in self.records)
+
+    @property
+    def caller_counts(self) -> Counter[str]:
+        return Counter(record.caller for record in self.records)
+
+    def latency_by(self, key: Literal["command", "caller"] = "command") -> dict[str, float]:
+        """コマンド名か呼び出し元ごとの待ち時間の合計(秒)。多い順"""
+        latency_dict: dict[str, float] = {}
+        for record in self.records:
+            name = getattr(record, key)
+            latency_dict[name] = latency_dict.get(name, 0) + record.latency
+        return dict(sorted(latency_dict.items(), key=lambda item: item[1], reverse=True))
+
+    def histogram(self, command: str | None = None) -> dict[str, int]:
+        """レイテンシの分布。commandで絞れる。キーは"<1ms"〜">=5000ms\""""
+        label_list = [f"<{bucket}ms" for bucket in HISTOGRAM_BUCKET_MS] + [f">={HISTOGRAM_BUCKET_MS[-1]}ms"]
+        histogram = dict.fromkeys(label_list, 0)
+        for record in self.records:
+            if not command is None and record.command != command:
+                continue
+            latency_ms = record.latency * 1000
+            for bucket, label in zip(HISTOGRAM_BUCKET_MS, label_list):
+                if latency_ms < bucket:
+                    histogram[label] += 1
+                    break
+            else:
+                histogram[label_list[-1]] += 1
+        return histogram
+
+    def summary(self, top: int = 10) -> str:
+        """人が読む用の集計"""
+        lines = [f"コマンド数: {self.round_trips} 待ち時間合計: {self.total_latency:.3f}秒"]
+        lines.append("コマンド別:")
+        command_counts = self.command_counts
+        for command, latency in list(self.latency_by("command").items())[:top]:
+            lines.append(f"  {command}: {command_counts[command]}回 {latency:.3f}秒")
+        lines.append("呼び出し元別:")
+        caller_counts = self.caller_counts
+        for caller, latency in list(self.latency_by("caller").items())[:top]:
+            lines.append(f"  {caller}: {caller_counts[caller]}回 {latency:.3f}秒")
+        return "\n".join(lines)
+
+    def dump_trace(self, file_path: Path | str, format: Literal["chrome", "folded"] = "chrome"):
+        """
+        トレースを書き出す
+        chrome: Trace Event形式のJSON。chrome://tracing, Perfetto, speedscopeで開ける
+        folded: 「呼び出し元;...;コマンド マイクロ秒」の行。flamegraph.plやspeedscopeに渡せる
+        """
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if format == "folded":
+            folded_counter: Counter[str] = Counter()
+            for record in self.records:
+                folded_counter[";".join((*record.callers, record.command))] += int(record.latency * 1_000_000)
+            file_path.write_text("".join(f"{stack} {us}\n" for stack, us in folded_counter.items()), encoding="utf-8")
+            return
+        event_list = [
+            {
+                "name": record.command,
+                "cat": record.caller,
+                "ph": "X",
+                "ts": record.start * 1_000_000,
+                "dur": record.latency * 1_000_000,
+                "pid": 0,
+                "tid": record.thread_id,
+                "args": {
+                    "callers": list(record.callers),
+                    "request_bytes": record.request_bytes,
+                    "response_bytes": record.response_bytes,
+                },
+            }
+            for record in self.records
+        ]
+        file_path.write_text(json.dumps({"traceEvents": event_list}), encoding="utf-8")
+
+
+class CommandProfiler:
+    """
+    driver.command_executor.executeを差し替えて、全コマンドを記録する
+    1つのdriverに1つ。profileが重なっても、動いている全部のCommandStatsに記録する
+    """
+
+    def __init__(self, driver: WebDriver):
+        self.executor = driver.command_executor
+        self._stats_list: list[CommandStats] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, driver: WebDriver) -> CommandProfiler:
+        profiler = getattr(driver.command_executor, "_autoweb_profiler", None)
+        if profiler is None:
+            profiler = cls(driver)
+            driver.command_executor._autoweb_profiler = profiler
+        return profiler
+
+    def start(self, stats: CommandStats):
+        with self._lock:
+            if self._stats_list.__len__() == 0:
+                # インスタンスの属性でメソッドを隠す
+                self.executor.execute = self._execute
+            self._stats_list.append(stats)
+
+    def stop(self, stats: CommandStats):
+        with self._lock:
+            self._stats_list.remove(stats)
+            if self._stats_list.__len__() == 0:
+                del self.executor.execute
+
+    def _execute(self, command: str, params: dict):
+        callers = _get_element_callers(sys._getframe(1))
+        response = None
+        start = time.perf_counter()
+        try:
+            response = type(self.executor).execute(self.executor, command, params)
+        finally:
+            latency = time.perf_counter() - start
+            request_bytes = _json_size(params)
+            response_bytes = 0 if response is None else _json_size(response)
+            with self._lock:
+                stats_list = list(self._stats_list)
+            for stats in stats_list:
+                stats.add(
+                    CommandRecord(
+                        command=command,
+                        callers=callers,
+                        start=start - stats.started_at,
+                        latency=latency,
+                        request_bytes=request_bytes,
+                        response_bytes=response_bytes,
+                        thread_id=threading.get_ident(),
+                    )
+                )
+        return response
+
+
+@contextmanager
+def profile(driver: WebDriver, trace_path: Path | str | None = None) -> Iterator[CommandStats]:
+    """with中のコマンドを記録する。trace_pathがあれば抜けるときにトレースを書き出す"""
+    profiler = CommandProfiler.of(driver)
+    stats = CommandStats()
+    profiler.start(stats)
+    try:
+        yield stats
+    finally:
+        profiler.stop(stats)
+        if not trace_path is None:
+            format = "folded" if Path(trace_path).suffix == ".folded" else "chrome"
+            stats.dump_trace(trace_path, format=format)
+
+
+def _get_element_callers(frame) -> tuple[str, ...]:
+    """スタックをさかのぼって、Element/ElementListのメソッド名を外側から順に"""
+    from autoweb_module.selenium.element import Element
+    from autoweb_module.selenium.element_list import ElementList
+
+    caller_list = []
+    while not frame is None:
+        owner = frame.f_locals.get("self")
+        # clear_cache_on_staleなどのデコレータの枠は飛ばす
+        if isinstance(owner, Element | ElementList) and frame.f_code.co_name != "wrapper":
+            caller_list.append(f"{owner.__class__.__name__}.{frame.f_code.co_name}")
+        frame = frame.f_back
+    return tuple(reversed(caller_list))
+
+
+def _json_size(value) -> int:
+    # WebElementなどJSONにできないものは文字列にして数える
+    return json.dumps(value, default=str, ensure_ascii=False).encode("utf-8").__len__()
@@ -0,0 +1,442 @@
+# 標準ライブラリ
+from functools import cache
+import json
+import pkgutil
+
+# execute_scriptで使うJavaScript。ラウンドトリップを減らすための一括処理系はここにまとめる
+
+
+@cache
+def get_attribute_atom() -> str:
+    """
+    seleniumのget_attributeが内部で使っているJavaScript(atom)
+    これを使えば一括取得でもElement.attrと同じ値が取れる
+    """
+    return pkgutil.get_data("selenium.webdriver.remote", "getAttribute.js").decode("utf8")
+
+
+_FETCH_ROWS_JS = """
+const [elems, attrs, props, withText, withTagName] = arguments;
+const getAttribute = (__GET_ATTRIBUTE__);
+// JSONにできない値(DOMオブジェクトなど)は文字列にしておく
+const toPlain = (v) => {
+    if (v === null || v === undefined) return null;
+    if (typeof v === "object" || typeof v === "function") return String(v);
+    return v;
+};
+return elems.map((el) => {
+    const row = attrs.map((name) => getAttribute(el, name));
+    for (const name of props) row.push(toPlain(el[name]));
+    if (withText) row.push(el.innerText);
+    if (withTagName) row.push(el.tagName.toLowerCase());
+    return row;
+});
+"""
+
+
+@cache
+def fetch_rows_js() -> str:
+    """複数のWebElementの属性・プロパティ・テキスト・タグ名をまとめて取得するスクリプト"""
+    return _FETCH_ROWS_JS.replace("__GET_ATTRIBUTE__", get_attribute_atom())
+
+
+FILTER_XPATH_JS = """
+const [elems, xpath] = arguments;
+return elems.filter((el) => document.evaluate(xpath, el, null, XPathResult.BOOLEAN_TYPE, null).booleanValue);
+"""
+
+FILTER_CSS_JS = """
+const [elems, css] = arguments;
+return elems.filter((el) => el.matches(css));
+"""
+
+CLICK_ALL_JS = """
+for (const el of arguments[0]) el.click();
+"""
+
+IS_CONNECTED_JS = """
+return arguments[0].map((el) => el.isConnected);
+"""
+
+# ページの状態を表す文字列。ページ遷移でtokenが、DOMの変化でcountが変わる
+PAGE_STATE_JS = """
+if (!window.__autowebPageState) {
+    const state = {token: Math.random().toString(36).slice(2), count: 0};
+    new MutationObserver(() => { state.count++; }).observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true,
+    });
+    window.__autowebPageState = state;
+}
+return window.__autowebPageState.token + ":" + window.__autowebPageState.count;
+"""
+
+# execute_async_script用。rootの下でselectorに合う要素がmin_count個以上になった瞬間に全部返す。時間切れならnull
+# stableMsがあれば、件数がstableMs変わらなくなってから返す
+WAIT_ELEMS_JS = """
+const [root, locator, selector, minCount, stableMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const scope = root || document;
+const find = () => {
+    if (locator === "css") return Array.from(scope.querySelectorAll(selector));
+    const result = document.evaluate(selector, scope, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const found = [];
+    for (let i = 0; i < result.snapshotLength; i++) {
+        const node = result.snapshotItem(i);
+        if (node.nodeType === Node.ELEMENT_NODE) found.push(node);
+    }
+    return found;
+};
+let last = find();
+let settleTimer = null;
+let timer = null;
+let observer = null;
+const finish = (value) => {
+    if (observer) observer.disconnect();
+    clearTimeout(settleTimer);
+    clearTimeout(timer);
+    done(value);
+};
+const check = (found) => {
+    if (found.length < minCount) {
+        clearTimeout(settleTimer);
+        settleTimer = null;
+        return false;
+    }
+    if (stableMs === null) {
+        finish(found);
+        return true;
+    }
+    // 件数が変わるたびに数え直し
+    clearTimeout(settleTimer);
+    settleTimer = setTimeout(() => finish(find()), stableMs);
+    return false;
+};
+if (check(last)) return;
+observer = new MutationObserver(() => {
+    const found = find();
+    if (settleTimer !== null && found.length === last.length) return;
+    last = found;
+    check(found);
+});
+observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+timer = setTimeout(() => finish(null), timeoutMs);
+"""
+
+# execute_async_script用。elemがDOMから外れた瞬間にtrue。時間切れならfalse
+WAIT_DETACHED_JS = """
+const [elem, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+if (!elem.isConnected) {
+    done(true);
+    return;
+}
+let timer = null;
+const observer = new MutationObserver(() => {
+    if (elem.isConnected) return;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(true);
+});
+observer.observe(document, {subtree: true, childList: true});
+timer = setTimeout(() => {
+    observer.disconnect();
+    done(false);
+}, timeoutMs);
+"""
+
+# [locator, selector]ごとに最初に合う要素(なければnull)を探す関数
+_FIND_FIRST_EACH_JS = """
+const findFirstEach = (root, selectorList) => {
+    const scope = root || document;
+    return selectorList.map(([locator, selector]) => {
+        if (locator === "css") return scope.querySelector(selector);
+        const result = document.evaluate(selector, scope, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null);
+        return result.singleNodeValue;
+    });
+};
+"""
+
+# 複数の条件をまとめて1回で探す
+FIND_CONDS_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [root, selectorList] = arguments;
+return findFirstEach(root, selectorList);
+"""
+)
+
+# execute_async_script用。modeがanyならどれか1つ、allなら全部の条件に合う要素が現れた瞬間に返す。時間切れならnull
+WAIT_CONDS_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [root, selectorList, mode, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const evaluate = () => {
+    const found = findFirstEach(root, selectorList);
+    const ok = mode === "any" ? found.some((el) => el !== null) : found.every((el) => el !== null);
+    return ok ? found : null;
+};
+const first = evaluate();
+if (first !== null) {
+    done(first);
+    return;
+}
+let timer = null;
+const observer = new MutationObserver(() => {
+    const found = evaluate();
+    if (found === null) return;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(found);
+});
+observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+timer = setTimeout(() => {
+    observer.disconnect();
+    done(null);
+}, timeoutMs);
+"""
+)
+
+# goto用。遷移前のページに印を付けておき、新しいページに変わったかを見分ける
+GOTO_MARK_JS = "window.__autowebGoto = arguments[0];"
+
+# goto用。まだ前のページならnull。新しいページなら[DOMContentLoaded済みか, 条件に合う要素(なければnull)]
+GOTO_STATE_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [token, selectorList] = arguments;
+if (window.__autowebGoto === token) return null;
+const found = findFirstEach(null, selectorList).find((el) => el !== null) || null;
+return [document.readyState !== "loading", found];
+"""
+)
+
+# execute_async_script用。新しいページで条件に合う要素が現れるかDOMContentLoadedの早いほうで返す。時間切れならnull
+WAIT_READY_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [selectorList, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const evaluate = () => {
+    const found = findFirstEach(null, selectorList).find((el) => el !== null) || null;
+    if (found !== null) return [false, found];
+    if (document.readyState !== "loading") return [true, null];
+    return null;
+};
+const first = evaluate();
+if (first !== null) {
+    done(first);
+    return;
+}
+let timer = null;
+const finish = (result) => {
+    observer.disconnect();
+    document.removeEventListener("DOMContentLoaded", onReady);
+    clearTimeout(timer);
+    done(result);
+};
+const onReady = () => finish([true, findFirstEach(null, selectorList).find((el) => el !== null) || null]);
+const observer = new MutationObserver(() => {
+    const result = evaluate();
+    if (result !== null) finish(result);
+});
+observer.observe(document, {subtree: true, childList: true, attributes: true});
+document.addEventListener("DOMContentLoaded", onReady);
+timer = setTimeout(() => finish(null), timeoutMs);
+"""
+)
+
+# 要素のページ上の位置と大きさ。CDPのスクショのclip用
+ELEMENT_CLIP_JS = """
+const rect = arguments[0].getBoundingClientRect();
+return [rect.left + window.scrollX, rect.top + window.scrollY, rect.width, rect.height];
+"""
+
+# fill_form用。全項目に値を入れてinput/changeイベントを起こし、全部入れ終わってから値を確かめる
+# fieldsは{elem, selector, value, valueType}の配列。項目ごとに{error: 理由 or null, value: 実際の値}を返す
+# verifyがfalseなら、入れた値になっているかは確かめない(見つからない・入れられないものはerror)
+FILL_FORM_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [root, fields, verify] = arguments;
+const normalize = (text) => text.replace(/\\s+/g, " ").trim();
+const elems = fields.map((field) => field.elem || findFirstEach(root, [field.selector])[0]);
+const setValue = (el, value) => {
+    // Reactなどがvalueの代入を横取りしていても効くように、プロトタイプのsetterで入れる
+    const proto = el.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(el, value);
+};
+const matchOptions = (el, value, valueType) => {
+    const options = Array.from(el.options);
+    switch (valueType) {
+        case "value": return options.filter((option) => option.value === String(value));
+        case "text": return options.filter((option) => normalize(option.text) === normalize(String(value)));
+        case "index": return options.filter((option) => option.index === Number(value));
+    }
+    return [];
+};
+const results = fields.map((field, i) => {
+    const el = elems[i];
+    if (!el) return {error: "要素が見つかりません。", value: null};
+    const tag = el.tagName.toLowerCase();
+    const type = (el.type || "").toLowerCase();
+    if (tag === "select") {
+        const matched = matchOptions(el, field.value, field.valueType);
+        if (matched.length === 0) return {error: `optionがありません。: ${field.valueType}=${field.value}`, value: null};
+        if (matched.some((option) => option.disabled)) return {error: "無効なoptionは選べません。", value: null};
+        // select()と同じく、multipleなら合うものを全部、そうでなければ最初の1つ
+        for (const option of el.multiple ? matched : matched.slice(0, 1)) option.selected = true;
+        elems[i] = {el, check: () => matched.slice(0, el.multiple ? matched.length : 1).every((option) => option.selected)};
+    } else if (tag === "input" && (type === "checkbox" || type === "radio")) {
+        el.checked = Boolean(field.value);
+        elems[i] = {el, check: () => el.checked === Boolean(field.value)};
+    } else if (tag === "input" && type === "file") {
+        return {error: "type=fileはsend_keysで入力してください。", value: null};
+    } else if (tag === "input" || tag === "textarea") {
+        setValue(el, String(field.value));
+        elems[i] = {el, check: () => el.value === String(field.value)};
+    } else {
+        return {error: `入力できないタグです。: ${tag}`, value: null};
+    }
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+    return null;
+});
+// イベントで他の項目が書き換わることもあるので、全部入れてから確かめる
+return results.map((result, i) => {
+    if (result !== null) return result;
+    const {el, check} = elems[i];
+    let value = el.value;
+    if (el.tagName === "SELECT") value = Array.from(el.selectedOptions).map((option) => option.value);
+    else if (el.type === "checkbox" || el.type === "radio") value = el.checked;
+    return {error: !verify || check() ? null : "入れた値になっていません。", value};
+});
+"""
+)
+
+# extract_rows用。rootの下の行要素を全部探してページ内にtokenで取っておき、件数を返す
+EXTRACT_START_JS = """
+const [root, locator, selector, token] = arguments;
+const scope = root || document;
+let rows = [];
+if (locator === "css") {
+    rows = Array.from(scope.querySelectorAll(selector));
+} else {
+    const result = document.evaluate(selector, scope, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < result.snapshotLength; i++) {
+        const node = result.snapshotItem(i);
+        if (node.nodeType === Node.ELEMENT_NODE) rows.push(node);
+    }
+}
+window.__autowebExtract = window.__autowebExtract || {};
+window.__autowebExtract[token] = rows;
+return rows.length;
+"""
+
+# extract_rows用。取っておいた行の[start, end)を、列ごとに[locator, selector, attr]で読む
+# locatorがnullなら行そのもの、attrがnullならテキスト(innerText)
+_EXTRACT_CHUNK_JS = """
+const [token, columns, start, end] = arguments;
+const getAttribute = (__GET_ATTRIBUTE__);
+const rows = (window.__autowebExtract || {})[token];
+if (!rows) throw new Error("抽出中にページが変わりました。");
+const findFirst = (row, locator, selector) => {
+    if (locator === "css") return row.querySelector(selector);
+    return document.evaluate(selector, row, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+};
+return rows.slice(start, end).map((row) => columns.map(([locator, selector, attr]) => {
+    const el = locator === null ? row : findFirst(row, locator, selector);
+    if (!el) return null;
+    return attr === null ? el.innerText : getAttribute(el, attr);
+}));
+"""
+
+
+@cache
+def extract_chunk_js() -> str:
+    """extract_rowsで行をまとめて読むスクリプト"""
+    return _EXTRACT_CHUNK_JS.replace("__GET_ATTRIBUTE__", get_attribute_atom())
+
+
+EXTRACT_RELEASE_JS = """
+if (window.__autowebExtract) delete window.__autowebExtract[arguments[0]];
+"""
+
+# crawl用。次のページへの要素と、別タブで先読みできるURL(リンクでなければnull)
+NEXT_PAGE_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [selectorList] = arguments;
+const el = findFirstEach(null, selectorList)[0];
+if (el === null) return null;
+const url = el.href;
+const usable = typeof url === "string" && /^https?:/.test(url) && url.split("#")[0] !== location.href.split("#")[0];
+return [el, usable ? url : null];
+"""
+)
+
+# crawl_pages用。クリックの前にページに印を付け、changedに合う最初の要素にも印を付けておく
+NEXT_PAGE_MARK_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [token, changedSelectorList] = arguments;
+window.__autowebGoto = token;
+const found = findFirstEach(null, changedSelectorList).find((el) => el !== null) || null;
+if (found !== null) found.__autowebPage = token;
+"""
+)
+
+# crawl_pages用。クリックの前と同じページ(印が残っている)か
+PAGE_MARKED_JS = "return window.__autowebGoto === arguments[0];"
+
+# crawl_pages用。新しいページならGOTO_STATE_JSと同じ形
+# 同じページのまま(XHR・pushStateで中身だけ入れ替え)なら、changedに合う最初の要素が印のないものに替わったら[true, その要素]
+# どちらでもなければnull
+NEXT_PAGE_STATE_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [token, selectorList, changedSelectorList] = arguments;
+if (window.__autowebGoto !== token) {
+    const found = findFirstEach(null, selectorList).find((el) => el !== null) || null;
+    return [document.readyState !== "loading", found];
+}
+if (changedSelectorList.length === 0) return null;
+const changed = findFirstEach(null, changedSelectorList).find((el) => el !== null) || null;
+if (changed === null || changed.__autowebPage === token) return null;
+return [true, changed];
+"""
+)
+
+# TabManager用。window.openしたタブがまだabout:blankならnull。読み込み後はGOTO_STATE_JSと同じ形
+TAB_STATE_JS = (
+    _FIND_FIRST_EACH_JS
+    + """
+const [selectorList] = arguments;
+if (location.href === "about:blank") return null;
+const found = findFirstEach(null, selectorList).find((el) => el !== null) || null;
+return [document.readyState !== "loading", found];
+"""
+)
+
+_TAB_READY_EXPRESSION = """
+(() => {
+__FIND_FIRST_EACH__
+const selectorList = __SELECTOR_LIST__;
+if (location.href === "about:blank") return false;
+return document.readyState !== "loading" || findFirstEach(null, selectorList).some((el) => el !== null);
+})()
+"""
+
+
+def tab_ready_expression(selector_list: list) -> str:
+    """
+    TabManager用。CDPのRuntime.evaluateでタブを切り替えずに読み込みを見る式。TAB_STATE_JSと同じ判定で、準備できていればtrue
+    Runtime.evaluateは同じページで何度も呼ぶので、constがグローバルに残らないよう即時関数で包む
+    """
+    return _TAB_READY_EXPRESSION.replace("__FIND_FIRST_EACH__", _FIND_FIRST_EACH_JS).replace(
+        "__SELECTOR_LIST__", json.dumps(selector_list)
+    )
+
+
+# TabManager用
+OPEN_TAB_JS = "window.open(arguments[0], '_blank');"
@@ -1,22 +1,37 @@
 # 標準ライブラリ
+from collections.abc import Callable, Iterator
 from pathlib import Path
-from typing import Literal
+from typing import Literal, TypeVar
 
 # 自作モジュール
 import download_module
 import time_module
 from autoweb_module import Element
 from autoweb_module.selenium.options import ChromeOptionsComposer, FirefoxOptionsComposer
+from autoweb_module.selenium.wait import WaitStrategy
+from autoweb_module.selenium.cdp import CdpConnection
+from autoweb_module.selenium.download import DownloadTracker
+from autoweb_module.selenium.blocking import BlockProfile, ResourceBlocker
+from autoweb_module.selenium.writer import BackgroundWriter
+from autoweb_module.selenium.cond import Cond
+from autoweb_module.selenium.crawl import crawl_pages
+from autoweb_module.selenium.tabs import TabManager
 
 # 外部ライブラリ
 from selenium.webdriver.remote.webdriver import WebDriver
 
+T = TypeVar("T")
+
 
 class Selenium:
     def __init__(self, element_class: type = Element):
         # 扱うElementクラスを決定
         if not hasattr(self, "element_class"):
             self.element_class = element_class
+        self._cdp_connection: CdpConnection | None = None
+        self.download_tracker: DownloadTracker | None = None
+        self.resource_blocker: ResourceBlocker | None = None
+        self.tabs: TabManager | None = None
 
         # browser_name
 
@@ -30,7 +45,20 @@ class Selenium:
         headless: str | None = None,
         wait_time: int | float | time_module.MutableWaitTime | None = None,
         is_raise_for_no_vpn: bool = False,
+        wait_strategy: WaitStrategy | None = None,
+        download_tracking: bool = False,
+        block: BlockProfile | Literal["text-only", "no-media"] | None = None,
+        page_load_strategy: Literal["normal", "eager", "none"] = "normal",
+        writer: BackgroundWriter | None = None,
     ):
+        """
+        wait_strategyで要素待ちのやり方(poll/observe)を指定できる。デフォルトは0.5秒ごとのpoll
+        download_tracking=Trueならダウンロードをブラウザのイベント(CDP)で追う。click(is_download=True)が同時ダウンロードでも取り違えなくなる
+        blockで画像やフォント、トラッカーなどを読み込ませない。プリセット名かBlockProfileを渡す。集計はresource_blocker.reports
+        page_load_strategyを"eager"/"none"にするとページ遷移で画像などの読み込みを待たない。Element.gotoと組み合わせる
+        writerを渡すとsave_ss/save_htmlの書き込みを別スレッドでやる。終わりを待つにはwriter.flush()
+        起動後はtabs(TabManager)でタブを開く・切り替える・閉じる。tabs.mapで複数のurlをタブに割り振って読み込みを重ねる
+        """
         match browser_name:
             case "chrome":
                 options_composer = ChromeOptionsComposer()
@@ -39,24 +67,69 @@ class Selenium:
                 options_composer = FirefoxOptionsComposer()
             case "tor":
                 raise NotImplementedError("まだtorブラウザ非対応です。")
-        if default_save_folder is None:
+        if not default_save_folder is None:
             default_save_folder = Path(default_save_folder)
         # seleniumライブラリのdriverを起動。これをラップする
         self._driver: WebDriver = options_composer.main(
-            default_save_folder, profile_path=profile_path, headless=headless
+            default_save_folder, profile_path=profile_path, headless=headless, page_load_strategy=page_load_strategy
         )
+        if download_tracking or not block is None:
+            self._cdp_connection = CdpConnection.from_driver(self._driver)
+        if download_tracking:
+            download_folder = Path.home() / "Downloads" if default_save_folder is None else default_save_folder
+            self.download_tracker = DownloadTracker(self._cdp_connection, download_folder)
+        if not block is None:
+            if isinstance(block, str):
+                block = BlockProfile.preset(block)
+            self.resource_blocker = ResourceBlocker(self._cdp_connection, block)
         self._start(start_url)
         # 待機時間はデフォルト10秒
         if wait_time is None:
             wait_time = 10
+        if wait_strategy is None:
+            wait_strategy = WaitStrategy()
         self.driver: Element = self.element_class(
-            elem=self._driver, save_folder=default_save_folder, debug_mode=debug_mode, _wait_time=wait_time
+            elem=self._driver,
+            save_folder=default_save_folder,
+            debug_mode=debug_mode,
+            _wait_time=wait_time,
+            wait_strategy=wait_strategy,
+            download_tracker=self.download_tracker,
+            writer=writer,
         )
+        self.tabs = TabManager(self.driver, self._get_cdp_connection)
+
+    def _get_cdp_connection(self) -> CdpConnection:
+        """CDPの接続。まだつないでいなければここでつなぐ(chromium系のみ)"""
+        if self._cdp_connection is None:
+            self._cdp_connection = CdpConnection.from_driver(self._driver)
+        return self._cdp_connection
+
+    def crawl(
+        self,
+        extract: Callable[[Element], T],
+        next_page: Cond,
+        ready: Cond | None = None,
+        max_pages: int | None = None,
+        lookahead: int = 1,
+        wait_time: int | float | None = None,
+        changed: Cond | None = None,
+    ) -> Iterator[T]:
+        """
+        今のページから「次へ」(next_page)をたどって、ページごとのextract(driver)の結果を順に返す
+        次のページは別タブで先読みするので、extractや受け取った側の処理の間もブラウザが読み込みを進める
+        for item_list in selenium.crawl(lambda d: d.find_elems("css", ".item").texts(), TagCond("a") & TextCond("次へ")):
+        XHRなどで同じページのまま中身を入れ替える「次へ」なら、入れ替わる要素をchangedに渡す(詳細はcrawl_pages)
+        """
+        return crawl_pages(self.tabs, extract, next_page, ready, max_pages, lookahead, wait_time, changed)
 
     def _start(self, start_url: str):
         self._driver.get(start_url)
 
     def quit(self):
+        if not self._cdp_connection is None:
+            self._cdp_connection.close()
+            self._cdp_connection = None
         try:
             self._driver.quit()
         except Exception:
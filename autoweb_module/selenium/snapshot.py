@@ -0,0 +1,209 @@
+# 標準ライブラリ
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Self, Literal
+from urllib.parse import urljoin
+import re
+
+# 外部ライブラリ
+from lxml import etree, html as lxml_html
+from selenium.common.exceptions import NoSuchElementException
+
+# 自作ライブラリ
+from autoweb_module.selenium.const import INPUTABLE_TAG_NAME_LIST, BOOLEAN_ATTRIBUTE_NAME_LIST, URL_ATTRIBUTE_NAME_LIST
+from autoweb_module.selenium.cond import Cond, LocatorCond, TextCond, XpathMaker
+
+# fragmentとして読むとタグが消えるouterHTML(<header>などは含まない)
+DOCUMENT_TAG_PATTERN = re.compile(r"\s*<(html|head|body)[\s/>]", re.IGNORECASE)
+
+
+@dataclass
+class Snapshot:
+    """
+    ブラウザから1回だけ取ってきたHTMLをlxmlで持っておき、find_elem/attr/textなどにローカルで答える
+    読むだけのスクレイピング向け。ブラウザとの往復がないので速く、その間ブラウザは次のページへ進める
+    ライブなDOMではないので、取得後の変化(入力したvalueなど)は反映されない
+    """
+
+    node: etree._Element
+    base_url: str | None = None  # href/srcを絶対URLにするときの基準
+    debug_mode: bool = False
+
+    @classmethod
+    def from_html(cls, html: str, base_url: str | None = None, is_document: bool = True, debug_mode: bool = False):
+        """
+        HTML文字列から作る
+        is_documentがTrueならページ全体(page_source)、Falseなら1要素分(outerHTML)として読む
+        """
+        if is_document:
+            node = lxml_html.document_fromstring(html)
+        else:
+            node = cls._parse_outer_html(html)
+        return cls(node=node, base_url=base_url, debug_mode=debug_mode)
+
+    @staticmethod
+    def _parse_outer_html(html: str) -> etree._Element:
+        """
+        1要素分のouterHTMLを読み、その要素を返す
+        html/head/bodyはfragmentとして読むとタグが消えて中身だけになるので、ページとして読んでから取り出す
+        """
+        match = DOCUMENT_TAG_PATTERN.match(html)
+        if not match is None:
+            document = lxml_html.document_fromstring(html)
+            tag_name = match.group(1).lower()
+            if tag_name == "html":
+                return document
+            node = document.find(tag_name)
+            if node is None:
+                raise ValueError(f"{tag_name}タグを読めませんでした。")
+            return node
+        parent = lxml_html.fragment_fromstring(html, create_parent=True)
+        if parent.__len__() != 1:
+            raise ValueError(f"outerHTMLは1要素分です。{parent.__len__()}要素ありました。")
+        node = parent[0]
+        # 包んだdivを親に見せない
+        parent.remove(node)
+        return node
+
+    def _get_new_snapshot(self, node: etree._Element) -> Self:
+        return self.__class__(node=node, base_url=self.base_url, debug_mode=self.debug_mode)
+
+    def __eq__(self, other: Self) -> bool:
+        if not isinstance(other, Snapshot):
+            return False
+        return self.node is other.node
+
+    def __repr__(self) -> str:
+        return f"type: {self.__class__.__name__} タグ名: {self.tag_name}"
+
+    # ---------------find_elem系---------------
+    def find_elem(
+        self,
+        locator: Literal["id", "name", "tag", "xpath", "css", "link", "plink", "class"],
+        attr: str,
+    ) -> Self:
+        """Element.find_elemと同じ引数で探す。見つからなければNoSuchElementException"""
+        snapshot_list = self.find_elems(locator, attr)
+        if snapshot_list.__len__() == 0:
+            raise NoSuchElementException(f"スナップショットに要素がありません。: {locator}={attr}")
+        return snapshot_list[0]
+
+    def find_elems(
+        self,
+        locator: Literal["id", "name", "tag", "xpath", "css", "link", "plink", "class"],
+        attr: str,
+    ) -> list[Self]:
+        """Element.find_elemsと同じ引数で探す。cssはcssselect(依存に含む)でxpathに直して探す"""
+        if locator == "css":
+            node_list = self.node.cssselect(attr)
+        else:
+            node_list = self.node.xpath(self._to_xpath(locator, attr))
+        # xpathは文字列や数値を返すこともあるので要素だけ
+        return [self._get_new_snapshot(node) for node in node_list if self._is_element_node(node)]
+
+    def find_cond_elem(self, cond: Cond) -> Self:
+        """XpathMakerが作るのと同じxpathで探す"""
+        return self.find_elem("xpath", cond.xpath)
+
+    def find_cond_elems(self, cond: Cond) -> list[Self]:
+        return self.find_elems("xpath", cond.xpath)
+
+    def find_locator_elem(
+        self, name: str, value: str, match: Literal["equals", "contains", "startswith", "endswith"] = "equals"
+    ) -> Self:
+        return self.find_cond_elem(LocatorCond(name, value, match))
+
+    def find_locator_elems(
+        self, name: str, value: str, match: Literal["equals", "contains", "startswith", "endswith"] = "equals"
+    ) -> list[Self]:
+        return self.find_cond_elems(LocatorCond(name, value, match))
+
+    def find_text_elem(self, value: str, match: Literal["equals", "contains"] = "equals") -> Self:
+        return self.find_cond_elem(TextCond(value, match))
+
+    def find_text_elems(self, value: str, match: Literal["equals", "contains"] = "equals") -> list[Self]:
+        return self.find_cond_elems(TextCond(value, match))
+
+    def _to_xpath(self, locator: str, attr: str) -> str:
+        """seleniumのロケータをxpathに直す"""
+        quote_value = XpathMaker().quote_value(attr)
+        match locator:
+            case "xpath":
+                return attr
+            case "id":
+                return f".//*[@id = {quote_value}]"
+            case "name":
+                return f".//*[@name = {quote_value}]"
+            case "tag":
+                return f".//{attr}"
+            case "class":
+                # class属性を空白区切りで見て、単語として一致するもの
+                quote_class = XpathMaker().quote_value(f" {attr} ")
+                return f".//*[contains(concat(' ', normalize-space(@class), ' '), {quote_class})]"
+            case "link":
+                return f".//a[normalize-space() = {quote_value}]"
+            case "plink":
+                return f".//a[contains(normalize-space(), {quote_value})]"
+        raise ValueError(f"非対応のロケータです。: {locator}")
+
+    def _is_element_node(self, node) -> bool:
+        # コメントなどは除く
+        return isinstance(node, etree._Element) and isinstance(node.tag, str)
+
+    @property
+    def parent(self) -> Self:
+        """1つ親"""
+        return self.find_elem("xpath", "..")
+
+    @property
+    def children(self) -> list[Self]:
+        """1つ子すべて"""
+        return self.find_elems("xpath", "./*")
+
+    # ---------------status系---------------
+    @property
+    def is_input(self) -> bool:
+        return self.tag_name in INPUTABLE_TAG_NAME_LIST
+
+    @property
+    def exists(self) -> bool:
+        # ローカルのコピーなので消えることはない
+        return True
+
+    @property
+    def text(self) -> str:
+        """
+        そのelem以下のテキスト。script/styleの中身は除き、空白は1つにまとめる
+        ブラウザの描画を見ていないので、非表示の要素のテキストも入る
+        """
+        text_list = self.node.xpath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+        if self.node.tag in ("script", "style", "template"):
+            text_list = []
+        return " ".join("".join(text_list).split())
+
+    @property
+    def tag_name(self) -> str:
+        return self.node.tag
+
+    def attr(self, name: str) -> str | None:
+        """
+        属性値。Element.attrに寄せて、真偽値の属性は"true"かNone、href/srcは絶対URLにする
+        """
+        value = self.node.get(name)
+        if name in BOOLEAN_ATTRIBUTE_NAME_LIST:
+            return None if value is None else "true"
+        if value is None:
+            return None
+        if name in URL_ATTRIBUTE_NAME_LIST and not self.base_url is None:
+            return urljoin(self.base_url, value.strip())
+        return value
+
+    @property
+    def value(self) -> str | None:
+        """HTMLに書かれたvalue属性(取得後に入力された値は反映されない)"""
+        return self.attr("value")
+
+    @property
+    def html(self) -> str:
+        """そのelemのHTML(outerHTML相当)"""
+        return lxml_html.tostring(self.node, encoding="unicode")
@@ -0,0 +1,307 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Generic, TypeVar
+import time
+import warnings
+
+# 外部ライブラリ
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchWindowException,
+    TimeoutException,
+    WebDriverException,
+)
+
+# 自作ライブラリ
+from autoweb_module.exceptions import CdpError
+from autoweb_module.selenium import script, wait
+from autoweb_module.selenium.cdp import CdpConnection
+from autoweb_module.selenium.cond import Cond
+from autoweb_module.selenium.element import Element
+
+T = TypeVar("T")
+
+
+@dataclass
+class TabStats:
+    """TabManager.mapのタブ(枠)ごとの統計"""
+
+    slot: int
+    job_count: int = 0
+    timeout_count: int = 0
+    load_seconds: float = 0.0  # 開いてから読み込み終わるまでの時間の合計
+    process_seconds: float = 0.0  # processにかかった時間の合計
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        end = time.perf_counter() if self.finished_at is None else self.finished_at
+        return end - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """1秒あたりに終えたジョブの数"""
+        elapsed = self.elapsed_seconds
+        if elapsed <= 0:
+            return 0.0
+        return self.job_count / elapsed
+
+
+@dataclass
+class TabResult(Generic[T]):
+    """TabManager.mapの1ジョブの結果。読み込みが時間切れならvalueはNoneでerrorにTimeoutException"""
+
+    url: str
+    slot: int
+    value: T | None
+    error: Exception | None
+    load_seconds: float
+    process_seconds: float
+
+
+class TabManager:
+    """
+    1つのブラウザのタブ(ウィンドウハンドル)を開く・切り替える・閉じる
+    ブラウザをN個起動するより、1つのブラウザでタブをN個開くほうがメモリがずっと少ない
+    WebDriverは同時に1つのタブしか操作できないが、読み込みはタブごとに裏で進むので、mapで待ち時間を重ねられる
+
+    今のタブは覚えておいて切り替えのラウンドトリップを省く。TabManagerを通さずにタブを切り替えたり閉じたりしたら、syncで読み直す
+    (map・crawl_pagesは始めとprocess・extractのあとにsyncする)
+    connection_getterでCDPの接続が得られれば、mapは読み込みをタブを切り替えずに見る
+    """
+
+    def __init__(self, driver: Element, connection_getter: Callable[[], CdpConnection | None] | None = None):
+        self.driver = driver
+        self.home = driver.driver.current_window_handle  # 作ったときのタブ。閉じたあとの戻り先
+        self._current = self.home
+        self._connection_getter = connection_getter
+        self._session_dict: dict[str, str] = {}  # ハンドル(=CDPのtargetId) -> sessionId
+        self.stats: list[TabStats] = []  # 最後のmapのタブごとの統計
+
+    @property
+    def handles(self) -> list[str]:
+        return self.driver.driver.window_handles
+
+    @property
+    def current(self) -> str:
+        return self._current
+
+    def sync(self) -> str:
+        """
+        今のタブをドライバから読み直して返す。TabManagerを通さずに切り替えた・閉じたあとに呼ぶ
+        今のタブが閉じられていたら、homeが残っていればhome、なければ残っているタブの先頭に移る
+        """
+        web_driver = self.driver.driver
+        try:
+            self._current = web_driver.current_window_handle
+            return self._current
+        except NoSuchWindowException:
+            pass
+        handle_list = web_driver.window_handles
+        if handle_list.__len__() == 0:
+            raise NoSuchWindowException("開いているタブがありません。")
+        if not self.home in handle_list:
+            self.home = handle_list[0]
+        web_driver.switch_to.window(self.home)
+        self._current = self.home
+        return self._current
+
+    def open(self, url: str) -> str:
+        """
+        urlを新しいタブで開き、そのハンドルを返す。読み込みは待たず、操作するタブも今のまま
+        driver.getと違い、page_load_strategyが"normal"でも読み込みの終わりを待たない
+        """
+        web_driver = self.driver.driver
+        before = set(web_driver.window_handles)
+        web_driver.execute_script(script.OPEN_TAB_JS, url)
+        handle_list = [handle for handle in web_driver.window_handles if not handle in before]
+        if handle_list.__len__() == 0:
+            raise WebDriverException(f"タブを開けませんでした。ポップアップがブロックされていないか確認してください。: {url}")
+        return handle_list[-1]
+
+    def switch(self, handle: str):
+        """操作するタブを変える。もうそのタブならなにもしない"""
+        if handle == self._current:
+            return
+        self.driver.driver.switch_to.window(handle)
+        self._current = handle
+
+    def close(self, handle: str | None = None, switch_to: str | None = None):
+        """
+        handle(省略時は今のタブ)を閉じ、switch_toのタブに移る
+        switch_toを省略すると、homeが残っていればhome、なければ残っているタブの先頭に移る
+        homeを閉じたときは、移った先が新しいhome
+        """
+        web_driver = self.driver.driver
+        if handle is None:
+            handle = self._current
+        self.switch(handle)
+        web_driver.close()
+        self._session_dict.pop(handle, None)
+        if switch_to is None:
+            handle_list = web_driver.window_handles
+            if handle_list.__len__() == 0:
+                return
+            switch_to = self.home if self.home in handle_list else handle_list[0]
+        web_driver.switch_to.window(switch_to)
+        self._current = switch_to
+        if handle == self.home:
+            self.home = switch_to
+
+    def state(self, handle: str, ready: Cond | None = None) -> list | None:
+        """
+        handleのタブに移り、読み込み済みなら[DOMContentLoaded済みか, readyに合う要素(なければNone)]、まだならNone
+        page_load_strategyが"normal"だと、読み込み中のタブではWebDriverが読み込みの終わりを待ってから返す
+        """
+        self.switch(handle)
+        selector_list = [] if ready is None else [list(ready.selector)]
+        try:
+            return self.driver.driver.execute_script(script.TAB_STATE_JS, selector_list)
+        except JavascriptException:
+            # 遷移の途中
+            return None
+
+    def is_ready(self, handle: str, ready: Cond | None = None) -> bool:
+        """gotoと同じく、readyに合う要素が現れたかDOMContentLoaded済みならTrue"""
+        state = self.state(handle, ready)
+        return not state is None and (state[0] or not state[1] is None)
+
+    def is_loaded(self, handle: str, ready: Cond | None = None) -> bool:
+        """
+        is_readyと同じ判定を、CDPが使えればタブを切り替えずにRuntime.evaluateで見る
+        page_load_strategyが"normal"でも読み込み中のタブで待たされない。CDPが使えなければis_ready(切り替える)
+        """
+        connection = self._get_connection()
+        if connection is None:
+            return self.is_ready(handle, ready)
+        selector_list = [] if ready is None else [list(ready.selector)]
+        try:
+            session_id = self._session_dict.get(handle)
+            if session_id is None:
+                response = connection.send("Target.attachToTarget", {"targetId": handle, "flatten": True})
+                session_id = response["sessionId"]
+                self._session_dict[handle] = session_id
+            response = connection.send(
+                "Runtime.evaluate",
+                {"expression": script.tab_ready_expression(selector_list), "returnByValue": True},
+                session_id,
+            )
+        except (CdpError, TimeoutError):
+            # 遷移の途中(実行コンテキストが入れ替わった)など
+            return False
+        return response.get("result", {}).get("value") is True
+
+    def _get_connection(self) -> CdpConnection | None:
+        if self._connection_getter is None:
+            return None
+        try:
+            return self._connection_getter()
+        except (CdpError, OSError, KeyError):
+            # chromium系でない、リモートでCDPに届かないなど
+            self._connection_getter = None
+            return None
+
+    def wait_ready(self, handle: str, ready: Cond | None = None, wait_time: int | float | None = None):
+        """handleのタブに移り、is_readyになるまで待つ"""
+        wait_time = self.driver._get_temp_wait_time(wait_time)
+        wait.poll_until(
+            lambda: True if self.is_ready(handle, ready) else None,
+            wait_time,
+            self.driver.wait_strategy,
+            f"{wait_time}秒待ってもタブが読み込まれませんでした。",
+        )
+
+    def map(
+        self,
+        urls: Iterable[str],
+        process: Callable[[Element], T],
+        tabs: int = 4,
+        ready: Cond | None = None,
+        wait_time: int | float | None = None,
+    ) -> Iterator[TabResult[T]]:
+        """
+        urlsをtabs個のタブに割り振って開き、読み込み終わったタブから順にprocess(driver)してTabResultを返す
+        結果はurlsの順ではなく終わった順。1つ終わるとそのタブの枠で次のurlを新しいタブに開くので、常にtabs個が読み込み中
+        読み込みがwait_time秒を過ぎたurlはerrorにTimeoutExceptionを入れて返し、次に進む
+        processの中ではdriverがそのページのタブを向いている。タブを切り替えたり閉じたりはしない
+        開いたタブは終わると(途中でやめても)閉じ、homeに戻る。タブごとの統計はstats
+        CDPが使えないときはタブを切り替えて読み込みを見るので、page_load_strategy="none"で起動すること
+        ("normal"だと読み込み中のタブでWebDriverが待ってしまい、読み込みが重ならない)
+        """
+        if tabs < 1:
+            raise ValueError(f"tabsは1以上です。: {tabs}")
+        wait_time = self.driver._get_temp_wait_time(wait_time)
+        if self._get_connection() is None and self.driver.driver.capabilities.get("pageLoadStrategy") == "normal":
+            warnings.warn(
+                'CDPが使えず、page_load_strategyが"normal"なので、読み込み中のタブでWebDriverが待ちます。'
+                'page_load_strategy="none"で起動してください。',
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        self.sync()
+        url_iter = iter(urls)
+        self.stats = []
+        job_dict: dict[int, tuple[str, str, float]] = {}  # 枠 -> (ハンドル, url, 開いた時刻)
+
+        def start_job(slot: int) -> bool:
+            url = next(url_iter, None)
+            if url is None:
+                return False
+            job_dict[slot] = (self.open(url), url, time.perf_counter())
+            return True
+
+        try:
+            for slot in range(tabs):
+                if not start_job(slot):
+                    break
+                self.stats.append(TabStats(slot=slot))
+            intervals = self.driver.wait_strategy.intervals()
+            while job_dict.__len__() > 0:
+                progressed = False
+                for slot in list(job_dict):
+                    handle, url, opened_at = job_dict[slot]
+                    stats = self.stats[slot]
+                    is_ready = self.is_loaded(handle, ready)
+                    load_seconds = time.perf_counter() - opened_at
+                    if not is_ready and load_seconds < wait_time:
+                        continue
+                    if is_ready:
+                        self.switch(handle)
+                        process_start = time.perf_counter()
+                        value = process(self.driver)
+                        self.sync()
+                        result = TabResult(url, slot, value, None, load_seconds, time.perf_counter() - process_start)
+                        stats.job_count += 1
+                    else:
+                        error = TimeoutException(f"{wait_time}秒待ってもタブが読み込まれませんでした。: {url}")
+                        result = TabResult(url, slot, None, error, load_seconds, 0.0)
+                        stats.timeout_count += 1
+                    stats.load_seconds += result.load_seconds
+                    stats.process_seconds += result.process_seconds
+                    progressed = True
+                    # 次のurlを開いてから閉じる(受け取った側が処理している間も読み込みが進む)
+                    del job_dict[slot]
+                    if start_job(slot):
+                        self.close(handle, switch_to=job_dict[slot][0])
+                    else:
+                        stats.finished_at = time.perf_counter()
+                        self.close(handle)
+                    yield result
+                    self.sync()
+                if progressed:
+                    intervals = self.driver.wait_strategy.intervals()
+                elif job_dict.__len__() > 0:
+                    time.sleep(next(intervals))
+        finally:
+            for handle, _, _ in job_dict.values():
+                try:
+                    self.close(handle, switch_to=self.home)
+                except WebDriverException:
+                    pass
+            try:
+                self.switch(self.home)
+            except WebDriverException:
+                pass
@@ -0,0 +1,85 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, TypeVar
+import time
+
+# 外部ライブラリ
+from selenium.common.exceptions import TimeoutException
+
+# 自作ライブラリ
+from autoweb_module.selenium.cond import Cond, CssMaker
+
+if TYPE_CHECKING:
+    from autoweb_module.selenium.element import Element
+
+T = TypeVar("T")
+
+# execute_async_scriptのタイムアウト(seleniumのデフォルトは30秒)より短く区切って待つ
+OBSERVE_CHUNK_SECONDS = 25
+
+
+@dataclass
+class WaitStrategy:
+    """
+    要素待ちのやり方
+    observe: ページ内にMutationObserverを仕込み、要素が現れた瞬間に返す。使えないロケータ(link, plink)や失敗時はpoll
+    poll: interval秒ごとに探す。探すたびにintervalをbackoff倍(max_intervalまで)にする
+    """
+
+    mode: Literal["poll", "observe"] = "poll"
+    interval: float = 0.5
+    backoff: float = 1.0
+    max_interval: float = 2.0
+
+    def __post_init__(self):
+        if self.mode not in ("poll", "observe"):
+            raise ValueError("modeは'poll'または'observe'のみ指定できます。")
+        if self.interval <= 0 or self.backoff < 1:
+            raise ValueError("intervalは0より大きく、backoffは1以上で頼むぅ")
+
+    def intervals(self) -> Iterator[float]:
+        interval = self.interval
+        while True:
+            yield interval
+            interval = min(interval * self.backoff, max(self.max_interval, self.interval))
+
+
+def poll_until(func: Callable[[], T | None], wait_time: int | float, strategy: WaitStrategy, message: str = "") -> T:
+    """funcがNone以外を返すまで呼び続ける。wait_time秒を過ぎたらTimeoutException"""
+    deadline = time.monotonic() + wait_time
+    for interval in strategy.intervals():
+        result = func()
+        if not result is None:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutException(message)
+        time.sleep(min(interval, remaining))
+
+
+def to_js_selector(locator: str, attr: str) -> tuple[Literal["css", "xpath"], str] | None:
+    """ページ内で探せる形(CSSかxpath)に直す。直せないロケータはNone"""
+    match locator:
+        case "css" | "xpath":
+            return locator, attr
+        case "id":
+            return "css", f"[id={CssMaker().quote_value(attr)}]"
+        case "name":
+            return "css", f"[name={CssMaker().quote_value(attr)}]"
+        case "class":
+            return "css", f".{attr}"
+        case "tag":
+            return "css", attr
+    # link, plinkはseleniumの判定(表示テキスト)を再現できないので任せない
+    return None
+
+
+@dataclass
+class CondMatch:
+    """wait_anyの結果。condsの何番目(index)の条件に、どの要素(elem)が合ったか"""
+
+    index: int
+    cond: Cond
+    elem: Element
@@ -0,0 +1,145 @@
+# 標準ライブラリ
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import threading
+
+# 外部ライブラリ
+from selenium.common.exceptions import TimeoutException
+
+# 自作ライブラリ
+from autoweb_module.exceptions import BackgroundWriteError
+
+
+def write_text_in_chunks(path: Path, text: str, chunk_size: int):
+    """一度にwriteすると全体をバイト列にしたコピーができるので、chunk_sizeずつエンコードして書く"""
+    with path.open("w", encoding="utf-8", newline="") as f:
+        for start in range(0, text.__len__(), chunk_size):
+            f.write(text[start : start + chunk_size])
+
+
+class BackgroundWriter:
+    """
+    スクショやHTMLのデコード・整形・書き込みを別スレッドでやる
+    ブラウザからデータを受け取ったらすぐ次の操作に戻れるので、全ページ保存するような処理でブラウザが遊ばない
+    まだ書いていないデータがmax_pending_bytesを超えそうなら、submitが空くまで待つ(メモリを青天井に使わない)
+    失敗はその場では投げず、flushやwithを抜けるときにBackgroundWriteErrorでまとめて投げる
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending_bytes: int = 256 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        on_error: Callable[[Path, BaseException], None] | None = None,
+    ):
+        self.max_pending_bytes = max_pending_bytes
+        self.chunk_size = chunk_size
+        self.on_error = on_error
+        self.written_count = 0
+        self.written_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="autoweb-writer")
+        self._condition = threading.Condition()
+        self._pending_bytes = 0
+        self._pending_count = 0
+        self._error_list: list[tuple[Path, BaseException]] = []
+        self._closed = False
+
+    def __enter__(self) -> BackgroundWriter:
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        # 元の例外を隠さない
+        if exc_type is None:
+            self.raise_errors()
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    @property
+    def errors(self) -> list[tuple[Path, BaseException]]:
+        """まだ投げていない失敗"""
+        with self._condition:
+            return list(self._error_list)
+
+    def submit(self, file_path: Path | str, produce: Callable[[], bytes | str], size: int) -> Future[Path]:
+        """
+        produceが返すデータをfile_pathに書く。produceはワーカーで呼ばれるので、デコードや整形はここに入れる
+        sizeはメモリに抱えるおおよそのバイト数。close後はRuntimeError
+        """
+        with self._condition:
+            # 1件も抱えていなければ大きくても通す
+            while (
+                not self._closed and self._pending_count > 0 and self._pending_bytes + size > self.max_pending_bytes
+            ):
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("BackgroundWriterはもう閉じています。")
+            self._pending_bytes += size
+            self._pending_count += 1
+        try:
+            return self._executor.submit(self._write, Path(file_path), produce, size)
+        except BaseException:
+            # 数えた分を戻さないとflushが永遠に待つ
+            with self._condition:
+                self._pending_bytes -= size
+                self._pending_count -= 1
+                self._condition.notify_all()
+            raise
+
+    def write_bytes(self, file_path: Path | str, data: bytes) -> Future[Path]:
+        return self.submit(file_path, lambda: data, data.__len__())
+
+    def write_text(self, file_path: Path | str, text: str) -> Future[Path]:
+        return self.submit(file_path, lambda: text, text.__len__())
+
+    def flush(self, wait_time: int | float | None = None, raise_errors: bool = True):
+        """submitしたものが全部書き終わるまで待つ。raise_errorsなら失敗をBackgroundWriteErrorで投げる"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending_count == 0, timeout=wait_time):
+                raise TimeoutException(f"{wait_time}秒待っても書き込みが終わりませんでした。残り{self._pending_count}件")
+        if raise_errors:
+            self.raise_errors()
+
+    def raise_errors(self):
+        """たまっている失敗があればBackgroundWriteErrorで投げる。投げた分は消える"""
+        with self._condition:
+            error_list = self._error_list
+            self._error_list = []
+        if error_list.__len__() > 0:
+            raise BackgroundWriteError(error_list)
+
+    def close(self):
+        """全部書き終わるのを待ってワーカーを止める。失敗は投げない。以降のsubmitはRuntimeError"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self.flush(raise_errors=False)
+        self._executor.shutdown(wait=True)
+
+    def _write(self, path: Path, produce: Callable[[], bytes | str], size: int) -> Path:
+        try:
+            data = produce()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(data, str):
+                write_text_in_chunks(path, data, self.chunk_size)
+            else:
+                path.write_bytes(data)
+            with self._condition:
+                self.written_count += 1
+                self.written_bytes += path.stat().st_size
+            return path
+        except BaseException as e:
+            with self._condition:
+                self._error_list.append((path, e))
+            if not self.on_error is None:
+                self.on_error(path, e)
+            raise
+        finally:
+            with self._condition:
+                self._pending_bytes -= size
+                self._pending_count -= 1
+                self._condition.notify_all()
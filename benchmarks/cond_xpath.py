@@ -0,0 +1,90 @@
+"""
+Condのxpath最適化(CondOptimizer)の前後比較
+
+    python benchmarks/cond_xpath.py
+        xpathの長さ・分岐数・組み立て時間だけ
+    python benchmarks/cond_xpath.py --url https://example.com
+        ブラウザを起動して、そのページでのdocument.evaluateの時間とヒット件数も比較する
+"""
+
+# 標準ライブラリ
+import argparse
+import time
+
+# 自作ライブラリ
+from autoweb_module import TagCond, LocatorCond, TextCond
+from autoweb_module.selenium.cond import Cond, compile_xpath
+
+EVALUATE_JS = """
+const [xpath, repeat] = arguments;
+let count = 0;
+const start = performance.now();
+for (let i = 0; i < repeat; i++) {
+    count = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+}
+return [(performance.now() - start) / repeat, count];
+"""
+
+
+def get_case_dict() -> dict[str, Cond]:
+    link = TagCond("a") | TagCond("button")
+    role = LocatorCond("class", "btn", "contains") | LocatorCond("role", "button")
+    href = LocatorCond("href", "/", "startswith")
+    text = TextCond("次へ", "contains") | TextCond("Next", "contains")
+    return {
+        "single": TagCond("a") & LocatorCond("href", ".png", "endswith"),
+        "duplicate": (href | href) & (TagCond("a") | TagCond("a")),
+        "subsumed": href | (href & LocatorCond("class", "btn", "contains")) | (TagCond("a") & href),
+        "same_tag": TagCond("a") & (LocatorCond("id", "1") | LocatorCond("id", "2") | LocatorCond("id", "3")),
+        "product_2x2x2": link & role & href & text,
+        "product_4x4": (
+            (LocatorCond("id", "a") | LocatorCond("id", "b") | LocatorCond("id", "c") | LocatorCond("id", "d"))
+            & (TextCond("1") | TextCond("2") | TextCond("3") | TextCond("4"))
+        ),
+    }
+
+
+def measure_compile(all_selector, optimize: bool, repeat: int) -> float:
+    """キャッシュを外して組み立て時間を測る[ms]"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compile_xpath.__wrapped__(all_selector, ".//", optimize)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="指定するとブラウザでの評価時間も測る")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    driver = None
+    if args.url is not None:
+        from autoweb_module import Selenium
+
+        selenium = Selenium()
+        selenium.launch_browser(args.url)
+        driver = selenium.driver
+
+    try:
+        for name, cond in get_case_dict().items():
+            all_selector = cond.to_all_selector()
+            print(f"[{name}]")
+            for optimize in (False, True):
+                xpath = compile_xpath(all_selector, ".//", optimize)
+                label = "after " if optimize else "before"
+                line = (
+                    f"  {label}: len={xpath.__len__():5d} branches={xpath.count(' | ') + 1:3d}"
+                    f" compile={measure_compile(all_selector, optimize, args.repeat):.4f}ms"
+                )
+                if driver is not None:
+                    evaluate_ms, count = driver.driver.execute_script(EVALUATE_JS, xpath, args.repeat)
+                    line += f" evaluate={evaluate_ms:.4f}ms hits={count}"
+                print(line)
+    finally:
+        if driver is not None:
+            selenium.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+find_elemsの結果などでElementを大量に作るときの、1つあたりのメモリと生成時間
+
+    python benchmarks/element_handle.py --count 10000
+    python benchmarks/element_handle.py --count 10000 --output handle.json
+
+比べるもの
+    child: _get_new_element。親と同じ設定の子は__init__/__post_init__を通さずに作る(今の実装)
+    init: Element(...)。__init__と__post_init__(型の確認など)を通す
+    subclass: __init__を変えたサブクラスの_get_new_element。近道を使わず通常どおり作る
+WebElementはfake_webdriverサーバーから取ってくる(WebElement自体の分は測らない)
+"""
+
+# 標準ライブラリ
+from collections.abc import Callable
+from pathlib import Path
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+# 外部ライブラリ
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.remote.webelement import WebElement
+
+# 自作ライブラリ
+from autoweb_module import Element
+from fake_webdriver import FakeWebDriverServer, build_synthetic_html
+
+
+class InitElement(Element):
+    """__init__を変えたサブクラス"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+def measure(make: Callable[[WebElement], object], web_elems: list[WebElement], repeat: int) -> dict:
+    """1つあたりのメモリ[byte]と生成時間[µs]"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    handle_list = [make(web_elem) for web_elem in web_elems]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del handle_list
+
+    time_list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        handle_list = [make(web_elem) for web_elem in web_elems]
+        time_list.append(time.perf_counter() - start)
+        del handle_list
+    return {
+        "bytes_per_element": memory / web_elems.__len__(),
+        "us_per_element": min(time_list) / web_elems.__len__() * 1_000_000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=10000, help="作るElementの数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    # 1行にtdが3つ
+    page_html = build_synthetic_html(rows=args.count // 3 + 1, inputs=0, paragraphs=0)
+    with FakeWebDriverServer(page_html) as server:
+        web_driver = webdriver.Remote(command_executor=server.url, options=ChromeOptions())
+        try:
+            web_driver.get("https://example.com/synthetic")
+            web_elems = web_driver.find_elements("css selector", "td")[: args.count]
+        finally:
+            web_driver.quit()
+
+    driver = Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=10)
+    init_driver = InitElement(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=10)
+    make_dict: dict[str, Callable[[WebElement], object]] = {
+        "child": lambda web_elem: driver._get_new_element(elem=web_elem),
+        "init": lambda web_elem: Element(elem=web_elem, debug_mode=False, save_folder=None, _wait_time=10),
+        "subclass": lambda web_elem: init_driver._get_new_element(elem=web_elem),
+    }
+    result_dict = {name: measure(make, web_elems, args.repeat) for name, make in make_dict.items()}
+    for name, result in result_dict.items():
+        print(f"{name:10s} {result['bytes_per_element']:8.1f} byte/個 {result['us_per_element']:8.3f} µs/個")
+
+    if not args.output is None:
+        output = {"config": {"count": web_elems.__len__(), "repeat": args.repeat}, "results": result_dict}
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+ベンチマーク用の、ブラウザを使わないW3C WebDriverサーバー
+
+lxmlで持った合成DOMに対して、find_element(s)・属性・テキスト・send_keysなどに答える
+execute_scriptはJavaScriptを実行できないので、autoweb_moduleとseleniumが使う既知のスクリプトだけを
+Pythonで再現する(未知のスクリプトはjavascript errorを返す)
+コマンドごとにlatency秒待ってから返すので、実ブラウザとの往復の重さを再現できる
+cssのロケータにはcssselectパッケージが必要
+"""
+
+# 標準ライブラリ
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+import uuid
+
+# 外部ライブラリ
+from lxml import etree, html as lxml_html
+
+# 自作ライブラリ
+from autoweb_module.selenium import script
+from autoweb_module.selenium.const import BOOLEAN_ATTRIBUTE_NAME_LIST
+
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+CONTROL_KEY = "\ue009"
+BACK_SPACE_KEY = "\ue003"
+NULL_KEY = "\ue000"
+
+
+def build_synthetic_html(rows: int = 1000, inputs: int = 40, paragraphs: int = 5000) -> str:
+    """表・フォーム・大量の段落を持つページ"""
+    row_html = "".join(
+        f'<tr class="row"><td class="name"><a class="item{" sale" if i % 3 == 0 else ""}" href="/item/{i}">商品{i}</a></td>'
+        f'<td class="price">{i * 10}</td><td class="stock">{"在庫あり" if i % 2 else "在庫なし"}</td></tr>'
+        for i in range(rows)
+    )
+    input_html = "".join(
+        f'<label for="field{i}">項目{i}</label><input id="field{i}" name="field{i}" type="text" value="初期値{i}">'
+        for i in range(inputs)
+    )
+    paragraph_html = "".join(
+        f'<div class="card"><h2>見出し{i}</h2><p>本文{i} ' + "テキスト " * 20 + "</p></div>" for i in range(paragraphs)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>synthetic</title></head><body>"
+        f'<table id="data"><tbody>{row_html}</tbody></table>'
+        f'<form id="form">{input_html}<button type="submit">送信</button></form>'
+        f'<main id="content">{paragraph_html}</main>'
+        '<a href="/next" class="next">次へ</a>'
+        "</body></html>"
+    )
+
+
+class NoSuchElement(Exception):
+    pass
+
+
+class ScriptError(Exception):
+    pass
+
+
+class FakeSession:
+    """1セッション分のページ状態"""
+
+    def __init__(self, page_html: str):
+        self.session_id = uuid.uuid4().hex
+        self.page_html = page_html
+        self.url = "about:blank"
+        self.load(self.url)
+
+    def load(self, url: str):
+        self.url = url
+        self.document = lxml_html.document_fromstring(self.page_html)
+        self.node_dict: dict[str, etree._Element] = {}
+        self.id_dict: dict[etree._Element, str] = {}
+        self.value_dict: dict[etree._Element, str] = {}
+        self.selected_set: set[etree._Element] = set()  # Ctrl+Aで全選択中の入力欄(次のsend_keysまで続く)
+        self.page_token = uuid.uuid4().hex[:8]
+        self.mutation_count = 0
+        self.extract_dict: dict[str, list[etree._Element]] = {}
+
+    # ---------------要素の参照---------------
+    def to_reference(self, node: etree._Element) -> dict:
+        element_id = self.id_dict.get(node)
+        if element_id is None:
+            element_id = uuid.uuid4().hex
+            self.id_dict[node] = element_id
+            self.node_dict[element_id] = node
+        return {ELEMENT_KEY: element_id}
+
+    def get_node(self, element_id: str) -> etree._Element:
+        if element_id not in self.node_dict:
+            raise NoSuchElement(element_id)
+        return self.node_dict[element_id]
+
+    def from_json(self, value):
+        """引数のうち要素の参照をノードに戻す"""
+        if isinstance(value, dict) and ELEMENT_KEY in value:
+            return self.get_node(value[ELEMENT_KEY])
+        if isinstance(value, list):
+            return [self.from_json(item) for item in value]
+        if isinstance(value, dict):
+            # fill_formのfieldsのように、辞書の中に要素の参照があることもある
+            return {key: self.from_json(item) for key, item in value.items()}
+        return value
+
+    def to_json(self, value):
+        if isinstance(value, etree._Element):
+            return self.to_reference(value)
+        if isinstance(value, list):
+            return [self.to_json(item) for item in value]
+        return value
+
+    # ---------------DOM---------------
+    def find(self, root: etree._Element | None, using: str, value: str) -> list[etree._Element]:
+        scope = self.document if root is None else root
+        match using:
+            case "css selector":
+                node_list = scope.cssselect(value)
+                if not root is None:
+                    # querySelectorAllと同じく自分自身は含めない
+                    node_list = [node for node in node_list if node is not root]
+            case "xpath":
+                node_list = scope.xpath(value)
+            case "link text":
+                node_list = [node for node in scope.iter("a") if self.text(node) == value]
+            case "partial link text":
+                node_list = [node for node in scope.iter("a") if value in self.text(node)]
+            case _:
+                raise ValueError(using)
+        return [node for node in node_list if isinstance(node, etree._Element) and isinstance(node.tag, str)]
+
+    def text(self, node: etree._Element) -> str:
+        return " ".join("".join(node.itertext()).split())
+
+    def value(self, node: etree._Element) -> str:
+        return self.value_dict.get(node, node.get("value", ""))
+
+    def attribute(self, node: etree._Element, name: str) -> str | None:
+        """seleniumのgetAttribute.jsの主なふるまい"""
+        if name == "value" and node.tag in ("input", "textarea"):
+            return self.value(node)
+        if name == "outerHTML":
+            return lxml_html.tostring(node, encoding="unicode")
+        if name in BOOLEAN_ATTRIBUTE_NAME_LIST:
+            return None if node.get(name) is None else "true"
+        return node.get(name)
+
+    def prop(self, node: etree._Element, name: str):
+        match name:
+            case "value":
+                return self.value(node)
+            case "textContent" | "innerText":
+                return self.text(node)
+            case "outerHTML":
+                return lxml_html.tostring(node, encoding="unicode")
+            case "tagName":
+                return node.tag.upper()
+            case "className":
+                return node.get("class", "")
+        return node.get(name)
+
+    def send_keys(self, node: etree._Element, text: str):
+        value = self.value(node)
+        is_control = False
+        is_selected = node in self.selected_set
+        for char in text:
+            if char == CONTROL_KEY:
+                is_control = True
+            elif char == NULL_KEY:
+                is_control = False
+            elif is_control and char == "a":
+                is_selected = True
+            elif char == BACK_SPACE_KEY:
+                value = "" if is_selected else value[:-1]
+                is_selected = False
+            elif not "\ue000" <= char <= "\uf8ff":  # Keysの特殊キーは入力しない
+                if is_selected:
+                    value = ""
+                    is_selected = False
+                value += char
+        self.value_dict[node] = value
+        if is_selected:
+            self.selected_set.add(node)
+        else:
+            self.selected_set.discard(node)
+        self.mutation_count += 1
+
+    # ---------------execute_script---------------
+    def execute(self, source: str, args: list):
+        args = self.from_json(args)
+        if source.startswith("/* getAttribute */"):
+            return self.attribute(args[0], args[1])
+        if source == script.fetch_rows_js():
+            node_list, attr_list, prop_list, with_text, with_tag_name = args
+            row_list = []
+            for node in node_list:
+                row = [self.attribute(node, name) for name in attr_list]
+                row += [self.prop(node, name) for name in prop_list]
+                if with_text:
+                    row.append(self.text(node))
+                if with_tag_name:
+                    row.append(node.tag)
+                row_list.append(row)
+            return row_list
+        if source == script.PAGE_STATE_JS:
+            return f"{self.page_token}:{self.mutation_count}"
+        if source == script.IS_CONNECTED_JS:
+            return [node.getroottree().getroot() is self.document for node in args[0]]
+        if source == script.FIND_CONDS_JS:
+            root, selector_list = args
+            return [
+                next(iter(self.find(root, self._to_using(locator), selector)), None)
+                for locator, selector in selector_list
+            ]
+        if source == script.FILL_FORM_JS:
+            # input/textareaだけ再現する
+            root, field_list, verify = args
+            result_list = []
+            for field in field_list:
+                node = field["elem"]
+                if node is None:
+                    locator, selector = field["selector"]
+                    node = next(iter(self.find(root, self._to_using(locator), selector)), None)
+                if node is None or node.tag not in ("input", "textarea"):
+                    result_list.append({"error": "fake_webdriverでは入力できません。", "value": None})
+                    continue
+                self.value_dict[node] = str(field["value"])
+                self.mutation_count += 1
+                result_list.append({"error": None, "value": self.value(node)})
+            return result_list
+        if source == script.EXTRACT_START_JS:
+            root, locator, selector, token = args
+            self.extract_dict[token] = self.find(root, self._to_using(locator), selector)
+            return self.extract_dict[token].__len__()
+        if source == script.extract_chunk_js():
+            token, column_list, start, end = args
+            if token not in self.extract_dict:
+                raise ScriptError("抽出中にページが変わりました。")
+            row_list = []
+            for node in self.extract_dict[token][start:end]:
+                row = []
+                for locator, selector, attr in column_list:
+                    elem = node
+                    if not locator is None:
+                        elem = next(iter(self.find(node, self._to_using(locator), selector)), None)
+                    if elem is None:
+                        row.append(None)
+                    else:
+                        row.append(self.text(elem) if attr is None else self.attribute(elem, attr))
+                row_list.append(row)
+            return row_list
+        if source == script.EXTRACT_RELEASE_JS:
+            self.extract_dict.pop(args[0], None)
+            return None
+        if source in ("arguments[0].click();", script.CLICK_ALL_JS):
+            return None
+        if source == "arguments[0].scrollIntoView({block: 'center'});":
+            return None
+        raise ScriptError(f"fake_webdriverで再現していないスクリプトです。: {source[:60]!r}")
+
+    def _to_using(self, locator: str) -> str:
+        return "css selector" if locator == "css" else "xpath"
+
+
+class FakeWebDriverServer:
+    """
+    with FakeWebDriverServer(latency=0.002) as server:
+        driver = webdriver.Remote(command_executor=server.url, options=ChromeOptions())
+    """
+
+    def __init__(self, page_html: str | None = None, latency: float = 0.0, port: int = 0):
+        self.page_html = build_synthetic_html() if page_html is None else page_html
+        self.latency = latency
+        self.command_count = 0
+        self._session_dict: dict[str, FakeSession] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> FakeWebDriverServer:
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文を別々に送ると、Nagleと遅延ACKで1往復ごとに約40ms止まり、latencyより大きくなる
+            # バッファしてhandle_one_requestの最後のflushで1回で送り、TCP_NODELAYも付ける
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                try:
+                    status, value = 200, server.route(method, self.path, body)
+                except NoSuchElement as e:
+                    status, value = 404, {"error": "no such element", "message": str(e), "stacktrace": ""}
+                except ScriptError as e:
+                    status, value = 500, {"error": "javascript error", "message": str(e), "stacktrace": ""}
+                except KeyError as e:
+                    status, value = 404, {"error": "invalid session id", "message": str(e), "stacktrace": ""}
+                data = json.dumps({"value": value}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(data.__len__()))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def route(self, method: str, path: str, body: dict):
+        with self._lock:
+            self.command_count += 1
+            if method == "POST" and path == "/session":
+                session = FakeSession(self.page_html)
+                self._session_dict[session.session_id] = session
+                capabilities = {"browserName": "chrome", "browserVersion": "fake", "pageLoadStrategy": "normal"}
+                return {"sessionId": session.session_id, "capabilities": capabilities}
+            match = re.fullmatch(r"/session/([^/]+)(/.*)?", path)
+            session = self._session_dict[match.group(1)]
+            return self._route_session(session, method, match.group(2) or "", body)
+
+    def _route_session(self, session: FakeSession, method: str, path: str, body: dict):
+        match method, path.split("/")[1:]:
+            case "DELETE", []:
+                return None
+            case "POST", ["url"]:
+                session.load(body["url"])
+                return None
+            case "GET", ["url"]:
+                return session.url
+            case "GET", ["title"]:
+                return session.document.findtext(".//title")
+            case "GET", ["source"]:
+                return lxml_html.tostring(session.document, encoding="unicode")
+            case "GET", ["window"]:
+                return "fake-window"
+            case "POST", ["element"]:
+                return session.to_json(self._find_one(session, None, body))
+            case "POST", ["elements"]:
+                return session.to_json(session.find(None, body["using"], body["value"]))
+            case "POST", ["element", element_id, "element"]:
+                return session.to_json(self._find_one(session, session.get_node(element_id), body))
+            case "POST", ["element", element_id, "elements"]:
+                return session.to_json(session.find(session.get_node(element_id), body["using"], body["value"]))
+            case "GET", ["element", element_id, "name"]:
+                return session.get_node(element_id).tag
+            case "GET", ["element", element_id, "text"]:
+                return session.text(session.get_node(element_id))
+            case "GET", ["element", element_id, "attribute", name]:
+                return session.get_node(element_id).get(name)
+            case "GET", ["element", element_id, "property", name]:
+                return session.prop(session.get_node(element_id), name)
+            case "POST", ["element", element_id, "value"]:
+                session.send_keys(session.get_node(element_id), body["text"])
+                return None
+            case "POST", ["element", element_id, "clear"]:
+                session.value_dict[session.get_node(element_id)] = ""
+                return None
+            case "POST", ["element", element_id, "click"]:
+                return None
+            case "POST", ["execute", "sync"] | ["execute", "async"]:
+                return session.to_json(session.execute(body["script"], body.get("args", [])))
+        raise KeyError(f"{method} {path}")
+
+    def _find_one(self, session: FakeSession, root: etree._Element | None, body: dict) -> etree._Element:
+        node_list = session.find(root, body["using"], body["value"])
+        if node_list.__len__() == 0:
+            raise NoSuchElement(f"{body['using']}={body['value']}")
+        return node_list[0]
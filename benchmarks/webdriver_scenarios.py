@@ -0,0 +1,229 @@
+"""
+ElementやCondの主な使い方を、ブラウザの代わりのfake_webdriverサーバー相手に測る
+
+    python benchmarks/webdriver_scenarios.py --latency-ms 2 --output result.json
+        シナリオごとのWebDriverとの往復回数・送受信バイト数・時間をJSONに書く
+    python benchmarks/webdriver_scenarios.py --output result.json --compare baseline.json
+        前回の結果と比べ、往復回数が増えたか時間がtolerance以上遅くなったシナリオがあれば終了コード1
+
+往復回数は合成DOMとシナリオが同じなら毎回同じになるので、CIではまずこちらを見る
+
+参考(既定の引数、--latency-ms 0 / 1、Python 3.13):
+    シナリオ                 往復回数   0ms       1ms
+    find_elems_attr_loop       1001   1356ms    2819ms
+    find_elems_attrs_bulk         2     48ms      45ms
+    send_keys_clear             201    265ms     478ms
+    fill_form                     2     23ms      24ms
+    extract_loop               6001   6479ms   15554ms
+    extract_rows                  5    276ms     248ms
+    cond_css                      2     29ms      27ms
+    cond_xpath                    2     37ms      31ms
+    wait_any                      1     26ms      23ms
+    soup                          3    732ms     666ms
+    save_html                     3   1164ms     935ms
+"""
+
+# 標準ライブラリ
+from collections.abc import Callable
+from pathlib import Path
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+
+# 外部ライブラリ
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+# 自作ライブラリ
+from autoweb_module import Element, TagCond, LocatorCond, TextCond
+from fake_webdriver import FakeWebDriverServer, build_synthetic_html
+
+
+def scenario_find_elems_attr_loop(driver: Element):
+    """find_elemsで取った要素を1つずつattr"""
+    for elem in driver.find_elems("css", "#data a"):
+        elem.attr("href")
+
+
+def scenario_find_elems_attrs_bulk(driver: Element):
+    """同じことをElementList.attrsでまとめて"""
+    driver.find_elems("css", "#data a").attrs("href")
+
+
+def scenario_send_keys_clear(driver: Element):
+    """フォームの全入力欄をclearしてから入力"""
+    for elem in driver.find_elems("css", "#form input"):
+        elem.send_keys("入力値", clear=True)
+
+
+def scenario_fill_form(driver: Element):
+    """send_keys_clearと同じ入力をfill_formで1回に"""
+    elem_list = list(driver.find_elems("css", "#form input"))
+    driver.fill_form({elem: "入力値" for elem in elem_list})
+
+
+def scenario_extract_loop(driver: Element):
+    """表の各行をfind_elemsで取り、行ごとにセルを読む"""
+    for row in driver.find_elems("css", "#data tr"):
+        row.find_elem("css", "td.name a", wait_time=0).attr("href")
+        row.find_elem("css", "td.price", wait_time=0).text
+        row.find_elem("css", "td.stock", wait_time=0).text
+
+
+def scenario_extract_rows(driver: Element):
+    """同じ表をextract_rowsでchunkごとに"""
+    columns = {
+        "href": (TagCond("a"), "href"),
+        "price": TagCond("td") & LocatorCond("class", "price"),
+        "stock": TagCond("td") & LocatorCond("class", "stock"),
+    }
+    for _ in driver.extract_rows(TagCond("tr"), columns):
+        pass
+
+
+def scenario_cond_css(driver: Element):
+    """CSSにできる条件の組み合わせ"""
+    cond = TagCond("a") & (LocatorCond("class", "sale", "contains") | LocatorCond("href", "/item/1", "startswith"))
+    driver.find_cond_elems(cond).attrs("href")
+
+
+def scenario_cond_xpath(driver: Element):
+    """テキスト条件を含むのでxpathになる組み合わせ"""
+    cond = (TagCond("td") & TextCond("在庫あり")) | (TagCond("a") & TextCond("次へ"))
+    driver.find_cond_elems(cond).texts()
+
+
+def scenario_wait_any(driver: Element):
+    """複数の条件をまとめて待つ"""
+    driver.wait_any([LocatorCond("id", "missing"), TagCond("a") & LocatorCond("class", "next", "contains")])
+
+
+def scenario_soup(driver: Element):
+    """大きいページのsoup。1回目はHTMLを取り、2回目はキャッシュ"""
+    driver.get_soup("lxml")
+    driver.get_soup("lxml")
+
+
+def scenario_save_html(driver: Element):
+    """大きいページの保存(整形あり・なし)"""
+    with tempfile.TemporaryDirectory() as folder:
+        driver.save_html(Path(folder) / "raw.html", pretty=False)
+        driver.save_html(Path(folder) / "pretty.html", pretty=True, parser="lxml")
+
+
+SCENARIO_DICT: dict[str, Callable[[Element], None]] = {
+    "find_elems_attr_loop": scenario_find_elems_attr_loop,
+    "find_elems_attrs_bulk": scenario_find_elems_attrs_bulk,
+    "send_keys_clear": scenario_send_keys_clear,
+    "fill_form": scenario_fill_form,
+    "extract_loop": scenario_extract_loop,
+    "extract_rows": scenario_extract_rows,
+    "cond_css": scenario_cond_css,
+    "cond_xpath": scenario_cond_xpath,
+    "wait_any": scenario_wait_any,
+    "soup": scenario_soup,
+    "save_html": scenario_save_html,
+}
+
+
+def run_scenario(server: FakeWebDriverServer, name: str, repeat: int) -> dict:
+    """毎回新しいページを読み込んでから測る。往復回数は1回目、時間は中央値"""
+    web_driver = webdriver.Remote(command_executor=server.url, options=ChromeOptions())
+    driver = Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+    wall_list = []
+    round_trips = request_bytes = response_bytes = command_counts = None
+    try:
+        for _ in range(repeat):
+            web_driver.get("https://example.com/synthetic")
+            start = time.perf_counter()
+            with driver.profile() as stats:
+                SCENARIO_DICT[name](driver)
+            wall_list.append(time.perf_counter() - start)
+            if round_trips is None:
+                round_trips = stats.round_trips
+                request_bytes = sum(record.request_bytes for record in stats.records)
+                response_bytes = sum(record.response_bytes for record in stats.records)
+                command_counts = dict(stats.command_counts)
+    finally:
+        web_driver.quit()
+    wall_list.sort()
+    return {
+        "scenario": name,
+        "round_trips": round_trips,
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "wall_seconds": wall_list[wall_list.__len__() // 2],
+        "wall_seconds_min": wall_list[0],
+        "commands": command_counts,
+    }
+
+
+def compare(result_list: list[dict], baseline_path: Path, tolerance: float) -> bool:
+    """劣化がなければTrue"""
+    baseline_dict = {result["scenario"]: result for result in json.loads(baseline_path.read_text("utf-8"))["results"]}
+    is_ok = True
+    for result in result_list:
+        baseline = baseline_dict.get(result["scenario"])
+        if baseline is None:
+            continue
+        ratio = result["wall_seconds"] / max(baseline["wall_seconds"], 1e-9)
+        mark = ""
+        if result["round_trips"] > baseline["round_trips"] or ratio > 1 + tolerance:
+            mark = "  <- 劣化"
+            is_ok = False
+        print(
+            f"{result['scenario']:24s} round_trips {baseline['round_trips']:6d} -> {result['round_trips']:6d}"
+            f"  wall x{ratio:.2f}{mark}"
+        )
+    return is_ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="コマンドごとにサーバーが待つ時間")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--inputs", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIO_DICT), help="省略時は全部")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None, help="前回の--outputのJSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="時間の劣化とみなす割合")
+    args = parser.parse_args()
+
+    page_html = build_synthetic_html(rows=args.rows, inputs=args.inputs, paragraphs=args.paragraphs)
+    result_list = []
+    with FakeWebDriverServer(page_html, latency=args.latency_ms / 1000) as server:
+        for name in args.scenario or list(SCENARIO_DICT):
+            result = run_scenario(server, name, args.repeat)
+            result_list.append(result)
+            print(
+                f"{name:24s} round_trips={result['round_trips']:6d}"
+                f" bytes={result['request_bytes'] + result['response_bytes']:10d}"
+                f" wall={result['wall_seconds'] * 1000:9.1f}ms"
+            )
+
+    if not args.output is None:
+        output = {
+            "config": {
+                "latency_ms": args.latency_ms,
+                "rows": args.rows,
+                "inputs": args.inputs,
+                "paragraphs": args.paragraphs,
+                "repeat": args.repeat,
+                "python": platform.python_version(),
+            },
+            "results": result_list,
+        }
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if not args.compare is None and not compare(result_list, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
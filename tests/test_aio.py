@@ -0,0 +1,158 @@
+# 標準ライブラリ
+import asyncio
+import json
+
+# 外部ライブラリ
+import pytest
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver import Keys
+
+# 自作ライブラリ
+from autoweb_module.selenium.aio import AsyncElement, AsyncWebDriverTransport
+
+
+class FakeServer:
+    """
+    WebDriverサーバーの代わり。modeで応答を変える
+    "ok": 応答してkeep-aliveのまま、"close_after": 応答してから閉じる、"drop": 読むだけで応答せずに閉じる、"hang": 応答しない
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.request_count = 0
+        self.closed_count = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in header.decode("latin-1").split("\r\n"):
+                    name, _, value = line.partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                self.request_count += 1
+                if self.mode == "drop":
+                    break
+                if self.mode == "hang":
+                    await reader.read()
+                    break
+                body = json.dumps({"value": self.request_count}).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % body.__len__() + body)
+                await writer.drain()
+                if self.mode == "close_after":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        self.closed_count += 1
+        writer.close()
+
+
+async def start(mode: str) -> tuple[FakeServer, asyncio.Server, AsyncWebDriverTransport]:
+    fake = FakeServer(mode)
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return fake, server, AsyncWebDriverTransport(f"http://127.0.0.1:{port}", "session-1")
+
+
+def test_keep_alive_reuses_connection():
+    async def main():
+        fake, server, transport = await start("ok")
+        async with server:
+            assert await transport.execute("GET", "/url") == 1
+            assert await transport.execute("GET", "/url") == 2
+            assert transport._idle_connection_list.__len__() == 1
+            await transport.close()
+
+    asyncio.run(main())
+
+
+def test_closed_idle_connection_is_not_reused():
+    """サーバーが閉じたkeep-aliveのコネクションは書き込む前に捨て、リクエストは1回だけ届く"""
+
+    async def main():
+        fake, server, transport = await start("close_after")
+        async with server:
+            await transport.execute("GET", "/url")
+            await asyncio.sleep(0.05)
+            assert await transport.execute("POST", "/element/1/click", {}) == 2
+            assert fake.request_count == 2
+            await transport.close()
+
+    asyncio.run(main())
+
+
+def test_no_retry_after_request_was_sent():
+    """送ったあとに切れたら、やり直さずにエラー(クリックが2回効かないように)"""
+
+    async def main():
+        fake, server, transport = await start("drop")
+        async with server:
+            with pytest.raises(ConnectionError):
+                await transport.execute("POST", "/element/1/click", {})
+            assert fake.request_count == 1
+            assert transport._idle_connection_list.__len__() == 0
+
+    asyncio.run(main())
+
+
+def test_cancel_closes_connection():
+    async def main():
+        fake, server, transport = await start("hang")
+        async with server:
+            task = asyncio.create_task(transport.execute("GET", "/url"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.05)
+            assert transport._idle_connection_list.__len__() == 0
+            assert fake.closed_count == 1
+
+    asyncio.run(main())
+
+
+# ---------------AsyncElement---------------
+class FakeInputTransport:
+    """inputの入力欄だけを真似る。ignore_countの回数だけBackSpaceを無視する(clearが効かないとき)"""
+
+    def __init__(self, value: str, ignore_count: int = 0):
+        self.value = value
+        self.ignore_count = ignore_count
+        self.selected = False
+        self.backspace_count = 0
+
+    async def execute(self, method, path, payload=None):
+        if path.endswith("/value"):
+            if payload["text"] == Keys.CONTROL + "a":
+                self.selected = True
+            elif payload["text"] == Keys.BACK_SPACE:
+                self.backspace_count += 1
+                if self.ignore_count > 0:
+                    self.ignore_count -= 1
+                elif self.selected:
+                    self.value = ""
+                self.selected = False
+            return None
+        if path == "/execute/sync":
+            return self.value
+        raise AssertionError(path)
+
+
+def make_input(transport: FakeInputTransport) -> AsyncElement:
+    return AsyncElement(transport, "e-1", debug_mode=False, save_folder=None, wait_time=0.2, poll_interval=0.01)
+
+
+def test_clear_retries_until_empty():
+    """sync版のElement.clearと同じく、空になるまでやり直す"""
+    transport = FakeInputTransport("old", ignore_count=2)
+    asyncio.run(make_input(transport).clear())
+    assert transport.value == ""
+    assert transport.backspace_count == 3
+
+
+def test_clear_times_out_when_value_stays():
+    transport = FakeInputTransport("old", ignore_count=10**6)
+    with pytest.raises(TimeoutException):
+        asyncio.run(make_input(transport).clear())
@@ -0,0 +1,118 @@
+# 自作ライブラリ
+from autoweb_module.selenium.blocking import BlockProfile, BlockReport, ResourceBlocker
+
+
+class FakeConnection:
+    """イベントを手で流せるCDPの接続。送ったコマンドはsent_listに残る"""
+
+    def __init__(self):
+        self.listener_dict = {}
+        self.sent_list = []
+
+    def on(self, event, callback):
+        self.listener_dict.setdefault(event, []).append(callback)
+
+    def off(self, event, callback):
+        self.listener_dict[event].remove(callback)
+
+    def send(self, method, params=None, session_id=None):
+        self.sent_list.append((method, session_id))
+        return {}
+
+    def send_async(self, method, params=None, session_id=None):
+        self.sent_list.append((method, session_id))
+
+    def emit(self, event, params, session_id=None):
+        for callback in list(self.listener_dict.get(event, [])):
+            callback(params, session_id)
+
+
+def attach(connection: FakeConnection, session_id: str, target_id: str, target_type: str = "page", parent=None):
+    target_info = {"targetId": target_id, "type": target_type}
+    connection.emit("Target.attachedToTarget", {"sessionId": session_id, "targetInfo": target_info}, parent)
+
+
+def request(connection: FakeConnection, session_id: str, url: str, resource_type: str = "Image", frame_id: str = ""):
+    params = {"request": {"url": url}, "type": resource_type, "frameId": frame_id}
+    connection.emit("Network.requestWillBeSent", params, session_id)
+
+
+def navigate(connection: FakeConnection, session_id: str, target_id: str, url: str):
+    request(connection, session_id, url, "Document", target_id)
+
+
+def make_blocker() -> tuple[ResourceBlocker, FakeConnection]:
+    connection = FakeConnection()
+    blocker = ResourceBlocker(connection, BlockProfile.preset("no-media"))
+    attach(connection, "s-page", "page-1")
+    return blocker, connection
+
+
+def test_counts_requests_bytes_and_blocks_per_page():
+    blocker, connection = make_blocker()
+    navigate(connection, "s-page", "page-1", "https://example.com/")
+    request(connection, "s-page", "https://example.com/a.png")
+    request(connection, "s-page", "https://example.com/app.js", "Script")
+    connection.emit("Network.loadingFinished", {"encodedDataLength": 1000}, "s-page")
+    connection.emit("Network.loadingFinished", {"encodedDataLength": 200}, "s-page")
+    connection.emit("Network.loadingFailed", {"type": "Image", "errorText": "net::ERR_BLOCKED_BY_CLIENT"}, "s-page")
+    connection.emit("Network.loadingFailed", {"type": "Media", "blockedReason": "inspector"}, "s-page")
+    # こちらのブロックでない失敗は数えない
+    connection.emit("Network.loadingFailed", {"type": "Script", "blockedReason": "csp"}, "s-page")
+
+    report = blocker.last_report("page-1")
+    assert (report.url, report.requests, report.loaded_bytes) == ("https://example.com/", 3, 1200)
+    assert report.blocked_requests == 2
+    assert report.blocked_by_type == {"Image": 1, "Media": 1}
+    assert report.requests_saved == 2
+    assert report.bytes_saved is None
+
+
+def test_new_document_starts_new_report():
+    blocker, connection = make_blocker()
+    navigate(connection, "s-page", "page-1", "https://example.com/1")
+    request(connection, "s-page", "https://example.com/a.png")
+    # リダイレクトは同じページの続き
+    params = {"request": {"url": "https://example.com/1/"}, "type": "Document", "frameId": "page-1"}
+    connection.emit("Network.requestWillBeSent", {**params, "redirectResponse": {}}, "s-page")
+    navigate(connection, "s-page", "page-1", "https://example.com/2")
+    # iframeのドキュメントは遷移ではない
+    request(connection, "s-page", "https://ads.example.com/", "Document", "frame-9")
+
+    assert [(report.url, report.requests) for report in blocker.reports] == [
+        ("https://example.com/1", 3),
+        ("https://example.com/2", 2),
+    ]
+
+
+def test_out_of_process_iframe_counts_for_parent_page():
+    blocker, connection = make_blocker()
+    navigate(connection, "s-page", "page-1", "https://example.com/")
+    attach(connection, "s-frame", "frame-1", "iframe", parent="s-page")
+    request(connection, "s-frame", "https://ads.example.com/banner.png")
+    connection.emit("Network.loadingFinished", {"encodedDataLength": 50}, "s-frame")
+    report = blocker.last_report()
+    assert (report.requests, report.loaded_bytes) == (2, 50)
+
+    # 外れたセッションのイベントはどこにも数えない
+    connection.emit("Target.detachedFromTarget", {"sessionId": "s-frame"}, "s-page")
+    request(connection, "s-frame", "https://ads.example.com/late.png")
+    assert report.requests == 2
+
+
+def test_worker_is_resumed_without_blocking():
+    blocker, connection = make_blocker()
+    connection.sent_list.clear()
+    attach(connection, "s-worker", "worker-1", "service_worker")
+    assert connection.sent_list == [("Runtime.runIfWaitingForDebugger", "s-worker")]
+    request(connection, "s-worker", "https://example.com/sw.js", "Script")
+    assert blocker.reports == []
+
+
+def test_saved_with_baseline():
+    report = BlockReport(url="https://example.com/", target_id="page-1", requests=10, loaded_bytes=3000)
+    report.blocked_requests = 4
+    report.baseline_requests = 12
+    report.baseline_bytes = 9000
+    assert report.requests_saved == 6
+    assert report.bytes_saved == 6000
@@ -0,0 +1,174 @@
+# 標準ライブラリ
+from concurrent.futures import Future
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+
+# 外部ライブラリ
+import pytest
+
+# 自作ライブラリ
+from autoweb_module.exceptions import CdpError
+from autoweb_module.selenium.cdp import CdpConnection
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakeDevTools:
+    """
+    ChromeのDevToolsの代わりのwebsocketサーバー。1接続だけ受ける
+    handlerにコマンドを渡し、返したフレームのリストをそのまま送る
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self._server.getsockname()[1]}/devtools/browser/fake"
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        sock, _ = self._server.accept()
+        self.sock = sock
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += sock.recv(4096)
+        key = next(
+            line.split(b":", 1)[1].strip()
+            for line in request.split(b"\r\n")
+            if line.lower().startswith(b"sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID.encode()).digest())
+        sock.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        try:
+            while True:
+                opcode, payload = self._recv_frame(sock)
+                if opcode == 0x8:
+                    break
+                for frame in self.handler(json.loads(payload)):
+                    sock.sendall(frame)
+        except (OSError, ConnectionError):
+            pass
+        sock.close()
+
+    def _recv_frame(self, sock: socket.socket) -> tuple[int, bytes]:
+        def recv_exact(size: int) -> bytes:
+            data = b""
+            while data.__len__() < size:
+                chunk = sock.recv(size - data.__len__())
+                if chunk == b"":
+                    raise ConnectionError
+                data += chunk
+            return data
+
+        first, second = recv_exact(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", recv_exact(8))[0]
+        mask = recv_exact(4)
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(recv_exact(length)))
+        return first & 0x0F, payload
+
+    def close(self):
+        self._server.close()
+
+
+def frame(payload: bytes, opcode: int = 0x1, fin: bool = True) -> bytes:
+    """サーバーからのフレーム(マスクなし)"""
+    length = payload.__len__()
+    if length < 126:
+        header = bytes([length])
+    elif length < 1 << 16:
+        header = bytes([126]) + struct.pack("!H", length)
+    else:
+        header = bytes([127]) + struct.pack("!Q", length)
+    return bytes([(0x80 if fin else 0) | opcode]) + header + payload
+
+
+def reply(message: dict, result: dict) -> list[bytes]:
+    body = {"id": message["id"], "result": result}
+    if "sessionId" in message:
+        body["sessionId"] = message["sessionId"]
+    return [frame(json.dumps(body).encode())]
+
+
+@pytest.fixture
+def open_connection():
+    opened = []
+
+    def open_(handler) -> CdpConnection:
+        server = FakeDevTools(handler)
+        connection = CdpConnection(server.url, timeout=5)
+        opened.append((server, connection))
+        return connection
+
+    yield open_
+    for server, connection in opened:
+        connection.close()
+        server.close()
+
+
+def test_command_result_and_session(open_connection):
+    connection = open_connection(lambda message: reply(message, {"echo": message["method"], **message["params"]}))
+    assert connection.send("Browser.getVersion") == {"echo": "Browser.getVersion"}
+    assert connection.send("Runtime.evaluate", {"x": 1}, session_id="s-1") == {"echo": "Runtime.evaluate", "x": 1}
+
+
+def test_error_response(open_connection):
+    def handler(message):
+        body = {"id": message["id"], "error": {"code": -32000, "message": "No target"}}
+        return [frame(json.dumps(body).encode())]
+
+    connection = open_connection(handler)
+    with pytest.raises(CdpError, match="No target"):
+        connection.send("Target.attachToTarget", {"targetId": "x"})
+
+
+def test_event_dispatch(open_connection):
+    def handler(message):
+        event = {"method": "Browser.downloadWillBegin", "params": {"guid": "g"}, "sessionId": "s-1"}
+        return [frame(json.dumps(event).encode())] + reply(message, {})
+
+    connection = open_connection(handler)
+    received: Future = Future()
+    connection.on("Browser.downloadWillBegin", lambda params, session_id: received.set_result((params, session_id)))
+    connection.send("Browser.setDownloadBehavior")
+    assert received.result(timeout=5) == ({"guid": "g"}, "s-1")
+
+
+def test_fragmented_and_large_messages(open_connection):
+    """分割されたフレームも、64KiBを超えるメッセージも1つのメッセージとして受け取る"""
+    big = "x" * (70 * 1024)
+
+    def handler(message):
+        data = json.dumps({"id": message["id"], "result": {"data": big}}).encode()
+        if message["method"] == "fragmented":
+            return [frame(data[:10], fin=False), frame(data[10:100], opcode=0x0, fin=False), frame(data[100:], 0x0)]
+        return [frame(data)]
+
+    connection = open_connection(handler)
+    assert connection.send("large")["data"] == big
+    assert connection.send("fragmented")["data"] == big
+
+
+def test_server_close_fails_pending(open_connection):
+    connection = open_connection(lambda message: [frame(b"", opcode=0x8)])
+    with pytest.raises(CdpError):
+        connection.send("Page.navigate")
+    with pytest.raises(CdpError):
+        connection.send_async("Page.navigate").result(timeout=5)
+
+
+def test_send_after_close(open_connection):
+    connection = open_connection(lambda message: reply(message, {}))
+    connection.close()
+    with pytest.raises(CdpError):
+        connection.send("Browser.getVersion")
@@ -0,0 +1,116 @@
+# 標準ライブラリ
+import dataclasses
+
+# 外部ライブラリ
+import pytest
+
+# 自作ライブラリ
+from autoweb_module.selenium.cond import CondOptimizer, LocatorCond, TagCond, TextCond, compile_xpath
+
+
+def test_cond_is_frozen():
+    cond = TagCond("a")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cond.name = "img"
+
+
+def test_combine_does_not_change_operands():
+    a = TagCond("a")
+    href = LocatorCond("href", ".png", "endswith")
+    before = a.xpath
+    combined = a & href
+    assert a.xpath == before
+    assert combined.xpath == ".//a[substring(@href, string-length(@href) - 3) = '.png']"
+
+
+def test_same_structure_is_equal_and_hashable():
+    assert TagCond("a") & TextCond("次へ") == TagCond("a") & TextCond("次へ")
+    assert hash(TagCond("a") & TextCond("次へ")) == hash(TagCond("a") & TextCond("次へ"))
+    cond = TagCond("a")
+    assert cond.copy() is cond
+
+
+def test_xpath_compile_is_memoized():
+    """ループ内で同じ条件を作り直しても組み立ては1回だけ"""
+    compile_xpath.cache_clear()
+    for _ in range(10):
+        (TagCond("a") & LocatorCond("class", "x")).xpath
+    info = compile_xpath.cache_info()
+    assert info.misses == 1
+    assert info.hits == 9
+
+
+def test_quote_value_with_both_quotes():
+    cond = LocatorCond("title", "say \"hi\" it's")
+    assert cond.xpath == """.//*[@title = concat('say "hi" it', "'", 's')]"""
+
+
+# ---------------最適化---------------
+A = TagCond("a")
+CLASS_X = LocatorCond("class", "x")
+PNG = LocatorCond("href", ".png", "endswith")
+NEXT = TextCond("次へ")
+
+
+def test_subsumed_branch_is_dropped():
+    """(a & x) | (a & x & png) は (a & x) だけでいい"""
+    assert ((A & CLASS_X) | (A & CLASS_X & PNG)).xpath == ".//a[@class = 'x']"
+
+
+def test_duplicate_branch_is_dropped():
+    cond = (A & CLASS_X) | (A & CLASS_X)
+    assert cond.xpath == ".//a[@class = 'x']"
+    # 最適化しなければそのまま|でつなぐ
+    assert compile_xpath(cond, ".//", False) == ".//a[@class = 'x'] | .//a[@class = 'x']"
+
+
+def test_common_condition_is_factored():
+    cond = (A & CLASS_X & PNG) | (A & CLASS_X & NEXT)
+    assert cond.xpath == (
+        ".//a[@class = 'x' and ((substring(@href, string-length(@href) - 3) = '.png') or (normalize-space() = '次へ'))]"
+    )
+
+
+def test_branches_are_grouped_by_tag():
+    cond = (A & CLASS_X) | (A & PNG) | TagCond("img")
+    assert cond.xpath == (
+        ".//a[(@class = 'x') or (substring(@href, string-length(@href) - 3) = '.png')] | .//img"
+    )
+
+
+def test_dedup_within_branch():
+    and_selector = (A & CLASS_X & CLASS_X).and_selector_list[0]
+    assert CondOptimizer().dedup(and_selector).locators == (CLASS_X,)
+
+
+def test_self_xpath():
+    assert (A & CLASS_X).self_xpath == "self::a[@class = 'x']"
+
+
+# ---------------CSS---------------
+def test_css_for_tag_and_locators():
+    cond = A & PNG
+    assert cond.css == 'a[href$=".png"]'
+    assert cond.selector == ("css", 'a[href$=".png"]')
+    assert (CLASS_X | (A & PNG)).css == '*[class="x"], a[href$=".png"]'
+
+
+def test_text_cond_falls_back_to_xpath():
+    cond = A & NEXT
+    assert cond.selector == ("xpath", ".//a[normalize-space() = '次へ']")
+    with pytest.raises(ValueError):
+        cond.css
+
+
+def test_empty_contains_falls_back_to_xpath():
+    """xpathのcontains(@a, '')は属性がなくても真だが、CSSの[a*=""]は何にも当たらない"""
+    assert LocatorCond("data-x", "", "contains").selector == ("xpath", ".//*[contains(@data-x, '')]")
+
+
+def test_css_quote_value():
+    assert LocatorCond("title", 'a"b\\c').css == '*[title="a\\"b\\\\c"]'
+    assert LocatorCond("title", "a\nb").css == '*[title="a\\a b"]'
+
+
+def test_unusual_attribute_name_falls_back_to_xpath():
+    assert LocatorCond("data:x", "1").selector[0] == "xpath"
@@ -0,0 +1,98 @@
+# 標準ライブラリ
+from types import SimpleNamespace
+
+# 外部ライブラリ
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+# 自作ライブラリ
+from autoweb_module.selenium import script
+from autoweb_module.selenium.cond import LocatorCond, TagCond, TextCond
+from autoweb_module.selenium.crawl import crawl_pages
+from autoweb_module.selenium.tabs import TabManager
+from autoweb_module.selenium.wait import WaitStrategy
+
+NEXT = TagCond("button") & TextCond("次へ")
+ROW = TagCond("tr") & LocatorCond("class", "row")
+
+
+class FakeRow:
+    """ページに置かれる要素。印(__autowebPage)を持てる"""
+
+    def __init__(self, page: int):
+        self.page = page
+        self.mark = None
+
+
+class InPlaceWebDriver:
+    """
+    「次へ」のボタンを押すと、同じページのまま(XHRで)一覧の行だけ入れ替えるサイトを真似る
+    ページの印(window.__autowebGoto)はクリックしても消えない
+    """
+
+    def __init__(self, page_count: int, update: bool = True):
+        self.page_count = page_count
+        self.update = update
+        self.page = 1
+        self.row = FakeRow(1)
+        self.window_mark = None
+        self.window_handles = ["a"]
+        self.current_window_handle = "a"
+
+    def execute_script(self, js: str, *args):
+        if js == script.NEXT_PAGE_JS:
+            return None if self.page >= self.page_count else ["next-button", None]
+        if js == script.NEXT_PAGE_MARK_JS:
+            token, changed_selector_list = args
+            self.window_mark = token
+            if changed_selector_list.__len__() > 0:
+                self.row.mark = token
+            return None
+        if js == "arguments[0].click();":
+            if self.update:
+                self.page += 1
+                self.row = FakeRow(self.page)
+            return None
+        if js == script.NEXT_PAGE_STATE_JS:
+            token, _, changed_selector_list = args
+            if self.window_mark != token:
+                return [True, None]
+            if changed_selector_list.__len__() == 0 or self.row.mark == token:
+                return None
+            return [True, self.row]
+        if js == script.PAGE_MARKED_JS:
+            return self.window_mark == args[0]
+        raise AssertionError(js)
+
+
+def make_tabs(web_driver: InPlaceWebDriver) -> TabManager:
+    driver = SimpleNamespace(
+        driver=web_driver,
+        wait_strategy=WaitStrategy(interval=0.01),
+        _get_temp_wait_time=lambda wait_time: 0.1 if wait_time is None else wait_time,
+    )
+    return TabManager(driver)
+
+
+def test_in_place_pagination_with_changed():
+    web_driver = InPlaceWebDriver(page_count=3)
+    pages = crawl_pages(make_tabs(web_driver), lambda driver: driver.driver.row.page, NEXT, lookahead=0, changed=ROW)
+    assert list(pages) == [1, 2, 3]
+
+
+def test_in_place_pagination_without_changed_is_reported():
+    """changedなしだと中身が入れ替わっても気付けないので、同じページのままだと分かるエラーにする"""
+    web_driver = InPlaceWebDriver(page_count=3)
+    pages = crawl_pages(make_tabs(web_driver), lambda driver: driver.driver.row.page, NEXT, lookahead=0)
+    assert next(pages) == 1
+    with pytest.raises(TimeoutException, match="changed"):
+        next(pages)
+
+
+def test_in_place_pagination_that_does_not_update():
+    """changedを指定していても、中身が替わらなければ普通の時間切れ"""
+    web_driver = InPlaceWebDriver(page_count=3, update=False)
+    pages = crawl_pages(make_tabs(web_driver), lambda driver: driver.driver.row.page, NEXT, lookahead=0, changed=ROW)
+    assert next(pages) == 1
+    with pytest.raises(TimeoutException, match="移りませんでした。$"):
+        next(pages)
@@ -0,0 +1,65 @@
+# 外部ライブラリ
+import pytest
+
+# 自作ライブラリ
+from autoweb_module.selenium.download import DownloadTracker
+
+
+class FakeConnection:
+    """イベントを手で流せるCDPの接続"""
+
+    def __init__(self):
+        self.listener_dict = {}
+
+    def on(self, event, callback):
+        self.listener_dict.setdefault(event, []).append(callback)
+
+    def off(self, event, callback):
+        self.listener_dict[event].remove(callback)
+
+    def send(self, method, params=None, session_id=None):
+        return {}
+
+    def emit(self, event, params):
+        for callback in list(self.listener_dict.get(event, [])):
+            callback(params, None)
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    connection = FakeConnection()
+    return DownloadTracker(connection, tmp_path), connection
+
+
+def will_begin(guid: str) -> dict:
+    return {"guid": guid, "url": f"https://example.com/{guid}", "suggestedFilename": f"{guid}.txt"}
+
+
+def test_cancelled_expect_is_removed(tracker):
+    """時間切れでcancelした待ちは外れ、次のダウンロードを横取りしない"""
+    tracker, connection = tracker
+    stale = tracker.expect()
+    stale.cancel()
+    assert tracker._expect_deque.__len__() == 0
+    future = tracker.expect()
+    connection.emit("Browser.downloadWillBegin", will_begin("a"))
+    assert future.result(timeout=0).guid == "a"
+
+
+def test_expects_are_assigned_in_order(tracker):
+    tracker, connection = tracker
+    first = tracker.expect()
+    second = tracker.expect()
+    connection.emit("Browser.downloadWillBegin", will_begin("a"))
+    connection.emit("Browser.downloadWillBegin", will_begin("b"))
+    assert first.result(timeout=0).guid == "a"
+    assert second.result(timeout=0).guid == "b"
+    assert tracker._expect_deque.__len__() == 0
+
+
+def test_completed_download_is_renamed(tracker, tmp_path):
+    tracker, connection = tracker
+    connection.emit("Browser.downloadWillBegin", will_begin("a"))
+    (tmp_path / "a").write_text("data")
+    connection.emit("Browser.downloadProgress", {"guid": "a", "state": "completed", "totalBytes": 4, "receivedBytes": 4})
+    assert tracker.downloads[0].result(0) == tmp_path / "a.txt"
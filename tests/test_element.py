@@ -0,0 +1,537 @@
+# 標準ライブラリ
+from dataclasses import dataclass, field
+import base64
+
+# 外部ライブラリ
+import pytest
+from selenium.common.exceptions import JavascriptException, StaleElementReferenceException, TimeoutException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.locator_converter import LocatorConverter
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# 自作ライブラリ
+from autoweb_module import Element
+from autoweb_module.exceptions import NotWebElementError
+from autoweb_module.selenium import script
+from autoweb_module.selenium.cond import TagCond, TextCond
+from autoweb_module.selenium.element_list import ElementList
+from autoweb_module.selenium.wait import WaitStrategy
+
+
+class FakeWebDriver(WebDriver):
+    """
+    ブラウザなしでElementを動かす。execute_scriptはscript_handler、WebElementのコマンドはcommand_dictの値を返す
+    command_dictの値が関数なら呼ぶたびにその戻り値を返す
+    送ったスクリプトとコマンドはscript_list, command_listに残る
+    """
+
+    def __init__(self, script_handler=None, capabilities: dict | None = None):
+        self.script_handler = script_handler
+        self.caps = {} if capabilities is None else capabilities
+        self.locator_converter = LocatorConverter()
+        self.command_dict = {}
+        self.script_list = []
+        self.command_list = []
+
+    def execute_script(self, script_text: str, *args):
+        self.script_list.append((script_text, args))
+        return self.script_handler(script_text, *args)
+
+    def execute(self, driver_command: str, params: dict | None = None) -> dict:
+        self.command_list.append(driver_command)
+        value = self.command_dict[driver_command]
+        if callable(value):
+            value = value()
+        if isinstance(value, Exception):
+            raise value
+        return {"value": value}
+
+
+def make_driver(web_driver: FakeWebDriver, wait_time: int | float = 5) -> Element:
+    wait_strategy = WaitStrategy(interval=0.01)
+    return Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=wait_time, wait_strategy=wait_strategy)
+
+
+@pytest.fixture
+def web_driver() -> WebDriver:
+    # ブラウザは起動しない。isinstanceを通すだけ
+    return WebDriver.__new__(WebDriver)
+
+
+@pytest.fixture
+def driver(web_driver: WebDriver) -> Element:
+    return Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+
+
+def test_new_element_keeps_settings(driver: Element, web_driver: WebDriver):
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert elem.driver is web_driver
+    assert elem.wait_time == 5
+    assert elem.debug_mode is False
+
+
+def test_settings_are_per_element(driver: Element, web_driver: WebDriver):
+    """あるElementで設定を変えても、ほかのElementには効かない"""
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    elem.wait_time = 0
+    elem.debug_mode = True
+    assert driver.wait_time == 5
+    assert driver.debug_mode is False
+    # 変えたあとに作ったElementは変えた設定を引き継ぐ
+    child = elem._get_new_element(elem=WebElement(web_driver, "id-2"))
+    assert child.debug_mode is True
+
+
+def test_dataclass_subclass(web_driver: WebDriver):
+    @dataclass
+    class LabeledElement(Element):
+        label: str = "default"
+        visit_list: list[str] = field(default_factory=list)
+
+        def __post_init__(self):
+            super().__post_init__()
+            self.visit_list.append("post_init")
+
+    driver = LabeledElement(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5, label="root")
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert type(elem) is LabeledElement
+    assert elem.visit_list == ["post_init"]
+    assert elem.driver is web_driver
+
+
+def test_subclass_init_runs(web_driver: WebDriver):
+    class CountingElement(Element):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.click_count = 0
+
+    driver = CountingElement(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert type(elem) is CountingElement
+    assert elem.click_count == 0
+
+
+def test_eq_and_hash(driver: Element, web_driver: WebDriver):
+    elem_a = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    elem_b = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    elem_c = driver._get_new_element(elem=WebElement(web_driver, "id-2"))
+    assert elem_a == elem_b
+    assert elem_a != elem_c
+    assert elem_a != driver
+    assert {elem_a: 1}[elem_b] == 1
+
+
+def test_child_fast_path_matches_init(driver: Element, web_driver: WebDriver):
+    """__init__を通さない近道でも、Element(...)で作ったのと同じ中身になる"""
+    web_elem = WebElement(web_driver, "id-1")
+    child = driver._get_new_element(elem=web_elem)
+    built = Element(elem=web_elem, debug_mode=False, save_folder=None, _wait_time=5, wait_strategy=driver.wait_strategy)
+    for name in ("elem", "driver", "debug_mode", "save_folder", "wait_time", "wait_strategy", "download_tracker", "writer"):
+        assert getattr(child, name) == getattr(built, name)
+    assert child._cache is None
+
+
+def test_method_only_subclass_keeps_type(web_driver: WebDriver):
+    class NamedElement(Element):
+        def name(self) -> str:
+            return "named"
+
+    driver = NamedElement(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert type(elem) is NamedElement
+    assert elem.name() == "named"
+    assert elem.wait_time == 5
+
+
+def test_dataclass_subclass_needs_eq_false(web_driver: WebDriver):
+    """@dataclass(eq=False)ならElementの__eq__/__hash__のままで、fill_formのキーに使える"""
+
+    @dataclass(eq=False)
+    class LabeledElement(Element):
+        label: str = "default"
+
+    driver = LabeledElement(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+    elem_a = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    elem_b = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert elem_a == elem_b
+    assert {elem_a: "入力値"}[elem_b] == "入力値"
+
+    # eq=Trueだとフィールドを比べる__eq__が作られ、hashできなくなる
+    @dataclass
+    class EqElement(Element):
+        label: str = "default"
+
+    assert EqElement.__hash__ is None
+
+
+def test_type_check():
+    with pytest.raises(TypeError):
+        Element(elem="not a driver", debug_mode=False, save_folder=None, _wait_time=5)
+
+
+# ---------------一括取得---------------
+def test_fetch_rows_in_one_script():
+    """全要素をexecute_script1回で読み、キーは属性・プロパティ・text・tag_nameの順"""
+    web_driver = FakeWebDriver(lambda script_text, *args: [["/a", 1, "A", "a"], ["/b", 2, "B", "a"]])
+    driver = make_driver(web_driver)
+    web_elems = [WebElement(web_driver, "id-1"), WebElement(web_driver, "id-2")]
+    elems = ElementList(origin=driver, web_elems=web_elems)
+    rows = driver.fetch_rows(elems, attrs=["href"], props=["childElementCount"], text=True, tag_name=True)
+    assert rows == [
+        {"href": "/a", "childElementCount": 1, "text": "A", "tag_name": "a"},
+        {"href": "/b", "childElementCount": 2, "text": "B", "tag_name": "a"},
+    ]
+    assert web_driver.script_list.__len__() == 1
+    script_text, args = web_driver.script_list[0]
+    assert script_text == script.fetch_rows_js()
+    assert args == (web_elems, ["href"], ["childElementCount"], True, True)
+
+
+def test_fetch_rows_accepts_element_list_of_elements():
+    web_driver = FakeWebDriver(lambda script_text, *args: [["x"] for _ in args[0]])
+    driver = make_driver(web_driver)
+    elems = [driver._get_new_element(elem=WebElement(web_driver, f"id-{i}")) for i in range(3)]
+    assert driver.fetch_rows(elems, attrs=["class"]) == [{"class": "x"}] * 3
+    assert web_driver.script_list[0][1][0] == [elem.elem for elem in elems]
+
+
+def test_fetch_rows_empty_and_invalid():
+    web_driver = FakeWebDriver(lambda script_text, *args: pytest.fail("空なら問い合わせない"))
+    driver = make_driver(web_driver)
+    assert driver.fetch_rows([], attrs=["href"]) == []
+    with pytest.raises(ValueError):
+        driver.fetch_rows([], attrs=["text"], text=True)
+    with pytest.raises(NotWebElementError):
+        driver.fetch_rows([driver], attrs=["href"])
+
+
+# ---------------キャッシュ---------------
+def test_tag_name_is_cached_per_handle():
+    web_driver = FakeWebDriver()
+    web_driver.command_dict[Command.GET_ELEMENT_TAG_NAME] = "input"
+    elem = make_driver(web_driver)._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert elem.tag_name == "input"
+    assert elem.is_input
+    assert web_driver.command_list == [Command.GET_ELEMENT_TAG_NAME]
+    assert (elem._cache_hit, elem._cache_miss) == (1, 1)
+    # 同じWebElementでも別のElementならキャッシュは別
+    other = make_driver(web_driver)._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert other.tag_name == "input"
+    assert web_driver.command_list.__len__() == 2
+
+
+def test_attr_cache_is_opt_in():
+    value_list = ["/a", "/b", "/c"]
+    web_driver = FakeWebDriver(lambda script_text, *args: value_list.pop(0))
+    elem = make_driver(web_driver)._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert elem.attr("href", cache=True) == "/a"
+    assert elem.attr("href", cache=True) == "/a"
+    # cacheなしはいつも取り直す
+    assert elem.attr("href") == "/b"
+    assert elem.attr("href") == "/c"
+
+
+def test_cache_is_dropped_on_stale_reference():
+    """古い参照になったらキャッシュを捨て、次は取り直す"""
+    web_driver = FakeWebDriver()
+    web_driver.command_dict[Command.GET_ELEMENT_TAG_NAME] = "div"
+    web_driver.command_dict[Command.GET_ELEMENT_TEXT] = StaleElementReferenceException("stale")
+    elem = make_driver(web_driver)._get_new_element(elem=WebElement(web_driver, "id-1"))
+    assert elem.tag_name == "div"
+    with pytest.raises(StaleElementReferenceException):
+        elem.text
+    assert elem._cache is None
+    assert elem.tag_name == "div"
+    assert web_driver.command_list.count(Command.GET_ELEMENT_TAG_NAME) == 2
+
+    # existsで消えたと分かったときも捨てる
+    web_driver.command_dict[Command.GET_ELEMENT_TAG_NAME] = StaleElementReferenceException("stale")
+    assert not elem.exists
+    assert elem._cache is None
+
+
+def test_soup_is_cached_by_page_state_and_parser():
+    page_state_list = ["state-1"]
+    web_driver = FakeWebDriver(lambda script_text, *args: page_state_list[-1])
+    web_driver.command_dict[Command.GET_PAGE_SOURCE] = "<html><body><p>1</p></body></html>"
+    driver = make_driver(web_driver)
+    soup = driver.get_soup()
+    assert soup.builder.NAME == "html.parser"
+    # 問い合わせるのはページの状態だけで、HTMLは取り直さない
+    assert driver.get_soup() is soup
+    assert driver.soup is soup
+    assert web_driver.command_list == [Command.GET_PAGE_SOURCE]
+    assert all(script_text == script.PAGE_STATE_JS for script_text, _ in web_driver.script_list)
+
+    # parserが違えば作り直す
+    lxml_soup = driver.get_soup("lxml")
+    assert lxml_soup is not soup
+    assert lxml_soup.builder.NAME == "lxml"
+    assert web_driver.command_list.__len__() == 2
+
+    # ページが変わったら取り直す
+    page_state_list.append("state-2")
+    web_driver.command_dict[Command.GET_PAGE_SOURCE] = "<html><body><p>2</p></body></html>"
+    assert driver.get_soup("lxml").p.text == "2"
+    assert (driver._cache_hit, driver._cache_miss) == (2, 3)
+
+
+# ---------------待機---------------
+def growing_elements(web_driver: FakeWebDriver, count_list: list[int]):
+    """呼ぶたびにcount_listの件数の要素を返す。使い切ったら最後の件数のまま"""
+    call_list = []
+
+    def find_elements():
+        count = count_list[min(call_list.__len__(), count_list.__len__() - 1)]
+        call_list.append(count)
+        return [WebElement(web_driver, f"id-{i}") for i in range(count)]
+
+    return find_elements, call_list
+
+
+def test_find_elems_waits_for_min_count():
+    """min_countを満たした問い合わせの結果をそのまま返し、探し直さない"""
+    web_driver = FakeWebDriver()
+    find_elements, call_list = growing_elements(web_driver, [0, 1, 3, 5])
+    web_driver.command_dict[Command.FIND_ELEMENTS] = find_elements
+    elems = make_driver(web_driver).find_elems("css", ".item", min_count=3)
+    assert elems.__len__() == 3
+    assert call_list == [0, 1, 3]
+
+
+def test_find_elems_returns_found_on_timeout():
+    web_driver = FakeWebDriver()
+    find_elements, _ = growing_elements(web_driver, [1])
+    web_driver.command_dict[Command.FIND_ELEMENTS] = find_elements
+    assert make_driver(web_driver).find_elems("css", ".item", wait_time=0.05, min_count=3).__len__() == 1
+    find_elements, _ = growing_elements(web_driver, [0])
+    web_driver.command_dict[Command.FIND_ELEMENTS] = find_elements
+    assert make_driver(web_driver).find_elems("css", ".item", wait_time=0.05) == []
+
+
+def test_find_elems_waits_until_count_is_stable():
+    """無限スクロールのように件数が増えている間は待つ"""
+    web_driver = FakeWebDriver()
+    find_elements, call_list = growing_elements(web_driver, [2, 4, 6, 6])
+    web_driver.command_dict[Command.FIND_ELEMENTS] = find_elements
+    elems = make_driver(web_driver).find_elems("css", ".item", stable_time=0.05)
+    assert elems.__len__() == 6
+    assert call_list[:3] == [2, 4, 6]
+
+
+def test_find_elems_without_wait():
+    web_driver = FakeWebDriver()
+    find_elements, call_list = growing_elements(web_driver, [0, 3])
+    web_driver.command_dict[Command.FIND_ELEMENTS] = find_elements
+    assert make_driver(web_driver, wait_time=0).find_elems("css", ".item") == []
+    assert call_list == [0]
+
+
+def conds_answer(web_driver: FakeWebDriver, found_list_list: list[list[str | None]]):
+    """FIND_CONDS_JSに、呼ぶたびにfound_list_listの順で答える(要素はidで書く)。使い切ったら最後のまま"""
+    call_list = []
+
+    def handler(script_text, root, selector_list):
+        assert script_text == script.FIND_CONDS_JS
+        found_list = found_list_list[min(call_list.__len__(), found_list_list.__len__() - 1)]
+        call_list.append(selector_list)
+        return [None if web_id is None else WebElement(web_driver, web_id) for web_id in found_list]
+
+    return handler, call_list
+
+
+ERROR = TagCond("div") & TextCond("エラー")
+DONE = TagCond("p") & TextCond("完了")
+
+
+def test_wait_any_returns_which_cond_matched():
+    web_driver = FakeWebDriver()
+    web_driver.script_handler, call_list = conds_answer(web_driver, [[None, None], [None, "id-2"]])
+    match = make_driver(web_driver).wait_any([ERROR, DONE])
+    assert (match.index, match.cond) == (1, DONE)
+    assert match.elem.elem == WebElement(web_driver, "id-2")
+    # 全条件を1回の問い合わせで見る
+    assert call_list == [[list(ERROR.selector), list(DONE.selector)]] * 2
+
+
+def test_wait_any_prefers_earlier_cond():
+    web_driver = FakeWebDriver()
+    web_driver.script_handler, _ = conds_answer(web_driver, [["id-1", "id-2"]])
+    assert make_driver(web_driver).wait_any([ERROR, DONE]).index == 0
+
+
+def test_wait_all_returns_elements_in_cond_order():
+    web_driver = FakeWebDriver()
+    web_driver.script_handler, call_list = conds_answer(web_driver, [["id-1", None], ["id-1", "id-2"]])
+    elems = make_driver(web_driver).wait_all([ERROR, DONE])
+    assert [elem.elem for elem in elems] == [WebElement(web_driver, "id-1"), WebElement(web_driver, "id-2")]
+    assert call_list.__len__() == 2
+
+
+def test_wait_conds_timeout_and_empty():
+    web_driver = FakeWebDriver()
+    web_driver.script_handler, _ = conds_answer(web_driver, [["id-1", None]])
+    driver = make_driver(web_driver)
+    with pytest.raises(TimeoutException, match="all"):
+        driver.wait_all([ERROR, DONE], wait_time=0.05)
+    with pytest.raises(ValueError):
+        driver.wait_any([])
+
+
+# ---------------goto---------------
+class FakePage:
+    """
+    page_load_strategy="none"のブラウザを真似る。getはすぐ返り、state_listの順にページの状態が進む
+    state_listの要素は"old"(まだ前のページ)、"navigating"(JavascriptException)、[DOMContentLoaded済みか, 要素のid]
+    """
+
+    def __init__(self, web_driver: FakeWebDriver, state_list: list):
+        self.web_driver = web_driver
+        self.state_list = state_list
+        self.mark = None
+        self.navigated = False
+        web_driver.script_handler = self.handle
+        web_driver.command_dict[Command.GET] = self.get
+
+    def get(self):
+        self.navigated = True
+
+    def handle(self, script_text, *args):
+        if script_text == script.GOTO_MARK_JS:
+            self.mark = args[0]
+            return None
+        assert script_text == script.GOTO_STATE_JS
+        token, _ = args
+        if not self.navigated or token != self.mark:
+            return [True, None]
+        state = self.state_list.pop(0) if self.state_list.__len__() > 1 else self.state_list[0]
+        if state == "old":
+            return None
+        if state == "navigating":
+            raise JavascriptException("navigating")
+        loaded, web_id = state
+        return [loaded, None if web_id is None else WebElement(self.web_driver, web_id)]
+
+
+def test_goto_returns_ready_element_before_load():
+    """readyが先に見つかれば、読み込みの途中でもその要素を返す"""
+    web_driver = FakeWebDriver(capabilities={"pageLoadStrategy": "none"})
+    FakePage(web_driver, ["old", "navigating", [False, None], [False, "id-1"]])
+    elem = make_driver(web_driver).goto("https://example.com/", TagCond("main"))
+    assert elem.elem == WebElement(web_driver, "id-1")
+    # 印を付けてから遷移する
+    assert web_driver.script_list[0][0] == script.GOTO_MARK_JS
+    assert web_driver.command_list == [Command.GET]
+
+
+def test_goto_returns_none_on_dom_content_loaded():
+    web_driver = FakeWebDriver(capabilities={"pageLoadStrategy": "none"})
+    FakePage(web_driver, ["old", [True, None]])
+    assert make_driver(web_driver).goto("https://example.com/", TagCond("main")) is None
+
+
+def test_goto_timeout_while_old_page():
+    web_driver = FakeWebDriver(capabilities={"pageLoadStrategy": "none"})
+    FakePage(web_driver, ["old"])
+    with pytest.raises(TimeoutException, match="example.com"):
+        make_driver(web_driver).goto("https://example.com/", wait_time=0.05)
+
+
+def test_goto_normal_strategy_checks_once():
+    """normalではgetが読み込みを待つので、そのあと1回探すだけ"""
+    web_driver = FakeWebDriver()
+    FakePage(web_driver, [[True, "id-1"]])
+    elem = make_driver(web_driver).goto("https://example.com/", TagCond("main"))
+    assert elem.elem == WebElement(web_driver, "id-1")
+    assert [script_text for script_text, _ in web_driver.script_list] == [script.GOTO_STATE_JS]
+
+
+# ---------------スクショ---------------
+class FakeChromeWebDriver(FakeWebDriver):
+    """execute_cdp_cmdがあるのでChrome系の扱い。答えはcdp_handler"""
+
+    def __init__(self, cdp_handler):
+        super().__init__()
+        self.cdp_handler = cdp_handler
+        self.cdp_list = []
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        self.cdp_list.append((cmd, cmd_args))
+        return self.cdp_handler(cmd, cmd_args)
+
+
+@pytest.mark.parametrize(
+    "file_name, save_type, expected_name, expected_format",
+    [
+        ("shot.png", "png", "shot.png", "png"),
+        ("shot.jpg", "jpeg", "shot.jpg", "jpeg"),
+        ("shot.JPEG", "jpeg", "shot.JPEG", "jpeg"),
+        ("shot.png", "webp", "shot.webp", "webp"),
+        ("shot", "jpeg", "shot.jpg", "jpeg"),
+    ],
+)
+def test_save_ss_suffix_and_format(tmp_path, file_name, save_type, expected_name, expected_format):
+    image = b"\x89image"
+
+    def cdp_handler(cmd, cmd_args):
+        if cmd == "Page.getLayoutMetrics":
+            return {"cssContentSize": {"width": 800, "height": 3000}}
+        return {"data": base64.b64encode(image).decode()}
+
+    web_driver = FakeChromeWebDriver(cdp_handler)
+    path = make_driver(web_driver).save_ss(tmp_path / file_name, save_type, full_page=save_type == "png")
+    assert path == tmp_path / expected_name
+    assert path.read_bytes() == image
+    cmd, cmd_args = web_driver.cdp_list[-1]
+    assert cmd == "Page.captureScreenshot"
+    assert cmd_args["format"] == expected_format
+    if save_type == "png":
+        assert cmd_args["clip"]["height"] == 3000
+
+
+def test_save_ss_rejects_unknown_type(tmp_path):
+    with pytest.raises(ValueError):
+        make_driver(FakeWebDriver()).save_ss(tmp_path / "shot.gif", "gif")
+
+
+def test_save_pdf_reassembles_stream(tmp_path):
+    """IO.readで少しずつ受け取ったPDFをつなげて書き、最後にストリームを閉じる"""
+    chunk_list = [
+        {"data": base64.b64encode(b"%PDF-1.7 ").decode(), "base64Encoded": True, "eof": False},
+        {"data": "text chunk ", "eof": False},
+        {"data": base64.b64encode(b"%%EOF").decode(), "base64Encoded": True, "eof": True},
+    ]
+
+    def cdp_handler(cmd, cmd_args):
+        match cmd:
+            case "Page.printToPDF":
+                assert cmd_args == {"transferMode": "ReturnAsStream"}
+                return {"stream": "stream-1"}
+            case "IO.read":
+                assert cmd_args == {"handle": "stream-1", "size": 4}
+                return chunk_list.pop(0)
+            case "IO.close":
+                return {}
+
+    web_driver = FakeChromeWebDriver(cdp_handler)
+    path = make_driver(web_driver).save_ss(tmp_path / "page", "pdf", chunk_size=4)
+    assert path == tmp_path / "page.pdf"
+    assert path.read_bytes() == b"%PDF-1.7 text chunk %%EOF"
+    assert [cmd for cmd, _ in web_driver.cdp_list] == ["Page.printToPDF", "IO.read", "IO.read", "IO.read", "IO.close"]
+
+
+def test_save_pdf_closes_stream_on_error(tmp_path):
+    def cdp_handler(cmd, cmd_args):
+        match cmd:
+            case "Page.printToPDF":
+                return {"stream": "stream-1"}
+            case "IO.read":
+                raise RuntimeError("切れた")
+            case "IO.close":
+                return {}
+
+    web_driver = FakeChromeWebDriver(cdp_handler)
+    with pytest.raises(RuntimeError):
+        make_driver(web_driver).save_ss(tmp_path / "page.pdf", "pdf")
+    assert web_driver.cdp_list[-1] == ("IO.close", {"handle": "stream-1"})
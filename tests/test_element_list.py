@@ -0,0 +1,36 @@
+# 外部ライブラリ
+import pytest
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# 自作ライブラリ
+from autoweb_module import Element
+from autoweb_module.selenium.element_list import ElementList
+
+
+@pytest.fixture
+def web_driver() -> WebDriver:
+    # ブラウザは起動しない。isinstanceを通すだけ
+    return WebDriver.__new__(WebDriver)
+
+
+@pytest.fixture
+def driver(web_driver: WebDriver) -> Element:
+    return Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+
+
+def test_empty_equals_empty_list(driver: Element):
+    """find_elemsがlistを返していたころの elems == [] が今も通る"""
+    elems = ElementList(origin=driver, web_elems=[])
+    assert elems == []
+    assert elems == ()
+    assert not elems
+
+
+def test_equals_list_of_elements(driver: Element, web_driver: WebDriver):
+    web_elems = [WebElement(web_driver, "id-1"), WebElement(web_driver, "id-2")]
+    elems = ElementList(origin=driver, web_elems=web_elems)
+    assert elems == [driver._get_new_element(elem=web_elem) for web_elem in web_elems]
+    assert elems != [driver._get_new_element(elem=web_elems[0])]
+    assert elems == ElementList(origin=driver, web_elems=list(web_elems))
+    assert elems[:1] == ElementList(origin=driver, web_elems=web_elems[:1])
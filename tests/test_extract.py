@@ -0,0 +1,42 @@
+# 標準ライブラリ
+from pathlib import Path
+import json
+
+# 自作ライブラリ
+from autoweb_module import write_csv, write_jsonl
+
+
+def generate_rows():
+    # extract_rowsと同じく1行ずつ渡す
+    yield {"name": "りんご", "price": "100"}
+    yield {"name": 'a,"b"', "price": None}
+
+
+def test_write_csv(tmp_path: Path):
+    path = tmp_path / "out" / "rows.csv"
+    assert write_csv(generate_rows(), path) == 2
+    text = path.read_bytes().decode("utf-8-sig")
+    assert text == 'name,price\r\nりんご,100\r\n"a,""b""",\r\n'
+
+
+def test_write_csv_fieldnames(tmp_path: Path):
+    path = tmp_path / "rows.csv"
+    assert write_csv(generate_rows(), path, fieldnames=["price", "name"]) == 2
+    assert path.read_bytes().decode("utf-8-sig").splitlines()[:2] == ["price,name", "100,りんご"]
+
+
+def test_write_csv_empty_rows(tmp_path: Path):
+    path = tmp_path / "rows.csv"
+    assert write_csv([], path) == 0
+    assert path.read_bytes().decode("utf-8-sig") == ""
+    assert write_csv([], path, fieldnames=["name"]) == 0
+    assert path.read_bytes().decode("utf-8-sig") == "name\r\n"
+
+
+def test_write_jsonl(tmp_path: Path):
+    path = tmp_path / "out" / "rows.jsonl"
+    assert write_jsonl(generate_rows(), path) == 2
+    line_list = path.read_text(encoding="utf-8").split("\n")
+    assert line_list[0] == '{"name": "りんご", "price": "100"}'
+    assert json.loads(line_list[1]) == {"name": 'a,"b"', "price": None}
+    assert line_list[2] == ""
@@ -0,0 +1,23 @@
+# 自作ライブラリ
+import autoweb_module
+
+
+def test_import_public_names():
+    """__init__で公開しているものが全部importできる(seleniumにない例外をimportしていたら落ちる)"""
+    for name in [
+        "Element",
+        "ElementList",
+        "Snapshot",
+        "Selenium",
+        "SeleniumPool",
+        "WaitStrategy",
+        "AsyncSelenium",
+        "DownloadTracker",
+        "ResourceBlocker",
+        "CommandStats",
+        "BackgroundWriter",
+        "write_csv",
+        "write_jsonl",
+        "TabManager",
+    ]:
+        assert hasattr(autoweb_module, name), name
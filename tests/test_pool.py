@@ -0,0 +1,153 @@
+# 標準ライブラリ
+from types import SimpleNamespace
+
+# 外部ライブラリ
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+# 自作ライブラリ
+from autoweb_module import SeleniumPool
+
+
+class FakeSelenium:
+    """ブラウザの代わり。aliveを落とすと死んだ扱い"""
+
+    def __init__(self):
+        self.alive = True
+
+    def quit(self):
+        self.alive = False
+
+
+class FakePool(SeleniumPool):
+    def __init__(self, size: int):
+        super().__init__(size)
+        self.launch_error: Exception | None = None
+        self.reset_error: Exception | None = None
+
+    def _launch_one(self):
+        if not self.launch_error is None:
+            raise self.launch_error
+        return FakeSelenium()
+
+    def _is_alive(self, selenium):
+        return selenium.alive
+
+    def _reset(self, selenium):
+        if not self.reset_error is None:
+            raise self.reset_error
+
+
+def test_lease_returns_to_idle():
+    with FakePool(2) as pool:
+        with pool.lease() as selenium:
+            assert isinstance(selenium, FakeSelenium)
+        assert pool._idle.qsize() == 2
+        assert pool.stats.lease_count == 1
+
+
+def test_dead_browser_is_replaced():
+    with FakePool(1) as pool:
+        with pool.lease() as selenium:
+            selenium.alive = False
+        pool.reset_error = WebDriverException("dead")
+        with pool.lease() as selenium:
+            pass
+        assert pool.stats.replaced_count >= 1
+        assert pool._selenium_list.__len__() == 1
+
+
+def test_failed_replace_keeps_slot():
+    """起動し直せなくても枠は_idleに戻り、次のleaseが永遠に待たない"""
+    with FakePool(1) as pool:
+        pool.launch_error = RuntimeError("launch failed")
+        pool.reset_error = WebDriverException("dead")
+        with pool.lease() as selenium:
+            selenium.alive = False
+        assert pool._idle.qsize() == 1
+        assert pool.stats.replace_failed_count == 1
+        assert pool._selenium_list == [selenium]
+
+        # 借りるときに起動し直しを試し、失敗は呼んだ側に投げる
+        with pytest.raises(RuntimeError):
+            with pool.lease(timeout=1):
+                pass
+        assert pool._idle.qsize() == 1
+
+        # 起動できるようになれば元に戻る
+        pool.launch_error = None
+        pool.reset_error = None
+        with pool.lease(timeout=1) as new_selenium:
+            assert new_selenium.alive
+        assert pool._selenium_list == [new_selenium]
+
+
+def test_check_health_keeps_slot_on_failure():
+    with FakePool(2) as pool:
+        for selenium in pool._selenium_list:
+            selenium.alive = False
+        pool.launch_error = RuntimeError("launch failed")
+        pool.check_health()
+        assert pool._idle.qsize() == 2
+
+
+def test_lease_timeout():
+    with FakePool(1) as pool:
+        with pool.lease():
+            with pytest.raises(TimeoutError):
+                with pool.lease(timeout=0.01):
+                    pass
+
+
+class FakeWebDriver:
+    """_resetが使うところだけ真似る(execute_cdp_cmdがないのでchromium以外の扱い)"""
+
+    def __init__(self):
+        self.window_handles = ["home", "tab-1"]
+        self.current_window_handle = "home"
+        self.switch_to = SimpleNamespace(window=self._switch)
+
+    def _switch(self, handle: str):
+        self.current_window_handle = handle
+
+    def execute_script(self, script: str, *args):
+        return "https://example.com"
+
+    def delete_all_cookies(self):
+        pass
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def get(self, url: str):
+        pass
+
+
+class BrowserSelenium:
+    """_resetを本物のまま通すためのSelenium"""
+
+    def __init__(self):
+        self._driver = FakeWebDriver()
+        self.driver = SimpleNamespace(driver=self._driver)
+        self.tabs = None
+
+    def _get_cdp_connection(self):
+        return None
+
+    def quit(self):
+        pass
+
+
+class ResetPool(SeleniumPool):
+    def _launch_one(self):
+        return BrowserSelenium()
+
+
+def test_reset_keeps_cdp_getter_for_tabs():
+    """返したあとに作り直すTabManagerも、CDPで切り替えずに読み込みを見られる"""
+    with ResetPool(1) as pool:
+        with pool.lease() as selenium:
+            pass
+        with pool.lease() as selenium:
+            assert selenium._driver.window_handles == ["home"]
+            assert selenium.tabs._connection_getter == selenium._get_cdp_connection
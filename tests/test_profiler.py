@@ -0,0 +1,110 @@
+# 標準ライブラリ
+import json
+
+# 外部ライブラリ
+import pytest
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# 自作ライブラリ
+from autoweb_module import Element
+from autoweb_module.selenium import profiler
+from autoweb_module.selenium.profiler import CommandRecord, CommandStats
+
+
+class FakeExecutor:
+    """RemoteConnectionの代わり。value_dictのコマンドに答え、ないコマンドはエラー"""
+
+    def __init__(self, value_dict: dict):
+        self.value_dict = value_dict
+
+    def execute(self, command: str, params: dict) -> dict:
+        if not command in self.value_dict:
+            raise RuntimeError(command)
+        return {"value": self.value_dict[command]}
+
+
+class FakeWebDriver(WebDriver):
+    """本物と同じく、コマンドをcommand_executor.executeに渡す"""
+
+    def __init__(self, executor: FakeExecutor):
+        self.command_executor = executor
+
+    def execute(self, driver_command: str, params: dict | None = None) -> dict:
+        return self.command_executor.execute(driver_command, params or {})
+
+
+def record(command: str, latency: float, caller: str | None = None) -> CommandRecord:
+    callers = () if caller is None else (caller,)
+    return CommandRecord(command, callers, 0, latency, 10, 20, 1)
+
+
+def test_stats_aggregate():
+    stats = CommandStats()
+    for command_record in [
+        record("findElements", 0.0005, "Element.find_elems"),
+        record("findElements", 0.003, "Element.find_elems"),
+        record("executeScript", 0.030, "Element.fetch_rows"),
+        record("getTitle", 6),
+    ]:
+        stats.add(command_record)
+    assert stats.round_trips == 4
+    assert stats.total_latency == pytest.approx(6.0335)
+    assert stats.command_counts == {"findElements": 2, "executeScript": 1, "getTitle": 1}
+    assert stats.caller_counts["(direct)"] == 1
+    assert list(stats.latency_by("command")) == ["getTitle", "executeScript", "findElements"]
+    assert stats.latency_by("caller")["Element.find_elems"] == pytest.approx(0.0035)
+    histogram = stats.histogram()
+    assert (histogram["<1ms"], histogram["<5ms"], histogram["<50ms"], histogram[">=5000ms"]) == (1, 1, 1, 1)
+    assert sum(stats.histogram("findElements").values()) == 2
+    assert "findElements: 2回" in stats.summary()
+
+
+def test_profile_records_and_restores_execute(tmp_path):
+    executor = FakeExecutor({Command.GET_TITLE: "title", Command.GET_ELEMENT_TAG_NAME: "a"})
+    web_driver = FakeWebDriver(executor)
+    driver = Element(elem=web_driver, debug_mode=False, save_folder=None, _wait_time=5)
+    elem = driver._get_new_element(elem=WebElement(web_driver, "id-1"))
+    trace_path = tmp_path / "trace.json"
+    with driver.profile(trace_path) as stats:
+        assert "execute" in executor.__dict__
+        web_driver.title
+        elem.tag_name
+    # 抜けたらクラスのexecuteに戻る
+    assert not "execute" in executor.__dict__
+    assert [(r.command, r.caller) for r in stats.records] == [
+        (Command.GET_TITLE, "(direct)"),
+        (Command.GET_ELEMENT_TAG_NAME, "Element.tag_name"),
+    ]
+    assert stats.records[1].response_bytes == len(json.dumps({"value": "a"}))
+    event_list = json.loads(trace_path.read_text(encoding="utf-8"))["traceEvents"]
+    assert [event["name"] for event in event_list] == [Command.GET_TITLE, Command.GET_ELEMENT_TAG_NAME]
+    # 抜けたあとのコマンドは記録しない
+    web_driver.title
+    assert stats.round_trips == 2
+
+
+def test_nested_profile_and_error():
+    """重ねたprofileはどちらにも記録し、外側を抜けるまで戻さない。失敗したコマンドも記録する"""
+    executor = FakeExecutor({Command.GET_TITLE: "title"})
+    web_driver = FakeWebDriver(executor)
+    with pytest.raises(RuntimeError):
+        with profiler.profile(web_driver) as outer:
+            with profiler.profile(web_driver) as inner:
+                web_driver.title
+            assert "execute" in executor.__dict__
+            web_driver.title
+            web_driver.execute(Command.GET_CURRENT_URL)
+    assert not "execute" in executor.__dict__
+    assert (inner.round_trips, outer.round_trips) == (1, 3)
+    assert outer.records[-1].response_bytes == 0
+
+
+def test_dump_folded(tmp_path):
+    stats = CommandStats()
+    stats.add(record("findElements", 0.002, "Element.find_elems"))
+    stats.add(record("findElements", 0.001, "Element.find_elems"))
+    path = tmp_path / "trace.folded"
+    stats.dump_trace(path, format="folded")
+    assert path.read_text(encoding="utf-8") == "Element.find_elems;findElements 3000\n"
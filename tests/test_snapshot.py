@@ -0,0 +1,55 @@
+# 外部ライブラリ
+import pytest
+
+# 自作ライブラリ
+from autoweb_module.selenium.cond import TagCond
+from autoweb_module.selenium.snapshot import Snapshot
+
+PAGE_HTML = """
+<html><head><title>t</title></head>
+<body class="main"><p id="a">一つ目</p><p id="b"><a href="/next">次へ</a></p></body></html>
+"""
+
+
+def test_document():
+    snapshot = Snapshot.from_html(PAGE_HTML, base_url="https://example.com/list")
+    assert snapshot.tag_name == "html"
+    assert snapshot.find_cond_elems(TagCond("p")).__len__() == 2
+    assert snapshot.find_elem("css", "a").attr("href") == "https://example.com/next"
+
+
+def test_single_element_fragment():
+    snapshot = Snapshot.from_html('<p id="a">あ <b>い</b></p>', is_document=False)
+    assert snapshot.tag_name == "p"
+    assert snapshot.text == "あ い"
+    # 読むときに包んだ要素は親に出てこない
+    assert snapshot.find_elems("xpath", "..") == []
+
+
+@pytest.mark.parametrize(
+    ("html", "tag_name"),
+    [("<tr><td>1</td></tr>", "tr"), ("<td>1</td>", "td"), ("<header><h1>x</h1></header>", "header")],
+)
+def test_fragment_keeps_own_tag(html: str, tag_name: str):
+    assert Snapshot.from_html(html, is_document=False).tag_name == tag_name
+
+
+def test_body_outer_html():
+    """bodyのouterHTMLも、子が1つでも複数でもbodyとして読む"""
+    snapshot = Snapshot.from_html('<body class="main"><p>1</p><p>2</p></body>', is_document=False)
+    assert snapshot.tag_name == "body"
+    assert snapshot.attr("class") == "main"
+    assert snapshot.find_cond_elems(TagCond("p")).__len__() == 2
+    single = Snapshot.from_html("<body><p>1</p></body>", is_document=False)
+    assert single.tag_name == "body"
+
+
+def test_html_outer_html():
+    snapshot = Snapshot.from_html(PAGE_HTML.strip(), is_document=False)
+    assert snapshot.tag_name == "html"
+    assert snapshot.find_elem("tag", "title").text == "t"
+
+
+def test_multiple_elements_are_rejected():
+    with pytest.raises(ValueError):
+        Snapshot.from_html("<p>1</p><p>2</p>", is_document=False)
@@ -0,0 +1,105 @@
+# 標準ライブラリ
+from types import SimpleNamespace
+
+# 外部ライブラリ
+from selenium.common.exceptions import NoSuchWindowException
+
+# 自作ライブラリ
+from autoweb_module.exceptions import CdpError
+from autoweb_module.selenium.tabs import TabManager
+
+
+class FakeSwitchTo:
+    def __init__(self, web_driver):
+        self.web_driver = web_driver
+
+    def window(self, handle: str):
+        self.web_driver.switch_count += 1
+        self.web_driver.current = handle
+
+
+class FakeWebDriver:
+    """タブの切り替えだけを真似る。currentがNoneなら今のタブは閉じられた扱い"""
+
+    def __init__(self, handle_list: list[str]):
+        self.window_handles = handle_list
+        self.current = handle_list[0]
+        self.switch_count = 0
+        self.switch_to = FakeSwitchTo(self)
+
+    @property
+    def current_window_handle(self) -> str:
+        if self.current is None:
+            raise NoSuchWindowException("closed")
+        return self.current
+
+
+class FakeConnection:
+    """Target.attachToTargetとRuntime.evaluateだけ答えるCDPの接続"""
+
+    def __init__(self, ready_dict: dict):
+        self.ready_dict = ready_dict
+        self.sent_list = []
+
+    def send(self, method, params=None, session_id=None):
+        self.sent_list.append((method, session_id))
+        if method == "Target.attachToTarget":
+            return {"sessionId": "session-" + params["targetId"]}
+        ready = self.ready_dict[session_id.removeprefix("session-")]
+        if ready is None:
+            raise CdpError("Execution context was destroyed.")
+        return {"result": {"type": "boolean", "value": ready}}
+
+
+def make_tabs(handle_list: list[str], connection=None) -> tuple[TabManager, FakeWebDriver]:
+    web_driver = FakeWebDriver(handle_list)
+    getter = None if connection is None else (lambda: connection)
+    return TabManager(SimpleNamespace(driver=web_driver), getter), web_driver
+
+
+def test_sync_follows_switch_outside_manager():
+    """TabManagerを通さずに切り替えても、syncしたあとのswitchは飛ばされない"""
+    tabs, web_driver = make_tabs(["a", "b"])
+    web_driver.switch_to.window("b")
+    assert tabs.sync() == "b"
+    tabs.switch("a")
+    assert web_driver.current == "a"
+
+
+def test_sync_after_current_tab_closed():
+    tabs, web_driver = make_tabs(["a", "b"])
+    web_driver.window_handles = ["b"]
+    web_driver.current = None
+    assert tabs.sync() == "b"
+    assert tabs.home == "b"
+    assert web_driver.current == "b"
+
+
+def test_is_loaded_does_not_switch_with_cdp():
+    connection = FakeConnection({"b": True, "c": False})
+    tabs, web_driver = make_tabs(["a", "b", "c"], connection)
+    assert tabs.is_loaded("b")
+    assert not tabs.is_loaded("c")
+    assert tabs.is_loaded("b")
+    assert web_driver.switch_count == 0
+    # attachはタブごとに1回だけ
+    attach_list = [sent for sent in connection.sent_list if sent[0] == "Target.attachToTarget"]
+    assert attach_list.__len__() == 2
+
+
+def test_is_loaded_during_navigation_is_false():
+    tabs, _ = make_tabs(["a", "b"], FakeConnection({"b": None}))
+    assert not tabs.is_loaded("b")
+
+
+def test_is_loaded_falls_back_without_cdp():
+    """CDPにつなげなければ切り替えて見る(is_ready)"""
+
+    def getter():
+        raise CdpError("no cdp")
+
+    web_driver = FakeWebDriver(["a", "b"])
+    web_driver.execute_script = lambda js, *args: [True, None]
+    tabs = TabManager(SimpleNamespace(driver=web_driver), getter)
+    assert tabs.is_loaded("b")
+    assert web_driver.current == "b"
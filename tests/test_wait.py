@@ -0,0 +1,59 @@
+# 外部ライブラリ
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+# 自作ライブラリ
+from autoweb_module.selenium import wait
+from autoweb_module.selenium.wait import WaitStrategy
+
+
+def test_poll_until_returns_first_result():
+    result_list = iter([None, None, "found"])
+    assert wait.poll_until(lambda: next(result_list), 1, WaitStrategy(interval=0.001)) == "found"
+
+
+def test_poll_until_accepts_falsy_result():
+    """None以外なら0や空リストでも見つかった扱い"""
+    assert wait.poll_until(lambda: [], 1, WaitStrategy(interval=0.001)) == []
+
+
+def test_poll_until_timeout():
+    call_list = []
+
+    def func():
+        call_list.append(1)
+        return None
+
+    with pytest.raises(TimeoutException, match="見つからない"):
+        wait.poll_until(func, 0.05, WaitStrategy(interval=0.01), "見つからない")
+    assert call_list.__len__() >= 2
+
+
+def test_poll_until_zero_wait_time_checks_once():
+    call_list = []
+
+    def func():
+        call_list.append(1)
+        return None
+
+    with pytest.raises(TimeoutException):
+        wait.poll_until(func, 0, WaitStrategy())
+    assert call_list.__len__() == 1
+
+
+def test_intervals_backoff():
+    intervals = WaitStrategy(interval=0.5, backoff=2, max_interval=1.5).intervals()
+    assert [next(intervals) for _ in range(4)] == [0.5, 1.0, 1.5, 1.5]
+
+
+@pytest.mark.parametrize("kwargs", [{"mode": "sleep"}, {"interval": 0}, {"backoff": 0.5}])
+def test_wait_strategy_validation(kwargs):
+    with pytest.raises(ValueError):
+        WaitStrategy(**kwargs)
+
+
+def test_to_js_selector():
+    assert wait.to_js_selector("css", "a.next") == ("css", "a.next")
+    assert wait.to_js_selector("tag", "a") == ("css", "a")
+    assert wait.to_js_selector("class", "next") == ("css", ".next")
+    assert wait.to_js_selector("link", "次へ") is None
@@ -0,0 +1,81 @@
+# 標準ライブラリ
+from pathlib import Path
+import threading
+
+# 外部ライブラリ
+import pytest
+
+# 自作ライブラリ
+from autoweb_module import BackgroundWriter
+from autoweb_module.exceptions import BackgroundWriteError
+from autoweb_module.selenium.writer import write_text_in_chunks
+
+
+def test_write_text_in_chunks(tmp_path: Path):
+    text = "あいうえお\r\n" * 100
+    write_text_in_chunks(tmp_path / "a.html", text, chunk_size=7)
+    assert (tmp_path / "a.html").read_bytes() == text.encode("utf-8")
+
+
+def test_write_bytes_and_text(tmp_path: Path):
+    with BackgroundWriter(chunk_size=3) as writer:
+        writer.write_bytes(tmp_path / "sub" / "a.png", b"\x89PNG")
+        future = writer.write_text(tmp_path / "b.html", "<p>本文</p>")
+    assert future.result() == tmp_path / "b.html"
+    assert (tmp_path / "sub" / "a.png").read_bytes() == b"\x89PNG"
+    assert (tmp_path / "b.html").read_text("utf-8") == "<p>本文</p>"
+    assert writer.written_count == 2
+    assert writer.pending_count == 0
+
+
+def test_errors_are_raised_on_flush(tmp_path: Path):
+    error_list = []
+
+    def produce():
+        raise ValueError("整形に失敗")
+
+    writer = BackgroundWriter(on_error=lambda path, e: error_list.append(path))
+    writer.submit(tmp_path / "a.html", produce, 10)
+    with pytest.raises(BackgroundWriteError) as exc_info:
+        writer.flush(wait_time=5)
+    assert exc_info.value.errors[0][0] == tmp_path / "a.html"
+    assert error_list == [tmp_path / "a.html"]
+    # 投げた分は消える
+    writer.flush(wait_time=5)
+    writer.close()
+
+
+def test_submit_blocks_on_pending_bytes(tmp_path: Path):
+    release = threading.Event()
+    writer = BackgroundWriter(max_workers=1, max_pending_bytes=10)
+
+    def produce():
+        release.wait(5)
+        return b"x"
+
+    writer.submit(tmp_path / "a.bin", produce, 8)
+    submitted = threading.Event()
+
+    def submit_second():
+        writer.submit(tmp_path / "b.bin", lambda: b"y", 8)
+        submitted.set()
+
+    thread = threading.Thread(target=submit_second)
+    thread.start()
+    # 1件目が書き終わるまで2件目は入らない
+    assert not submitted.wait(0.1)
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    writer.close()
+    assert writer.written_count == 2
+
+
+def test_submit_after_close(tmp_path: Path):
+    writer = BackgroundWriter()
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.write_bytes(tmp_path / "a.png", b"x")
+    assert writer.pending_count == 0
+    # 数えた分が残っていないのでflushは待たずに返る
+    writer.flush(wait_time=1)